@@ -0,0 +1,72 @@
+"""
+compara a serialização padrão do FastAPI (validate + jsonable_encoder +
+json.dumps) com o ModelRoute (dump_json do pydantic-core em uma passada)
+
+    uv run python -m benchmarks.bench_encoding [--requests N]
+"""
+
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import TypeAdapter
+
+from benchmarks.utils import parse_args, report
+from madr.core.responses import PydanticJSONResponse
+from madr.schemas.books import BookPublic, PublicBooksPaginated
+
+SIZES = (10, 100, 1000)
+
+FIELD = create_model_field(
+    'response', PublicBooksPaginated, mode='serialization'
+)
+ADAPTER = TypeAdapter(PublicBooksPaginated)
+
+
+def build_page(size: int) -> PublicBooksPaginated:
+    return PublicBooksPaginated(
+        data=[
+            BookPublic(
+                id=n,
+                name=f'livro {n}',
+                year=1900 + n % 120,
+                title=f'título do livro número {n}',
+            )
+            for n in range(size)
+        ],
+        page=1,
+        total=size,
+    )
+
+
+async def fastapi_default(page: PublicBooksPaginated) -> bytes:
+    content = await serialize_response(field=FIELD, response_content=page)
+    return JSONResponse(content).body
+
+
+async def model_route(page: PublicBooksPaginated) -> bytes:
+    return PydanticJSONResponse(ADAPTER.dump_json(page, by_alias=True)).body
+
+
+async def measure(encode, page: PublicBooksPaginated, requests: int) -> float:
+    await encode(page)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await encode(page)
+    return time.perf_counter() - start
+
+
+async def main(requests: int):
+    for size in SIZES:
+        page = build_page(size)
+        assert await fastapi_default(page) == await model_route(page)
+        for encode in (fastapi_default, model_route):
+            elapsed = await measure(encode, page, requests)
+            report(f'{encode.__name__:<16} {size} livros', requests, elapsed)
+
+
+if __name__ == '__main__':
+    args = parse_args(__doc__)
+    asyncio.run(main(args.requests))
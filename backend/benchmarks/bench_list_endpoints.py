@@ -0,0 +1,58 @@
+"""
+compara os backends de listagem (ORM, asyncpg e JSON do postgres)
+
+    uv run python -m benchmarks.bench_list_endpoints [--database-url URL]
+"""
+
+import asyncio
+from unittest.mock import patch
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.utils import (
+    create_catalog,
+    database_url,
+    measure,
+    parse_args,
+    report,
+)
+from madr.api.v1 import books, novelists
+from madr.app import app
+from madr.core.database import get_session
+
+ENDPOINTS = [
+    (books, '/books/?limit=10'),
+    (books, '/books/?limit=100'),
+    (books, '/books/?limit=100&title=a%C3%A7%C3%A3o&orderBy=year'),
+    (novelists, '/novelists/?limit=10'),
+    (novelists, '/novelists/?limit=50&name=novelist'),
+]
+
+
+async def main(url: str, requests: int):
+    engine = await create_catalog(url)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_session():
+        async with sessionmaker() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://bench'
+    ) as client:
+        for module, uri in ENDPOINTS:
+            for backend in ('orm', 'asyncpg', 'postgres'):
+                with patch.object(module.settings, 'DB_LIST_BACKEND', backend):
+                    elapsed = await measure(client, uri, requests)
+                report(f'{backend:<8} {uri}', requests, elapsed)
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    args = parse_args(__doc__)
+    with database_url(args.database_url) as url:
+        asyncio.run(main(url, args.requests))
@@ -0,0 +1,97 @@
+"""
+vazão de GET /books/ com `madr serve` em um worker e em um worker por CPU
+
+    uv run python -m benchmarks.bench_workers [--requests 20000]
+
+cada configuração sobe o servidor de verdade (processos, socket, uvicorn);
+a carga sai de vários processos clientes para o gerador não ser o gargalo
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from httpx import AsyncClient, Limits
+
+from benchmarks.utils import create_catalog, database_url, parse_args, report
+from madr.core.lifecycle import available_cpus
+
+PORT = 8765
+URI = f'http://127.0.0.1:{PORT}/books/?page=1'
+CONCURRENCY = 32  # conexões por processo cliente
+
+
+async def hammer(requests: int):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    async with AsyncClient(
+        limits=Limits(max_connections=CONCURRENCY), timeout=30
+    ) as client:
+
+        async def one():
+            async with semaphore:
+                response = await client.get(URI)
+                response.raise_for_status()
+
+        await asyncio.gather(*(one() for _ in range(requests)))
+
+
+def run_client(requests: int):
+    asyncio.run(hammer(requests))
+
+
+def wait_for_port(timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', PORT), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f'server did not start on port {PORT}')
+
+
+def measure(url: str, workers: int, requests: int, clients: int) -> float:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'madr.cli',
+            'serve',
+            '--port',
+            str(PORT),
+            '--workers',
+            str(workers),
+            '--no-access-log',
+        ],
+        env={**os.environ, 'DATABASE_URL': url},
+    )
+    try:
+        wait_for_port()
+        with ProcessPoolExecutor(clients) as pool:
+            list(pool.map(run_client, [50] * clients))  # aquece
+            start = time.perf_counter()
+            list(pool.map(run_client, [requests // clients] * clients))
+            return time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+async def prepare(url: str):
+    engine = await create_catalog(url)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    args = parse_args(__doc__, requests=20_000)
+    cpus = available_cpus()
+    clients = max(cpus, 2)
+    with database_url(args.database_url) as url:
+        asyncio.run(prepare(url))
+        for workers in sorted({1, cpus}):
+            elapsed = measure(url, workers, args.requests, clients)
+            report(f'madr serve --workers {workers}', args.requests, elapsed)
@@ -0,0 +1,95 @@
+"""
+compara POST /books/ com um commit por requisição e com o WriteBatcher
+(DB_WRITE_BATCHING) quando N clientes escrevem ao mesmo tempo
+
+    uv run python -m benchmarks.bench_write_batching [--requests 1000]
+
+a autenticação é trocada por um usuário fixo para medir só a escrita
+"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.utils import create_catalog, database_url, parse_args, report
+from madr.api.v1 import books
+from madr.app import app
+from madr.core.batching import WriteBatcher
+from madr.core.database import get_session
+from madr.core.security import get_current_user
+from madr.models.book import Book
+from madr.models.novelist import Novelist
+from madr.schemas.user import UserPublic
+
+USER = UserPublic(id=1, username='bench', email='bench@bench.com')
+
+
+async def write_concurrently(
+    client: AsyncClient, novelist_id: int, requests: int, label: str
+) -> float:
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        *(
+            client.post(
+                '/books/',
+                json={
+                    'name': f'{label}_{n}',
+                    'year': 2000,
+                    'title': f'Título {n}',
+                    'idNovelist': novelist_id,
+                },
+            )
+            for n in range(requests)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    for response in responses:
+        response.raise_for_status()
+    return elapsed
+
+
+async def main(url: str, requests: int):
+    engine = await create_catalog(url, novelists=1, books=1)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        novelist_id = await session.scalar(select(Novelist.id))
+
+    async def override_get_session():
+        async with sessionmaker() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_current_user] = lambda: USER
+    book_writes = WriteBatcher(
+        Book.__table__,  # type: ignore
+        sessionmaker,
+        max_delay=books.settings.DB_WRITE_BATCH_MAX_DELAY_MS / 1000,
+        max_size=books.settings.DB_WRITE_BATCH_SIZE,
+    )
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://bench'
+    ) as client:
+        for batching in (False, True):
+            label = 'batching' if batching else 'commit por requisição'
+            with (
+                patch.object(books.settings, 'DB_WRITE_BATCHING', batching),
+                patch.object(books, 'book_writes', book_writes),
+            ):
+                elapsed = await write_concurrently(
+                    client, novelist_id, requests, f'bench_{batching}'
+                )
+            report(f'{label} ({requests} escritores)', requests, elapsed)
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    args = parse_args(__doc__, requests=1000)
+    with database_url(args.database_url) as url:
+        asyncio.run(main(url, args.requests))
@@ -0,0 +1,73 @@
+import argparse
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from testcontainers.postgres import PostgresContainer
+
+from madr.models import table_registry
+from madr.models.book import Book
+from madr.models.novelist import Novelist
+
+
+def parse_args(description: str, requests: int = 300) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        '--database-url',
+        help='banco já existente (sem isso sobe um postgres:17 descartável)',
+    )
+    parser.add_argument('--requests', type=int, default=requests)
+    return parser.parse_args()
+
+
+@contextmanager
+def database_url(url: Optional[str]):
+    if url:
+        yield url
+        return
+    with PostgresContainer('postgres:17', driver='asyncpg') as postgres:
+        yield postgres.get_connection_url()
+
+
+async def create_catalog(url: str, novelists: int = 50, books: int = 40):
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.drop_all)
+        await conn.run_sync(table_registry.metadata.create_all)
+        novelist_ids = (
+            await conn.execute(
+                Novelist.__table__.insert().returning(Novelist.__table__.c.id),
+                [{'name': f'bench_novelist_{n}'} for n in range(novelists)],
+            )
+        ).scalars()
+        await conn.execute(
+            Book.__table__.insert(),
+            [
+                {
+                    'name': f'bench_book_{novelist_id}_{n}',
+                    'title': f'Título {n} — ação',
+                    'year': 1800 + n,
+                    'id_novelist': novelist_id,
+                }
+                for novelist_id in novelist_ids
+                for n in range(books)
+            ],
+        )
+    return engine
+
+
+async def measure(client, uri: str, requests: int) -> float:
+    await client.get(uri)  # aquece conexões e caches
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(uri)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def report(label: str, requests: int, elapsed: float):
+    print(
+        f'{label:<56} {elapsed / requests * 1000:8.3f} ms/req '
+        f'{requests / elapsed:10.1f} req/s'
+    )
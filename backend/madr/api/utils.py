@@ -1,4 +1,10 @@
-from sqlalchemy.exc import IntegrityError
+from datetime import UTC, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import true
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
 
 
 def is_fk_violation(err: IntegrityError) -> bool:
@@ -9,3 +15,43 @@ def is_fk_violation(err: IntegrityError) -> bool:
 def is_unique_violation(err: IntegrityError) -> bool:
     message = str(err.orig).lower()
     return 'unique constraint' in message
+
+
+def is_check_violation(err: IntegrityError) -> bool:
+    # 23514 = check_violation (ex.: nome vazio)
+    return getattr(err.orig, 'sqlstate', None) == '23514'
+
+
+def is_query_timeout(err: DBAPIError) -> bool:
+    # 57014 = query_canceled (statement_timeout ou pg_cancel_backend)
+    return getattr(err.orig, 'sqlstate', None) == '57014'
+
+
+def make_etag(updated_at: datetime) -> str:
+    """versão da linha: microssegundos de updated_at em hexadecimal"""
+    micros = (updated_at - EPOCH) // timedelta(microseconds=1)
+    return f'"{micros:x}"'
+
+
+def parse_if_match(header: str) -> Optional[List[datetime]]:
+    """
+    devolve os updated_at aceitos pelo If-Match (None para '*');
+    tags fracas ou inválidas nunca casam
+    """
+    if header.strip() == '*':
+        return None
+
+    versions = []
+    for tag in map(str.strip, header.split(',')):
+        if len(tag) < 2 or not (tag[0] == tag[-1] == '"'):  # noqa: PLR2004
+            continue
+        try:
+            versions.append(EPOCH + timedelta(microseconds=int(tag[1:-1], 16)))
+        except ValueError:
+            continue
+    return versions
+
+
+def if_match_clause(column, if_match: Optional[str]):
+    versions = parse_if_match(if_match) if if_match is not None else None
+    return true() if versions is None else column.in_(versions)
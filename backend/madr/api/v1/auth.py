@@ -6,6 +6,7 @@ import ipdb  # noqa: F401
 from fastapi import APIRouter, HTTPException
 
 from madr.config import Settings
+from madr.core.responses import ModelRoute
 
 # from madr.core.redis import get_user_token_version
 from madr.core.security import (
@@ -19,7 +20,7 @@ from madr.schemas.security import Token
 # from madr.types import DBSession, T_redis
 from madr.types import DBSession
 
-router = APIRouter(prefix='/auth', tags=['auth'])
+router = APIRouter(prefix='/auth', tags=['auth'], route_class=ModelRoute)
 
 
 @router.post('/token', status_code=HTTPStatus.OK, response_model=Token)
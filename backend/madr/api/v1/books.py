@@ -1,13 +1,43 @@
+from functools import partial
 from http import HTTPStatus
+from typing import Annotated, Any, Dict, List, Optional, Sequence
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Body, Header, Request, Response
 from fastapi.exceptions import HTTPException
-from sqlalchemy import delete, func, select
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import RowMapping, delete, func, select, update
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-
-from madr.api.utils import is_fk_violation, is_unique_violation
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.api.utils import (
+    if_match_clause,
+    is_check_violation,
+    is_fk_violation,
+    is_unique_violation,
+    make_etag,
+)
+from madr.config import Settings
+from madr.core.batching import WriteBatcher
+from madr.core.cache import Cached, Compute, read_cache
+from madr.core.conditional import (
+    Representation,
+    conditional_response,
+    list_precondition,
+    shared_table_version,
+    table_validators,
+    validators,
+)
+from madr.core.database import async_session, replicas
+from madr.core.replicas import is_pinned
+from madr.core.responses import ModelRoute, render_body
+from madr.core.singleflight import SingleFlight
+from madr.core.warmup import warmup
 from madr.dependencies import ActiveUser, AnnotatedBookQueryParams
 from madr.models.book import Book
+from madr.repositories import books as books_repository
+from madr.repositories.generations import table_version
 from madr.schemas import Message
 from madr.schemas.books import (
     ORDERABLE_FIELDS as BOOK_ORDERABLE_FIELDS,
@@ -15,20 +45,100 @@ from madr.schemas.books import (
 from madr.schemas.books import (
     BookCreate,
     BookPublic,
+    BookQueryParams,
     BookUpdate,
+    BookUpsert,
     PublicBooksPaginated,
+    UpsertedBooks,
 )
-from madr.types import DBSession
-
-router = APIRouter(prefix='/books', tags=['books'])
+from madr.schemas.jobs import JobAccepted
+from madr.tasks import IMPORT_BOOKS, jobs
+from madr.types import DBSession, ReadSession, T_redis
+
+router = APIRouter(prefix='/books', tags=['books'], route_class=ModelRoute)
+settings = Settings()  # type: ignore
+book_writes = WriteBatcher(
+    Book.__table__,  # type: ignore
+    async_session,
+    max_delay=settings.DB_WRITE_BATCH_MAX_DELAY_MS / 1000,
+    max_size=settings.DB_WRITE_BATCH_SIZE,
+    track_lsn=bool(replicas),
+)
+books_cache = read_cache('books', bypass=is_pinned)
+book_reads = SingleFlight('books', bypass=is_pinned)
+PAGE_ADAPTER = TypeAdapter(PublicBooksPaginated)
+BOOK_ADAPTER = TypeAdapter(BookPublic)
 
 
 @router.get(
     '/', status_code=HTTPStatus.OK, response_model=PublicBooksPaginated
 )
 async def read_books_by_filter(
-    session: DBSession, query: AnnotatedBookQueryParams
+    request: Request,
+    session: ReadSession,
+    query: AnnotatedBookQueryParams,
+    redis: T_redis,
 ):
+    normalized = query.model_dump_json()
+    version = await shared_table_version(book_reads, session, 'books')
+    if response := list_precondition(request, 'books', version, normalized):
+        return response
+
+    async def load():
+        return await books_cache.fetch(
+            redis,
+            books_cache.key(normalized, version),
+            session,
+            books_page(query, normalized),
+        )
+
+    body, headers = await book_reads.do(f'list:{normalized}', load)
+    return conditional_response(request, Representation(headers, lambda: body))
+
+
+def books_page(query: BookQueryParams, normalized: str) -> Compute:
+    async def compute(session: AsyncSession) -> Cached:
+        # a geração é lida antes da página: no pior caso o ETag fica mais
+        # velho que o corpo, o que só custa uma revalidação a mais
+        version = await table_version(session, 'books')
+        page = await _read_books(session, query)
+        return (
+            render_body(PAGE_ADAPTER, page),
+            table_validators('books', version, normalized),
+        )
+
+    return compute
+
+
+@warmup.query('books.list')
+async def warm_books_list(session: AsyncSession):
+    query = BookQueryParams()
+    await books_page(query, query.model_dump_json())(session)
+
+
+@warmup.query('books.detail')
+async def warm_book_detail(session: AsyncSession):
+    await session.scalar(select(Book).where(Book.id == 0))
+
+
+@warmup.prefill('books')
+async def prefill_books(redis: Redis, session: AsyncSession):
+    query = BookQueryParams()
+    normalized = query.model_dump_json()
+    await books_cache.fetch(
+        redis,
+        books_cache.key(normalized, await table_version(session, 'books')),
+        session,
+        books_page(query, normalized),
+    )
+
+
+async def _read_books(session: AsyncSession, query: BookQueryParams):
+    if settings.DB_LIST_BACKEND == 'postgres':
+        return await books_repository.render_books(session, query)
+    if settings.DB_LIST_BACKEND == 'asyncpg':
+        return await books_repository.list_books(session, query)
+
     order_dir = query.order_dir
     year_from = query.year_from
     year_to = query.year_to
@@ -80,10 +190,13 @@ async def create_book(
     db_book = Book(**input_book.model_dump(exclude_unset=True))
 
     try:
+        if settings.DB_WRITE_BATCHING:
+            # devolve a conexão da autenticação ao pool enquanto espera o lote
+            await session.commit()
+            return await book_writes.submit(input_book.model_dump())
         # ipdb.set_trace()
         session.add(db_book)
         await session.commit()
-        await session.refresh(db_book)
     except IntegrityError as err:
         # ipdb.set_trace()
         await session.rollback()
@@ -121,29 +234,140 @@ async def create_book(
     return db_book
 
 
+async def _upsert_books(
+    session: AsyncSession, rows: List[Dict[str, Any]]
+) -> Sequence[RowMapping]:
+    try:
+        upserted = await books_repository.upsert_books(session, rows)
+        await session.commit()
+    except IntegrityError as err:
+        await session.rollback()
+
+        if is_fk_violation(err):
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail='Novelist not found',
+            )
+
+        if is_check_violation(err):
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail='Invalid book',
+            )
+
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail='Integrity violation',
+        )
+    except SQLAlchemyError:
+        await session.rollback()
+        raise HTTPException(
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
+            detail='Database error',
+        )
+    return upserted
+
+
+@router.post(
+    '/import', status_code=HTTPStatus.ACCEPTED, response_model=JobAccepted
+)
+async def import_books(
+    user: ActiveUser,
+    input_books: Annotated[
+        List[BookCreate], Body(max_length=settings.JOBS_IMPORT_MAX_ITEMS)
+    ],
+    redis: T_redis,
+    response: Response,
+):
+    """upsert por nome fora da requisição; acompanhe em /jobs/{id}"""
+    if redis is None:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Job queue unavailable',
+        )
+    try:
+        job_id = await jobs.enqueue(
+            redis,
+            IMPORT_BOOKS,
+            [book.model_dump() for book in input_books],
+            owner=user.id,
+        )
+    except RedisError:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Job queue unavailable',
+        )
+
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return JobAccepted(id=job_id)
+
+
+# declaradas antes de /{book_id} para "by-name" não cair no PUT por id
+@router.put(
+    '/by-name', status_code=HTTPStatus.OK, response_model=UpsertedBooks
+)
+async def upsert_books(
+    _: ActiveUser,
+    input_books: Annotated[
+        List[BookCreate], Body(max_length=settings.DB_UPSERT_MAX_BATCH)
+    ],
+    session: DBSession,
+):
+    # o postgres recusa o mesmo nome duas vezes no lote: vale o último
+    rows = {book.name: book.model_dump() for book in input_books}
+    if not rows:
+        return UpsertedBooks()
+
+    upserted = await _upsert_books(session, list(rows.values()))
+    created = sum(row['inserted'] for row in upserted)
+    return UpsertedBooks(
+        data=[BookPublic.model_validate(row) for row in upserted],
+        created=created,
+        updated=len(upserted) - created,
+    )
+
+
+@router.put(
+    '/by-name/{name}', status_code=HTTPStatus.OK, response_model=BookPublic
+)
+async def upsert_book(
+    _: ActiveUser,
+    name: str,
+    input_book: BookUpsert,
+    session: DBSession,
+    response: Response,
+):
+    (row,) = await _upsert_books(
+        session, [{'name': name, **input_book.model_dump()}]
+    )
+
+    if row['inserted']:
+        response.status_code = HTTPStatus.CREATED
+    response.headers['ETag'] = make_etag(row['updated_at'])
+    return BookPublic.model_validate(row)
+
+
 @router.put('/{book_id}', status_code=HTTPStatus.OK, response_model=BookPublic)
-async def update_book(
+async def update_book(  # noqa: PLR0913, PLR0917
     _: ActiveUser,
     book_id: int,
     input_book: BookUpdate,
     session: DBSession,
+    response: Response,
+    if_match: Annotated[Optional[str], Header()] = None,
 ):
-    existing_book = await session.scalar(
-        select(Book).where(Book.id == book_id)
+    stmt = (
+        update(Book)
+        .where(Book.id == book_id, if_match_clause(Book.updated_at, if_match))
+        .values(**input_book.model_dump(exclude_unset=True))
+        .values(updated_at=func.now())
+        .returning(Book)
+        .execution_options(synchronize_session=False, populate_existing=True)
     )
 
-    if not existing_book:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail='Book not found'
-        )
-
-    update_data = input_book.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(existing_book, key, value)
-
     try:
+        existing_book = await session.scalar(stmt)
         await session.commit()
-        await session.refresh(existing_book)
     except IntegrityError as err:
         await session.rollback()
 
@@ -170,24 +394,43 @@ async def update_book(
             detail='Database error',
         )
 
+    if not existing_book:
+        if if_match is not None and await session.scalar(
+            select(Book.id).where(Book.id == book_id)
+        ):
+            raise HTTPException(
+                status_code=HTTPStatus.PRECONDITION_FAILED,
+                detail='Book has been modified',
+            )
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Book not found'
+        )
+
+    response.headers['ETag'] = make_etag(existing_book.updated_at)
     return existing_book
 
 
 @router.get('/{book_id}', status_code=HTTPStatus.OK, response_model=BookPublic)
-async def get_book(
-    book_id: int,
-    session: DBSession,
-):
-    existing_book = await session.scalar(
-        select(Book).where(Book.id == book_id)
-    )
+async def get_book(book_id: int, session: ReadSession, request: Request):
+    async def load():
+        existing_book = await session.scalar(
+            select(Book).where(Book.id == book_id)
+        )
 
-    if not existing_book:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail='Book not found'
+        if not existing_book:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail='Book not found'
+            )
+
+        # o ETag é a versão da linha, o mesmo que o If-Match do PUT aceita
+        updated_at = existing_book.updated_at
+        return Representation(
+            validators(make_etag(updated_at), updated_at),
+            partial(render_body, BOOK_ADAPTER, existing_book),
         )
 
-    return existing_book
+    representation = await book_reads.do(f'item:{book_id}', load)
+    return conditional_response(request, representation)
 
 
 @router.delete('/{book_id}', status_code=HTTPStatus.OK, response_model=Message)
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+from http import HTTPStatus
+from typing import AsyncIterator, Iterable, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from starlette.background import BackgroundTask
+
+from madr.config import Settings
+from madr.core.database import async_session
+from madr.core.events import (
+    CatalogFeed,
+    Event,
+    Subscriber,
+    TooManySubscribers,
+    asyncpg_dsn,
+)
+from madr.core.lifecycle import lifecycle
+from madr.core.responses import ModelRoute
+from madr.models.catalog_event import BULK, CHANNEL
+from madr.schemas.books import BookPublic
+from madr.schemas.novelists import NovelistPublic
+
+settings = Settings()  # type: ignore
+router = APIRouter(prefix='/events', tags=['events'], route_class=ModelRoute)
+
+catalog_feed = CatalogFeed(
+    asyncpg_dsn(settings.CATALOG_EVENTS_DATABASE_URL or settings.DATABASE_URL),
+    CHANNEL,
+    async_session,
+    buffer=settings.CATALOG_EVENTS_BUFFER,
+    max_subscribers=settings.CATALOG_EVENTS_MAX_SUBSCRIBERS,
+    replay_limit=settings.CATALOG_EVENTS_REPLAY_LIMIT,
+    retention_seconds=settings.CATALOG_EVENTS_RETENTION_SECONDS,
+    reconnect_interval=settings.CATALOG_EVENTS_RECONNECT_SECONDS,
+)
+
+# o mesmo formato de GET /books/{id} e GET /novelists/{id}
+PUBLIC = {
+    'books': TypeAdapter(BookPublic),
+    'novelists': TypeAdapter(NovelistPublic),
+}
+# de quanto em quanto tempo o stream confere se o worker está drenando
+DRAIN_CHECK_SECONDS = 1
+
+
+def format_event(event: Event) -> str:
+    if event['operation'] == BULK:
+        # muitas linhas num comando só: o cliente recarrega a lista
+        data = json.dumps(event['data'], separators=(',', ':'))
+    else:
+        adapter = PUBLIC[event['table_name']]
+        data = adapter.dump_json(
+            adapter.validate_python(event['data']), by_alias=True
+        ).decode()
+    return (
+        f'id: {event["id"]}\n'
+        f'event: {event["table_name"]}.{event["operation"]}\n'
+        f'data: {data}\n\n'
+    )
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def catalog_stream(
+    feed: CatalogFeed,
+    subscriber: Subscriber,
+    replayed: Optional[Iterable[Event]],
+    resumed: bool,
+) -> AsyncIterator[str]:
+    try:
+        yield f'retry: {settings.CATALOG_EVENTS_RETRY_MS}\n\n'
+
+        seen = set()
+        if replayed is None and resumed:
+            # o histórico não cobre o Last-Event-ID: o cliente recarrega
+            yield 'event: reset\ndata: {}\n\n'
+        for event in replayed or ():
+            seen.add(event['id'])
+            yield format_event(event)
+
+        written = time.monotonic()
+        while not lifecycle.draining and not subscriber.overflowed:
+            try:
+                async with asyncio.timeout(DRAIN_CHECK_SECONDS):
+                    event = await subscriber.queue.get()
+            except TimeoutError:
+                if (
+                    time.monotonic() - written
+                    >= settings.CATALOG_EVENTS_HEARTBEAT_SECONDS
+                ):
+                    written = time.monotonic()
+                    yield ': ping\n\n'
+                continue
+
+            if event['id'] not in seen:
+                written = time.monotonic()
+                yield format_event(event)
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+@router.get(
+    '/catalog',
+    status_code=HTTPStatus.OK,
+    response_class=StreamingResponse,
+    responses={HTTPStatus.OK: {'content': {'text/event-stream': {}}}},
+)
+async def catalog_events(last_event_id: Optional[str] = Header(None)):
+    """
+    mudanças em livros e romancistas por Server-Sent Events; com
+    Last-Event-ID o stream continua de onde parou ou manda `reset`
+    """
+    try:
+        # assina antes de ler o histórico para não perder nada no meio
+        subscriber = catalog_feed.subscribe()
+    except TooManySubscribers:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Too many subscribers',
+            headers={
+                'Retry-After': str(settings.ADMISSION_RETRY_AFTER_SECONDS)
+            },
+        )
+
+    last_id = parse_last_event_id(last_event_id)
+    try:
+        replayed = (
+            None if last_id is None else await catalog_feed.replay(last_id)
+        )
+    except BaseException:
+        catalog_feed.unsubscribe(subscriber)
+        raise
+
+    return StreamingResponse(
+        catalog_stream(
+            catalog_feed, subscriber, replayed, resumed=last_id is not None
+        ),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        # o gerador pode nem começar se o cliente cair antes
+        background=BackgroundTask(catalog_feed.unsubscribe, subscriber),
+    )
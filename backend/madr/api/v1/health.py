@@ -0,0 +1,45 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Request, Response
+
+from madr.core.database import engine, get_pool_stats
+from madr.core.lifecycle import lifecycle
+from madr.core.redis import get_redis_pool_stats
+from madr.core.responses import ModelRoute
+from madr.core.warmup import warmup
+from madr.schemas import Message
+from madr.schemas.health import PoolsStatus, Readiness
+
+router = APIRouter(prefix='/health', tags=['health'], route_class=ModelRoute)
+
+
+@router.get('/pools', status_code=HTTPStatus.OK, response_model=PoolsStatus)
+async def pools(request: Request):
+    redis = getattr(request.app.state, 'redis', None)
+
+    return PoolsStatus(
+        database=get_pool_stats(engine.pool),
+        redis=get_redis_pool_stats(redis and redis.connection_pool),
+    )
+
+
+@router.get('/live', status_code=HTTPStatus.OK, response_model=Message)
+async def live():
+    """o processo responde: não toca em banco nem redis"""
+    return {'message': 'ok'}
+
+
+@router.get(
+    '/ready',
+    status_code=HTTPStatus.OK,
+    response_model=Readiness,
+    responses={HTTPStatus.SERVICE_UNAVAILABLE: {'model': Readiness}},
+)
+async def ready(response: Response):
+    """pronto depois do aquecimento do lifespan e até começar a drenar"""
+    is_ready = warmup.done and not lifecycle.draining
+    if not is_ready:
+        response.status_code = HTTPStatus.SERVICE_UNAVAILABLE
+    return Readiness(
+        ready=is_ready, draining=lifecycle.draining, checks=warmup.checks
+    )
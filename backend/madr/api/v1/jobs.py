@@ -0,0 +1,35 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, HTTPException
+from redis.exceptions import RedisError
+
+from madr.core.responses import ModelRoute
+from madr.dependencies import ActiveUser
+from madr.schemas.jobs import JobPublic
+from madr.tasks import jobs
+from madr.types import T_redis
+
+router = APIRouter(prefix='/jobs', tags=['jobs'], route_class=ModelRoute)
+
+
+@router.get('/{job_id}', status_code=HTTPStatus.OK, response_model=JobPublic)
+async def get_job(user: ActiveUser, job_id: str, redis: T_redis):
+    """status, tentativas e progresso (done/total) de um job do usuário"""
+    if redis is None:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Job queue unavailable',
+        )
+    try:
+        job = await jobs.get(redis, job_id, owner=user.id)
+    except RedisError:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Job queue unavailable',
+        )
+
+    if job is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Job not found'
+        )
+    return job
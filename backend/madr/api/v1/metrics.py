@@ -0,0 +1,38 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from madr.core.database import engine, get_pool_stats
+from madr.core.metrics import POOL_CONNECTIONS, registry
+from madr.core.redis import get_redis_pool_stats
+from madr.schemas.health import PoolStats
+
+router = APIRouter(tags=['metrics'])
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def set_pool_gauges(pool: str, stats: PoolStats):
+    for state in ('size', 'checked_out', 'idle', 'overflow', 'waiting'):
+        POOL_CONNECTIONS.set(getattr(stats, state), pool=pool, state=state)
+
+
+def pool_collector(app: FastAPI):
+    def collect():
+        redis = getattr(app.state, 'redis', None)
+        set_pool_gauges('database', get_pool_stats(engine.pool))
+        set_pool_gauges(
+            'redis', get_redis_pool_stats(redis and redis.connection_pool)
+        )
+
+    return collect
+
+
+@router.get(
+    '/metrics', response_class=PlainTextResponse, include_in_schema=False
+)
+async def metrics():
+    # o snapshot no loop (os dicts mudam a cada requisição); os arquivos
+    # dos outros workers são lidos numa thread
+    body = await run_in_threadpool(registry.render, registry.snapshot())
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
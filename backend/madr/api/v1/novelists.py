@@ -1,10 +1,36 @@
+from functools import partial
 from http import HTTPStatus
+from typing import Annotated, List, Optional, Sequence
 
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import func, select
+from fastapi import APIRouter, Body, Header, HTTPException, Request, Response
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+from sqlalchemy import RowMapping, func, select, update
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from madr.api.utils import is_unique_violation
+from madr.api.utils import (
+    if_match_clause,
+    is_check_violation,
+    is_unique_violation,
+    make_etag,
+)
+from madr.config import Settings
+from madr.core.batching import WriteBatcher
+from madr.core.cache import Cached, Compute, read_cache
+from madr.core.conditional import (
+    Representation,
+    conditional_response,
+    list_precondition,
+    shared_table_version,
+    table_validators,
+    validators,
+)
+from madr.core.database import async_session, replicas
+from madr.core.replicas import is_pinned
+from madr.core.responses import ModelRoute, render_body
+from madr.core.singleflight import SingleFlight
+from madr.core.warmup import warmup
 from madr.dependencies import (
     ActiveUser,
     AnnotatedBookQueryParams,
@@ -12,29 +38,118 @@ from madr.dependencies import (
 )
 from madr.models.book import Book
 from madr.models.novelist import Novelist
+from madr.repositories import books as books_repository
+from madr.repositories import novelists as novelists_repository
+from madr.repositories.generations import table_version
 from madr.schemas import Message
 from madr.schemas.books import ORDERABLE_FIELDS as BOOK_ORDERABLE_FIELDS
-from madr.schemas.books import BookPublic, PublicBooksPaginated
+from madr.schemas.books import (
+    BookPublic,
+    BookQueryParams,
+    PublicBooksPaginated,
+)
 from madr.schemas.novelists import (
     ORDERABLE_FIELDS as NOVELIST_ORDERABLE_FIELDS,
 )
 from madr.schemas.novelists import (
     NovelistPublic,
+    NovelistQueryParams,
     NovelistSchema,
     NovelistUpdate,
     PublicNovelistsPaginated,
+    UpsertedNovelists,
 )
-from madr.types import DBSession
+from madr.types import DBSession, ReadSession, T_redis
 
-router = APIRouter(prefix='/novelists', tags=['novelists'])
+router = APIRouter(
+    prefix='/novelists', tags=['novelists'], route_class=ModelRoute
+)
+settings = Settings()  # type: ignore
+novelist_writes = WriteBatcher(
+    Novelist.__table__,  # type: ignore
+    async_session,
+    max_delay=settings.DB_WRITE_BATCH_MAX_DELAY_MS / 1000,
+    max_size=settings.DB_WRITE_BATCH_SIZE,
+    track_lsn=bool(replicas),
+)
+novelists_cache = read_cache('novelists', bypass=is_pinned)
+novelist_books_cache = read_cache('novelist_books', bypass=is_pinned)
+novelist_reads = SingleFlight('novelists', bypass=is_pinned)
+NOVELIST_ADAPTER = TypeAdapter(NovelistPublic)
+NOVELISTS_PAGE_ADAPTER = TypeAdapter(PublicNovelistsPaginated)
+BOOKS_PAGE_ADAPTER = TypeAdapter(PublicBooksPaginated)
 
 
 @router.get(
     '/', status_code=HTTPStatus.OK, response_model=PublicNovelistsPaginated
 )
 async def read_novelists_by(
-    session: DBSession, query: AnnotatedNovelistQueryParams
+    request: Request,
+    session: ReadSession,
+    query: AnnotatedNovelistQueryParams,
+    redis: T_redis,
 ):
+    normalized = query.model_dump_json()
+    version = await shared_table_version(novelist_reads, session, 'novelists')
+    if response := list_precondition(
+        request, 'novelists', version, normalized
+    ):
+        return response
+
+    async def load():
+        return await novelists_cache.fetch(
+            redis,
+            novelists_cache.key(normalized, version),
+            session,
+            novelists_page(query, normalized),
+        )
+
+    body, headers = await novelist_reads.do(f'list:{normalized}', load)
+    return conditional_response(request, Representation(headers, lambda: body))
+
+
+def novelists_page(query: NovelistQueryParams, normalized: str) -> Compute:
+    async def compute(session: AsyncSession) -> Cached:
+        version = await table_version(session, 'novelists')
+        page = await _read_novelists(session, query)
+        return (
+            render_body(NOVELISTS_PAGE_ADAPTER, page),
+            table_validators('novelists', version, normalized),
+        )
+
+    return compute
+
+
+@warmup.query('novelists.list')
+async def warm_novelists_list(session: AsyncSession):
+    query = NovelistQueryParams()
+    await novelists_page(query, query.model_dump_json())(session)
+
+
+@warmup.query('novelists.detail')
+async def warm_novelist_detail(session: AsyncSession):
+    await session.scalar(select(Novelist).where(Novelist.id == 0))
+
+
+@warmup.prefill('novelists')
+async def prefill_novelists(redis: Redis, session: AsyncSession):
+    query = NovelistQueryParams()
+    normalized = query.model_dump_json()
+    version = await table_version(session, 'novelists')
+    await novelists_cache.fetch(
+        redis,
+        novelists_cache.key(normalized, version),
+        session,
+        novelists_page(query, normalized),
+    )
+
+
+async def _read_novelists(session: AsyncSession, query: NovelistQueryParams):
+    if settings.DB_LIST_BACKEND == 'postgres':
+        return await novelists_repository.render_novelists(session, query)
+    if settings.DB_LIST_BACKEND == 'asyncpg':
+        return await novelists_repository.list_novelists(session, query)
+
     offset = query.offset
     order_by = query.order_by
     order_dir = query.order_dir
@@ -87,9 +202,12 @@ async def create_novelist(
     db_novelist = Novelist(**novelist.model_dump())
 
     try:
+        if settings.DB_WRITE_BATCHING:
+            # devolve a conexão da autenticação ao pool enquanto espera o lote
+            await session.commit()
+            return await novelist_writes.submit(novelist.model_dump())
         session.add(db_novelist)
         await session.commit()
-        await session.refresh(db_novelist)
     except IntegrityError as err:
         await session.rollback()
         if is_unique_violation(err):
@@ -111,31 +229,128 @@ async def create_novelist(
     return db_novelist
 
 
+async def _upsert_novelists(
+    session: AsyncSession, names: List[str]
+) -> Sequence[RowMapping]:
+    try:
+        upserted = await novelists_repository.upsert_novelists(session, names)
+        await session.commit()
+    except IntegrityError as err:
+        await session.rollback()
+
+        if is_check_violation(err):
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail='Invalid novelist',
+            )
+
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail='Integrity violation',
+        )
+    except SQLAlchemyError:
+        await session.rollback()
+        raise HTTPException(
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
+            detail='Database error',
+        )
+    return upserted
+
+
+# declaradas antes de /{novelist_id} para "by-name" não cair no PUT por id
 @router.put(
-    '/{novelist_id}', status_code=HTTPStatus.OK, response_model=NovelistPublic
+    '/by-name', status_code=HTTPStatus.OK, response_model=UpsertedNovelists
 )
-async def update_novelist(
+async def upsert_novelists(
     _: ActiveUser,
-    novelist_id: int,
-    novelist: NovelistUpdate,
+    novelists: Annotated[
+        List[NovelistSchema], Body(max_length=settings.DB_UPSERT_MAX_BATCH)
+    ],
     session: DBSession,
 ):
-    existing_novelist = await session.scalar(
-        select(Novelist).where(Novelist.id == novelist_id)
+    # o postgres recusa o mesmo nome duas vezes no lote
+    names = list(dict.fromkeys(novelist.name for novelist in novelists))
+    if not names:
+        return UpsertedNovelists()
+
+    upserted = await _upsert_novelists(session, names)
+    created = sum(row['inserted'] for row in upserted)
+    return UpsertedNovelists(
+        data=[NovelistPublic.model_validate(row) for row in upserted],
+        created=created,
+        updated=len(upserted) - created,
     )
 
-    if not existing_novelist:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail='Novelist not found'
+
+@router.put(
+    '/by-name/{name}', status_code=HTTPStatus.OK, response_model=NovelistPublic
+)
+async def upsert_novelist(
+    _: ActiveUser,
+    name: str,
+    session: DBSession,
+    response: Response,
+):
+    (row,) = await _upsert_novelists(session, [name])
+
+    if row['inserted']:
+        response.status_code = HTTPStatus.CREATED
+    response.headers['ETag'] = make_etag(row['updated_at'])
+    return NovelistPublic.model_validate(row)
+
+
+@router.get(
+    '/{novelist_id}', status_code=HTTPStatus.OK, response_model=NovelistPublic
+)
+async def get_novelist(
+    novelist_id: int, session: ReadSession, request: Request
+):
+    async def load():
+        existing_novelist = await session.scalar(
+            select(Novelist).where(Novelist.id == novelist_id)
+        )
+
+        if not existing_novelist:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail='Novelist not found'
+            )
+
+        updated_at = existing_novelist.updated_at
+        return Representation(
+            validators(make_etag(updated_at), updated_at),
+            partial(render_body, NOVELIST_ADAPTER, existing_novelist),
         )
 
-    update_data = novelist.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(existing_novelist, key, value)
+    representation = await novelist_reads.do(f'item:{novelist_id}', load)
+    return conditional_response(request, representation)
+
+
+@router.put(
+    '/{novelist_id}', status_code=HTTPStatus.OK, response_model=NovelistPublic
+)
+async def update_novelist(  # noqa: PLR0913, PLR0917
+    _: ActiveUser,
+    novelist_id: int,
+    novelist: NovelistUpdate,
+    session: DBSession,
+    response: Response,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
+    stmt = (
+        update(Novelist)
+        .where(
+            Novelist.id == novelist_id,
+            if_match_clause(Novelist.updated_at, if_match),
+        )
+        .values(**novelist.model_dump(exclude_unset=True))
+        .values(updated_at=func.now())
+        .returning(Novelist)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
 
     try:
+        existing_novelist = await session.scalar(stmt)
         await session.commit()
-        await session.refresh(existing_novelist)
     except IntegrityError as err:
         await session.rollback()
         if is_unique_violation(err):
@@ -143,6 +358,30 @@ async def update_novelist(
                 status_code=HTTPStatus.CONFLICT,
                 detail='Novelist already exists',
             )
+        raise HTTPException(
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
+            detail='Database error',
+        )
+    except SQLAlchemyError:
+        await session.rollback()
+        raise HTTPException(
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
+            detail='Database error',
+        )
+
+    if not existing_novelist:
+        if if_match is not None and await session.scalar(
+            select(Novelist.id).where(Novelist.id == novelist_id)
+        ):
+            raise HTTPException(
+                status_code=HTTPStatus.PRECONDITION_FAILED,
+                detail='Novelist has been modified',
+            )
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Novelist not found'
+        )
+
+    response.headers['ETag'] = make_etag(existing_novelist.updated_at)
     return existing_novelist
 
 
@@ -176,8 +415,47 @@ async def remove_novelist(
     response_model=PublicBooksPaginated,
 )
 async def get_books_by_novelist(
-    novelist_id: int, query: AnnotatedBookQueryParams, session: DBSession
+    request: Request,
+    novelist_id: int,
+    query: AnnotatedBookQueryParams,
+    session: ReadSession,
+    redis: T_redis,
 ):
+    normalized = query.model_dump_json()
+    key = f'{novelist_id}:{normalized}'
+    version = await shared_table_version(novelist_reads, session, 'books')
+    if response := list_precondition(request, 'books', version, key):
+        return response
+
+    async def compute(session: AsyncSession) -> Cached:
+        version = await table_version(session, 'books')
+        page = await _read_novelist_books(session, novelist_id, query)
+        return (
+            render_body(BOOKS_PAGE_ADAPTER, page),
+            table_validators('books', version, key),
+        )
+
+    async def load():
+        return await novelist_books_cache.fetch(
+            redis, novelist_books_cache.key(key, version), session, compute
+        )
+
+    body, headers = await novelist_reads.do(f'books:{key}', load)
+    return conditional_response(request, Representation(headers, lambda: body))
+
+
+async def _read_novelist_books(
+    session: AsyncSession, novelist_id: int, query: BookQueryParams
+):
+    if settings.DB_LIST_BACKEND == 'postgres':
+        return await books_repository.render_novelist_books(
+            session, novelist_id, query
+        )
+    if settings.DB_LIST_BACKEND == 'asyncpg':
+        return await books_repository.list_novelist_books(
+            session, novelist_id, query
+        )
+
     offset = query.offset
 
     order_field = BOOK_ORDERABLE_FIELDS[query.order_by]
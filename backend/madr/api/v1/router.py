@@ -1,6 +1,19 @@
 from madr.api.v1.auth import router as auth_router
 from madr.api.v1.books import router as books_router
+from madr.api.v1.events import router as events_router
+from madr.api.v1.health import router as health_router
+from madr.api.v1.jobs import router as jobs_router
+from madr.api.v1.metrics import router as metrics_router
 from madr.api.v1.novelists import router as novelists_router
 from madr.api.v1.users import router as users_router
 
-routers = [users_router, novelists_router, auth_router, books_router]
+routers = [
+    users_router,
+    novelists_router,
+    auth_router,
+    books_router,
+    jobs_router,
+    events_router,
+    health_router,
+    metrics_router,
+]
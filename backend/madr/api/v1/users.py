@@ -5,6 +5,7 @@ from sqlalchemy import delete, select
 from sqlalchemy.exc import IntegrityError
 
 from madr.api.utils import is_unique_violation
+from madr.core.responses import ModelRoute
 from madr.core.security import get_hash
 from madr.dependencies import ActiveUser
 from madr.models.user import User
@@ -17,7 +18,7 @@ from madr.schemas.user import (
 )
 from madr.types import DBSession
 
-router = APIRouter(prefix='/users', tags=['users'])
+router = APIRouter(prefix='/users', tags=['users'], route_class=ModelRoute)
 
 
 @router.post('/', status_code=HTTPStatus.CREATED, response_model=UserPublic)
@@ -27,7 +28,6 @@ async def create_user(user: UserCreate, session: DBSession):
     try:
         session.add(db_user)
         await session.commit()
-        await session.refresh(db_user)
     except IntegrityError as err:
         await session.rollback()
 
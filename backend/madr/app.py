@@ -1,22 +1,83 @@
 import asyncio
 import sys
+from contextlib import asynccontextmanager, nullcontext
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from madr.api.v1.events import catalog_feed
+from madr.api.v1.metrics import pool_collector
 from madr.api.v1.router import routers
 from madr.config import Settings
+from madr.core.admission import (
+    AdmissionMiddleware,
+    LoopLagMonitor,
+    admission_policies,
+)
+from madr.core.database import engine, get_pool_stats, replicas
+from madr.core.deadlines import add_deadline_handlers, query_deadline
+from madr.core.idempotency import IdempotencyMiddleware
+from madr.core.instrumentation import ServerTimingMiddleware, tag_route
+from madr.core.jobs import JobWorker
+from madr.core.lifecycle import InFlightMiddleware
+from madr.core.metrics import MetricsMiddleware, registry
 from madr.core.redis import lifespan as redis_lifespan
+from madr.core.replicas import ReadYourWritesMiddleware
+from madr.core.warmup import warmup
 from madr.schemas import Message
+from madr.tasks import jobs
 
 settings = Settings()  # type: ignore
+loop_lag = LoopLagMonitor(settings.EVENT_LOOP_LAG_INTERVAL)
 
 
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 
-app = FastAPI(lifespan=redis_lifespan)
+def job_worker(redis):
+    if not settings.JOBS_IN_PROCESS:
+        return nullcontext()
+    return JobWorker(
+        jobs,
+        redis,
+        poll_interval=settings.JOBS_POLL_INTERVAL,
+        shutdown_timeout=settings.JOBS_SHUTDOWN_TIMEOUT,
+    ).lifespan()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with (
+        redis_lifespan(app),
+        replicas.lifespan(),
+        registry.lifespan(settings.METRICS_FLUSH_SECONDS),
+        loop_lag.lifespan(),
+        catalog_feed.lifespan(),
+        # por último: o redis e as réplicas já existem
+        warmup.lifespan(
+            [engine, *(replica.engine for replica in replicas.replicas)],
+            app.state.redis,
+            connections=settings.WARMUP_DB_CONNECTIONS
+            or settings.DB_POOL_SIZE,
+            prefill=settings.WARMUP_CACHE_PREFILL,
+            timeout=settings.WARMUP_TIMEOUT_SECONDS,
+            retry_interval=settings.WARMUP_RETRY_SECONDS,
+        ),
+        job_worker(app.state.redis),
+    ):
+        yield
+
+
+app = FastAPI(
+    lifespan=lifespan,
+    dependencies=[
+        Depends(tag_route),
+        Depends(query_deadline, scope='function'),
+    ],
+)
+add_deadline_handlers(app)
+registry.add_collector(pool_collector(app))
 
 
 @app.get('/', response_model=Message)
@@ -25,6 +86,30 @@ async def health():
 
 
 [app.include_router(router) for router in routers]
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths={'/books/', '/novelists/'},
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+    poll_interval=settings.IDEMPOTENCY_POLL_INTERVAL,
+)
+if replicas:
+    app.add_middleware(
+        ReadYourWritesMiddleware,
+        pin_seconds=settings.REPLICA_PIN_SECONDS,
+        secret=settings.SECRET_KEY,
+    )
+if settings.ADMISSION_CONTROL:
+    # dentro do CORS, para o 503 chegar ao navegador com os headers
+    app.add_middleware(
+        AdmissionMiddleware,
+        policies=admission_policies(settings.ADMISSION_POLICIES),
+        bulk=settings.ADMISSION_BULK_ROUTES,
+        retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+        pool_waiting=lambda: get_pool_stats(engine.pool).waiting,
+        loop_lag=loop_lag,
+    )
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins_list,
@@ -32,3 +117,9 @@ app.add_middleware(
     allow_methods=['*'],
     allow_headers=['*'],
 )
+app.add_middleware(
+    ServerTimingMiddleware,
+    repeat_threshold=settings.DB_REPEATED_QUERY_THRESHOLD,
+)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(InFlightMiddleware)
@@ -0,0 +1,78 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from typing import Optional, Sequence
+
+from madr.config import Settings
+from madr.core.lifecycle import available_cpus
+
+settings = Settings()  # type: ignore
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='madr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='sobe a API (um worker por CPU)')
+    serve.add_argument('--host', default=settings.SERVER_HOST)
+    serve.add_argument('--port', type=int, default=settings.SERVER_PORT)
+    serve.add_argument(
+        '--workers',
+        type=int,
+        default=settings.SERVER_WORKERS or available_cpus(),
+        help='padrão: CPUs disponíveis (afinidade e cota do container)',
+    )
+    serve.add_argument(
+        '--graceful-timeout',
+        type=float,
+        default=settings.SERVER_GRACEFUL_TIMEOUT,
+        help='segundos para terminar as requisições em andamento',
+    )
+    serve.add_argument(
+        '--drain-delay',
+        type=float,
+        default=settings.SERVER_DRAIN_DELAY,
+        help='segundos aceitando conexões depois do SIGTERM',
+    )
+    serve.add_argument(
+        '--no-access-log', dest='access_log', action='store_false'
+    )
+
+    commands.add_parser('worker', help='executa os jobs da fila (madr.tasks)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.command == 'worker':
+        from madr.worker import work  # noqa: PLC0415
+
+        return work()
+
+    metrics_dir = None
+    if args.workers > 1 and not settings.METRICS_DIR:
+        # cada worker grava seu snapshot e o /metrics soma todos
+        metrics_dir = tempfile.mkdtemp(prefix='madr-metrics-')
+        os.environ['METRICS_DIR'] = metrics_dir
+
+    from madr.server import serve  # noqa: PLC0415
+
+    try:
+        return serve(
+            args.host,
+            args.port,
+            args.workers,
+            args.graceful_timeout,
+            drain_delay=args.drain_delay,
+            access_log=args.access_log,
+        )
+    finally:
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
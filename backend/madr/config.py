@@ -1,3 +1,4 @@
+from typing import Dict, List, Literal, Tuple
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -18,6 +19,150 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REDIS_URL: str
 
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_POOLER_MODE: Literal['session', 'transaction'] = 'session'
+    DB_LIST_BACKEND: Literal['orm', 'asyncpg', 'postgres'] = 'postgres'
+    DB_STATEMENT_TIMEOUT_MS: int = 30_000
+    DB_ROUTE_TIMEOUTS_MS: Dict[str, int] = {
+        'read_books_by_filter': 5_000,
+        'read_novelists_by': 5_000,
+        'get_books_by_novelist': 5_000,
+    }
+    DB_RETRY_AFTER_SECONDS: int = 1
+    DB_REPEATED_QUERY_THRESHOLD: int = 3
+    DB_UPSERT_MAX_BATCH: int = 1_000
+    DB_WRITE_BATCHING: bool = False
+    DB_WRITE_BATCH_MAX_DELAY_MS: float = 2
+    DB_WRITE_BATCH_SIZE: int = 100
+
+    SLOW_QUERY_THRESHOLD_MS: float = 500
+    SLOW_QUERY_SAMPLE_RATE: float = 0.1
+    SLOW_QUERY_MAX_PENDING: int = 2
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS: int = 10_000
+    SLOW_QUERY_LOG_PATH: str = 'logs/slow_queries.log'
+    SLOW_QUERY_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS: int = 5
+
+    DATABASE_REPLICA_URLS: str = ''
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_HEALTHCHECK_INTERVAL: float = 2
+    REPLICA_PIN_SECONDS: int = 30
+
+    REDIS_MAX_CONNECTIONS: int = 10
+    REDIS_POOL_TIMEOUT: float = 5
+    REDIS_COMMAND_TIMEOUT: float = 0.25
+    REDIS_BREAKER_FAILURES: int = 5
+    REDIS_BREAKER_RESET_SECONDS: float = 10
+
+    CACHE_LOCK_SECONDS: float = 5
+    CACHE_LOCK_WAIT_SECONDS: float = 2
+    CACHE_POLL_INTERVAL: float = 0.02
+    CACHE_XFETCH_BETA: float = 1.0
+    CACHE_TTL_SECONDS: float = 30
+    CACHE_HARD_TTL_SECONDS: float = 10 * 60
+    HTTP_CACHE_CONTROL: Dict[str, str] = {
+        'get_book': 'no-cache',
+        'get_novelist': 'no-cache',
+        'read_books_by_filter': (
+            'public, max-age=5, stale-while-revalidate=30, stale-if-error=600'
+        ),
+        'read_novelists_by': (
+            'public, max-age=5, stale-while-revalidate=30, stale-if-error=600'
+        ),
+        'get_books_by_novelist': (
+            'public, max-age=5, stale-while-revalidate=30, stale-if-error=600'
+        ),
+    }
+
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    IDEMPOTENCY_WAIT_SECONDS: float = 10
+    IDEMPOTENCY_POLL_INTERVAL: float = 0.05
+
+    ADMISSION_CONTROL: bool = True
+    # por classe de rota; bulk (lotes e exportações) é o primeiro a ser
+    # recusado quando o pool de conexões começa a ter fila
+    ADMISSION_POLICIES: Dict[str, Dict[str, float]] = {
+        'read': {
+            'limit': 64,
+            'queue_size': 256,
+            'queue_timeout': 1,
+            'max_pool_waiting': 32,
+            'max_loop_lag': 0.5,
+        },
+        'write': {
+            'limit': 16,
+            'queue_size': 64,
+            'queue_timeout': 2,
+            'max_pool_waiting': 16,
+            'max_loop_lag': 0.5,
+        },
+        'bulk': {
+            'limit': 2,
+            'queue_size': 4,
+            'queue_timeout': 0.5,
+            'max_pool_waiting': 0,
+            'max_loop_lag': 0.1,
+        },
+        'auth': {
+            'limit': 8,
+            'queue_size': 32,
+            'queue_timeout': 2,
+            'max_pool_waiting': 16,
+            'max_loop_lag': 0.25,
+        },
+    }
+    ADMISSION_BULK_ROUTES: List[Tuple[str, str]] = [
+        ('PUT', '/books/by-name'),
+        ('PUT', '/novelists/by-name'),
+        ('POST', '/books/import'),
+    ]
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    EVENT_LOOP_LAG_INTERVAL: float = 0.1
+
+    WARMUP_DB_CONNECTIONS: int = 0  # 0 = DB_POOL_SIZE
+    WARMUP_CACHE_PREFILL: bool = False
+    WARMUP_TIMEOUT_SECONDS: float = 20
+    WARMUP_RETRY_SECONDS: float = 5
+
+    JOBS_IN_PROCESS: bool = True  # False quando há `madr worker`
+    JOBS_CONCURRENCY: Dict[str, int] = {'books.import': 2}
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_BACKOFF_SECONDS: float = 1
+    JOBS_BACKOFF_MAX_SECONDS: float = 5 * 60
+    JOBS_POLL_INTERVAL: float = 0.5
+    JOBS_VISIBILITY_TIMEOUT: float = 60
+    JOBS_SHUTDOWN_TIMEOUT: float = 25
+    JOBS_RESULT_TTL_SECONDS: int = 24 * 60 * 60
+    JOBS_IMPORT_MAX_ITEMS: int = 100_000
+    # o payload vai ao redis em pedaços: um import grande não estoura o
+    # REDIS_COMMAND_TIMEOUT nem abre o circuit breaker
+    JOBS_PAYLOAD_CHUNK_CHARS: int = 256 * 1024
+
+    # LISTEN precisa de sessão: via PgBouncer em modo transaction, aponte
+    # para o postgres direto
+    CATALOG_EVENTS_DATABASE_URL: str = ''
+    CATALOG_EVENTS_BUFFER: int = 256
+    CATALOG_EVENTS_MAX_SUBSCRIBERS: int = 1_000
+    CATALOG_EVENTS_REPLAY_LIMIT: int = 1_000
+    CATALOG_EVENTS_RETENTION_SECONDS: float = 24 * 60 * 60
+    CATALOG_EVENTS_HEARTBEAT_SECONDS: float = 15
+    CATALOG_EVENTS_RETRY_MS: int = 3_000
+    CATALOG_EVENTS_RECONNECT_SECONDS: float = 1
+
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0  # 0 = uma por CPU disponível
+    SERVER_GRACEFUL_TIMEOUT: float = 30
+    SERVER_DRAIN_DELAY: float = 0
+
+    METRICS_DIR: str = ''
+    METRICS_FLUSH_SECONDS: float = 5
+
     CORS_ORIGINS: str
 
     @property
@@ -27,3 +172,8 @@ class Settings(BaseSettings):
 
             return json.loads(self.CORS_ORIGINS)
         return [x.strip() for x in self.CORS_ORIGINS.split(',')]
+
+    @property
+    def database_replica_urls_list(self) -> list[str]:
+        urls = self.DATABASE_REPLICA_URLS.split(',')
+        return [x.strip() for x in urls if x.strip()]
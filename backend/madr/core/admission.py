@@ -0,0 +1,209 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Callable, Deque, Dict, Iterable, Tuple
+
+from madr.core.idempotency import send_json
+from madr.core.metrics import ADMISSION_REQUESTS, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+# rotas que nunca passam pelo controle: o balanceador precisa delas, e os
+# streams SSE ficariam com uma vaga de leitura enquanto durassem (o feed
+# tem o próprio limite de assinantes)
+EXEMPT_PREFIXES = (
+    '/health',
+    '/metrics',
+    '/docs',
+    '/redoc',
+    '/openapi',
+    '/events',
+)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+@dataclass
+class AdmissionPolicy:
+    """
+    limites de uma classe de rota: quantas requisições em andamento, quantas
+    esperando (e por quanto tempo) e a partir de que pressão no pool de
+    conexões ou no event loop a classe passa a ser recusada na entrada
+    """
+
+    limit: int
+    queue_size: int
+    queue_timeout: float
+    max_pool_waiting: int
+    max_loop_lag: float
+
+
+def admission_policies(
+    config: Dict[str, Dict[str, float]],
+) -> Dict[str, AdmissionPolicy]:
+    return {
+        name: AdmissionPolicy(
+            limit=int(values['limit']),
+            queue_size=int(values['queue_size']),
+            queue_timeout=values['queue_timeout'],
+            max_pool_waiting=int(values['max_pool_waiting']),
+            max_loop_lag=values['max_loop_lag'],
+        )
+        for name, values in config.items()
+    }
+
+
+def is_exempt(path: str) -> bool:
+    return path == '/' or path.startswith(EXEMPT_PREFIXES)
+
+
+class Gate:
+    """semáforo com fila limitada, FIFO e prazo de espera"""
+
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return
+        if len(self.waiters) >= self.queue_size:
+            raise Overloaded('queue_full')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            async with asyncio.timeout(self.timeout):
+                await waiter
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # a vaga chegou junto com o prazo: devolve para o próximo
+                self.release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            if isinstance(exc, TimeoutError):
+                raise Overloaded('queue_timeout') from None
+            raise
+
+    def release(self):
+        # a vaga passa direto para quem espera, sem voltar ao contador
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class LoopLagMonitor:
+    """atraso do event loop: quanto um sleep(interval) acorda depois"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lag = 0.0
+
+    def __call__(self) -> float:
+        return self.lag
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(loop.time() - start - self.interval, 0.0)
+            EVENT_LOOP_LAG.set(self.lag)
+
+    @asynccontextmanager
+    async def lifespan(self):
+        task = asyncio.create_task(self.run())
+
+        yield
+
+        task.cancel()
+        self.lag = 0.0
+
+
+def route_class(
+    method: str, path: str, bulk: Iterable[Tuple[str, str]]
+) -> str:
+    if (method, path.rstrip('/')) in bulk:
+        return 'bulk'
+    if path.startswith('/auth') or (method, path) == ('POST', '/users/'):
+        return 'auth'  # argon2: CPU, não banco
+    if method in {'GET', 'HEAD'}:
+        return 'read'
+    return 'write'
+
+
+class AdmissionMiddleware:
+    """
+    limita as requisições em andamento por classe de rota (read, write,
+    bulk, auth) e recusa cedo, com 503 + Retry-After, quando a fila da
+    classe enche ou estoura o prazo, ou quando já há gente demais esperando
+    conexão do pool ou o event loop está atrasado; leituras toleram mais
+    pressão que lotes e exportações, então são as últimas a cair
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        app,
+        policies: Dict[str, AdmissionPolicy],
+        bulk: Iterable[Tuple[str, str]],
+        retry_after: int,
+        pool_waiting: Callable[[], int],
+        loop_lag: Callable[[], float],
+    ):
+        self.app = app
+        self.policies = policies
+        self.bulk = {(method, path.rstrip('/')) for method, path in bulk}
+        self.retry_after = retry_after
+        self.pool_waiting = pool_waiting
+        self.loop_lag = loop_lag
+        self.gates = {
+            name: Gate(policy.limit, policy.queue_size, policy.queue_timeout)
+            for name, policy in policies.items()
+        }
+
+    def pressure(self, policy: AdmissionPolicy):
+        if self.pool_waiting() > policy.max_pool_waiting:
+            raise Overloaded('pool_waiting')
+        if self.loop_lag() > policy.max_loop_lag:
+            raise Overloaded('loop_lag')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or is_exempt(scope['path']):
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope['method'], scope['path'], self.bulk)
+        gate = self.gates[name]
+        try:
+            self.pressure(self.policies[name])
+            await gate.acquire()
+        except Overloaded as exc:
+            ADMISSION_REQUESTS.inc(route_class=name, result=exc.reason)
+            logger.warning('shedding %s request: %s', name, exc.reason)
+            await send_json(
+                send,
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                'Server overloaded',
+                headers=[(b'retry-after', str(self.retry_after).encode())],
+            )
+            return
+
+        ADMISSION_REQUESTS.inc(route_class=name, result='admitted')
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
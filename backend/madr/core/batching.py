@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import RowMapping, Table, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from madr.core.replicas import CURRENT_LSN, parse_lsn, read_after
+
+logger = logging.getLogger(__name__)
+
+Result = Union[RowMapping, Exception]
+
+
+@dataclass
+class PendingWrite:
+    values: Dict[str, Any]
+    future: asyncio.Future
+
+
+class WriteBatcher:
+    """
+    junta INSERTs concorrentes de uma tabela (até max_size ou max_delay)
+    num único INSERT multi-linha e num único commit; cada chamador recebe
+    a própria linha ou o próprio erro (FK, unique, check, tipo)
+    """
+
+    def __init__(
+        self,
+        table: Table,
+        sessionmaker: async_sessionmaker,
+        max_delay: float,
+        max_size: int,
+        track_lsn: bool = False,
+    ):
+        self.table = table
+        self.sessionmaker = sessionmaker
+        self.max_delay = max_delay
+        self.max_size = max_size
+        self.track_lsn = track_lsn
+        self.pending: List[PendingWrite] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, values: Dict[str, Any]) -> RowMapping:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(PendingWrite(values, future))
+
+        if len(self.pending) >= self.max_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_delay, self.flush)
+
+        row, lsn = await future
+
+        # o commit foi em outra sessão: o read-your-writes é desta requisição
+        state = read_after.get()
+        if state is not None:
+            state.write_lsn = max(state.write_lsn, lsn)
+        return row
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+
+        # contexto vazio: o lote não pertence a nenhuma das requisições
+        task = asyncio.get_running_loop().create_task(
+            self.write(batch), context=contextvars.Context()
+        )
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def write(self, batch: List[PendingWrite]):
+        try:
+            results, lsn = await self.insert(batch)
+        except Exception as err:
+            # conexão, timeout...: ninguém do lote pode ficar esperando
+            logger.warning('batched insert into %s failed', self.table.name)
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(err)
+            return
+
+        for pending, result in zip(batch, results):
+            if pending.future.done():  # chamador cancelado
+                continue
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result((result, lsn))
+
+    async def insert(
+        self, batch: List[PendingWrite]
+    ) -> Tuple[List[Result], int]:
+        stmt = insert(self.table).returning(
+            *self.table.c, sort_by_parameter_order=True
+        )
+        async with self.sessionmaker() as session:
+            try:
+                result = await session.execute(
+                    stmt, [pending.values for pending in batch]
+                )
+                results: List[Result] = list(result.mappings().all())
+            except DBAPIError as err:
+                if err.connection_invalidated:
+                    raise
+                # uma linha inválida (FK, unique, check, valor fora do tipo)
+                # derruba o INSERT todo: refaz linha a linha com savepoints,
+                # ainda numa transação só
+                await session.rollback()
+                results = await self.insert_each(session, batch)
+
+            await session.commit()
+            lsn = (
+                parse_lsn(await session.scalar(CURRENT_LSN))
+                if self.track_lsn
+                else 0
+            )
+        return results, lsn
+
+    async def insert_each(
+        self, session: AsyncSession, batch: List[PendingWrite]
+    ) -> List[Result]:
+        stmt = insert(self.table).returning(*self.table.c)
+        results: List[Result] = []
+        for pending in batch:
+            try:
+                async with session.begin_nested():
+                    result = await session.execute(stmt, pending.values)
+                    results.append(result.mappings().one())
+            except DBAPIError as err:
+                if err.connection_invalidated:
+                    raise
+                results.append(err)
+        return results
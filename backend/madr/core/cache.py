@@ -0,0 +1,309 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.config import Settings
+from madr.core.database import async_session
+from madr.core.metrics import CACHE_LOCK_WAIT, CACHE_REQUESTS
+from madr.repositories.generations import TableVersion
+
+logger = logging.getLogger(__name__)
+settings = Settings()  # type: ignore
+
+Cached = Tuple[bytes, Dict[str, str]]  # corpo e cabeçalhos (ex.: ETag)
+Compute = Callable[[AsyncSession], Awaitable[Cached]]
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+STALE = '110 - "Response is Stale"'
+REVALIDATION_FAILED = '111 - "Revalidation Failed"'
+
+# só apaga o lock se ele ainda for nosso (pode ter expirado e trocado de dono)
+RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    headers: Dict[str, str]
+    stored_at: float  # epoch da gravação
+    expiry: float  # epoch do soft TTL; depois disso a entrada é velha
+    delta: float  # quanto custou recalcular
+
+    def dumps(self) -> str:
+        return json.dumps({
+            'body': self.body.decode(),
+            'headers': self.headers,
+            'stored_at': self.stored_at,
+            'expiry': self.expiry,
+            'delta': self.delta,
+        })
+
+    @classmethod
+    def loads(cls, raw: Optional[str]) -> Optional['CacheEntry']:
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return cls(
+            data['body'].encode(),
+            data['headers'],
+            data['stored_at'],
+            data['expiry'],
+            data['delta'],
+        )
+
+    @property
+    def stale(self) -> bool:
+        return time.time() >= self.expiry
+
+    def served(self, warning: Optional[str] = None) -> Cached:
+        if warning is None:
+            return self.body, self.headers
+        age = max(int(time.time() - self.stored_at), 0)
+        return self.body, {**self.headers, 'Age': str(age), 'Warning': warning}
+
+
+def query_key(*parts: str) -> str:
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()[:32]
+
+
+class ReadCache:
+    """
+    cache de respostas já serializadas no redis:
+
+    - fresca (até ttl): servida direto; chaves quentes são renovadas antes
+      de expirar (XFetch)
+    - velha (até hard_ttl): servida na hora com Warning/Age enquanto uma
+      task renova em segundo plano; se o banco falhar, segue servindo. Como
+      a chave tem a geração, a cópia velha é da mesma versão da tabela
+    - ausente: só quem pega o lock recalcula e os outros (de qualquer
+      worker) esperam o resultado
+
+    a geração da tabela entra na chave, então uma escrita torna as entradas
+    antigas inalcançáveis; `bypass` (ex.: requisição fixada no primário
+    depois de uma escrita) lê direto do banco
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        name: str,
+        ttl: float,
+        hard_ttl: float,
+        lock_seconds: float,
+        lock_wait: float,
+        poll_interval: float,
+        sessions: SessionFactory,
+        beta: float = 1.0,
+        bypass: Optional[Callable[[], bool]] = None,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.hard_ttl = max(hard_ttl, ttl)
+        self.lock_seconds = lock_seconds
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+        self.sessions = sessions
+        self.beta = beta
+        self.bypass = bypass
+        # a última geração vista, para a chave quando o banco não responde
+        self.generation = 0
+        self.refreshing: Set[asyncio.Task] = set()
+
+    def key(self, query: str, version: Optional[TableVersion] = None) -> str:
+        if version is not None:
+            self.generation = version[0]
+        return f'cache:{self.name}:{self.generation:x}:{query_key(query)}'
+
+    def expires_early(self, entry: CacheEntry) -> bool:
+        # XFetch: quanto mais caro e mais perto de expirar, mais provável
+        jitter = -entry.delta * self.beta * math.log(1.0 - random.random())
+        return time.time() + jitter >= entry.expiry
+
+    async def fetch(
+        self,
+        redis: Optional[Redis],
+        key: str,
+        session: AsyncSession,
+        compute: Compute,
+    ) -> Cached:
+        bypassed = self.bypass is not None and self.bypass()
+        if redis is None or bypassed:
+            if bypassed:
+                CACHE_REQUESTS.inc(cache=self.name, result='bypass')
+            return await compute(session)
+
+        try:
+            entry = CacheEntry.loads(await redis.get(key))
+        except RedisError:
+            logger.warning('cache %s unavailable', self.name, exc_info=True)
+            return await compute(session)
+
+        if entry is None:
+            return await self.fill(redis, key, session, compute)
+
+        if entry.stale:
+            CACHE_REQUESTS.inc(cache=self.name, result='stale')
+            await self.refresh_in_background(redis, key, compute)
+            return entry.served(STALE)
+
+        if not self.expires_early(entry):
+            CACHE_REQUESTS.inc(cache=self.name, result='hit')
+            return entry.served()
+
+        return await self.refresh(redis, key, entry, session, compute)
+
+    async def fill(
+        self, redis: Redis, key: str, session: AsyncSession, compute: Compute
+    ) -> Cached:
+        """falta: só o dono do lock recalcula, os outros esperam"""
+        token = await self.acquire(redis, key)
+        if token is not None:
+            CACHE_REQUESTS.inc(cache=self.name, result='miss')
+            try:
+                return await self.recompute(redis, key, session, compute)
+            finally:
+                await release_lock(redis, key, token)
+
+        CACHE_REQUESTS.inc(cache=self.name, result='wait')
+        entry = await self.wait(redis, key)
+        if entry is not None:
+            return entry.served()
+        return await compute(session)
+
+    async def refresh(  # noqa: PLR0913, PLR0917
+        self,
+        redis: Redis,
+        key: str,
+        entry: CacheEntry,
+        session: AsyncSession,
+        compute: Compute,
+    ) -> Cached:
+        """renovação antecipada de uma entrada ainda fresca"""
+        token = await self.acquire(redis, key)
+        if token is None:
+            # outro processo já está renovando: a entrada ainda vale
+            CACHE_REQUESTS.inc(cache=self.name, result='hit')
+            return entry.served()
+
+        CACHE_REQUESTS.inc(cache=self.name, result='refresh')
+        try:
+            return await self.recompute(redis, key, session, compute)
+        except SQLAlchemyError:
+            logger.warning('db error refreshing %s', key, exc_info=True)
+            return entry.served(REVALIDATION_FAILED)
+        finally:
+            await release_lock(redis, key, token)
+
+    async def refresh_in_background(
+        self, redis: Redis, key: str, compute: Compute
+    ):
+        token = await self.acquire(redis, key)
+        if token is None:
+            return  # alguém (deste ou de outro worker) já está renovando
+
+        async def refresh():
+            try:
+                async with self.sessions() as session:
+                    await self.recompute(redis, key, session, compute)
+            except Exception:
+                # ninguém espera esta task: a entrada velha segue valendo até
+                # o hard TTL e a próxima leitura tenta de novo
+                logger.warning('could not refresh %s', key, exc_info=True)
+            finally:
+                await release_lock(redis, key, token)
+
+        # contexto vazio: a renovação não pertence à requisição que a disparou
+        task = asyncio.get_running_loop().create_task(
+            refresh(), context=contextvars.Context()
+        )
+        self.refreshing.add(task)
+        task.add_done_callback(self.refreshing.discard)
+
+    async def recompute(
+        self, redis: Redis, key: str, session: AsyncSession, compute: Compute
+    ) -> Cached:
+        start = time.perf_counter()
+        body, headers = await compute(session)
+        delta = time.perf_counter() - start
+        now = time.time()
+        entry = CacheEntry(body, headers, now, now + self.ttl, delta)
+        try:
+            await redis.set(key, entry.dumps(), px=int(self.hard_ttl * 1000))
+        except RedisError:
+            logger.warning('could not store %s', key, exc_info=True)
+        return body, headers
+
+    async def acquire(self, redis: Redis, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        try:
+            acquired = await redis.set(
+                f'{key}:lock', token, nx=True, px=int(self.lock_seconds * 1000)
+            )
+        except RedisError:
+            # sem lock não há como coordenar: calcula por conta própria
+            return token
+        return token if acquired else None
+
+    async def wait(self, redis: Redis, key: str) -> Optional[CacheEntry]:
+        """espera quem tem o lock gravar a entrada (ou desistir)"""
+        start = time.perf_counter()
+        deadline = start + self.lock_wait
+        try:
+            while time.perf_counter() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                entry = CacheEntry.loads(await redis.get(key))
+                if entry is not None:
+                    return entry
+                if not await redis.exists(f'{key}:lock'):
+                    # gravou e soltou entre as duas leituras, ou falhou
+                    return CacheEntry.loads(await redis.get(key))
+        except RedisError:
+            logger.warning('cache %s unavailable', self.name, exc_info=True)
+        finally:
+            CACHE_LOCK_WAIT.observe(
+                time.perf_counter() - start, cache=self.name
+            )
+        return None
+
+
+async def release_lock(redis: Redis, key: str, token: str):
+    try:
+        await redis.eval(RELEASE_LOCK, 1, f'{key}:lock', token)
+    except RedisError:
+        logger.warning('could not release %s:lock', key, exc_info=True)
+
+
+def read_cache(
+    name: str, bypass: Optional[Callable[[], bool]] = None
+) -> ReadCache:
+    return ReadCache(
+        name,
+        ttl=settings.CACHE_TTL_SECONDS,
+        hard_ttl=settings.CACHE_HARD_TTL_SECONDS,
+        lock_seconds=settings.CACHE_LOCK_SECONDS,
+        lock_wait=settings.CACHE_LOCK_WAIT_SECONDS,
+        poll_interval=settings.CACHE_POLL_INTERVAL,
+        # no primário: uma réplica atrasada gravaria dados mais velhos que a
+        # geração que já está na chave
+        sessions=async_session,
+        beta=settings.CACHE_XFETCH_BETA,
+        bypass=bypass,
+    )
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import cached_property, partial
+from http import HTTPStatus
+from typing import Callable, Dict, Optional
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.config import Settings
+from madr.core.cache import query_key
+from madr.core.metrics import CONDITIONAL_REQUESTS
+from madr.core.responses import PydanticJSONResponse
+from madr.core.singleflight import SingleFlight
+from madr.repositories.generations import TableVersion, try_table_version
+
+settings = Settings()  # type: ignore
+
+
+@dataclass
+class Representation:
+    """
+    validadores + corpo sob demanda: um 304 não serializa nada, e quem
+    compartilha a mesma representação (single-flight) serializa uma vez só
+    """
+
+    headers: Dict[str, str]
+    render: Callable[[], bytes]
+
+    @cached_property
+    def body(self) -> bytes:
+        return self.render()
+
+
+def http_date(moment: datetime) -> str:
+    # as colunas são timestamptz: o asyncpg devolve datetimes com fuso
+    return format_datetime(moment.astimezone(UTC), usegmt=True)
+
+
+def validators(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {'ETag': etag}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def generation_etag(table: str, generation: int, *parts: str) -> str:
+    """ETag forte de uma listagem: muda a cada escrita na tabela"""
+    return f'"{table}.{generation:x}.{query_key(*parts)[:12]}"'
+
+
+def table_validators(
+    table: str, version: TableVersion, *parts: str
+) -> Dict[str, str]:
+    generation, changed_at = version
+    return validators(generation_etag(table, generation, *parts), changed_at)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """o If-None-Match usa a comparação fraca (ignora o W/)"""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(
+        tag.strip().removeprefix('W/') == opaque
+        for tag in if_none_match.split(',')
+    )
+
+
+def modified_since(if_modified_since: str, last_modified: str) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return True  # data inválida: o cabeçalho é ignorado
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    return parsedate_to_datetime(last_modified) > since
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    # com If-None-Match presente, o If-Modified-Since é ignorado
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return 'ETag' in headers and etag_matches(
+            if_none_match, headers['ETag']
+        )
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None or 'Last-Modified' not in headers:
+        return False
+    return not modified_since(if_modified_since, headers['Last-Modified'])
+
+
+def cache_control(request: Request) -> Dict[str, str]:
+    route = request.scope.get('route')
+    directives = settings.HTTP_CACHE_CONTROL.get(getattr(route, 'name', None))
+    return {'Cache-Control': directives} if directives else {}
+
+
+def not_modified(request: Request, headers: Dict[str, str]) -> Response:
+    CONDITIONAL_REQUESTS.inc(result='not_modified')
+    return Response(
+        status_code=HTTPStatus.NOT_MODIFIED,
+        headers={**headers, **cache_control(request)},
+    )
+
+
+def conditional_response(
+    request: Request, representation: Representation
+) -> Response:
+    if is_not_modified(request, representation.headers):
+        return not_modified(request, representation.headers)
+
+    CONDITIONAL_REQUESTS.inc(result='full')
+    return PydanticJSONResponse(
+        representation.body,
+        headers={**representation.headers, **cache_control(request)},
+    )
+
+
+async def shared_table_version(
+    flights: SingleFlight, session: AsyncSession, table: str
+) -> Optional[TableVersion]:
+    """
+    geração da tabela (uma leitura por chave primária, compartilhada entre
+    as requisições em andamento); None com o banco fora
+    """
+    return await flights.do(
+        f'version:{table}', partial(try_table_version, session, table)
+    )
+
+
+def list_precondition(
+    request: Request,
+    table: str,
+    version: Optional[TableVersion],
+    *parts: str,
+) -> Optional[Response]:
+    """304 de uma listagem só com a geração, antes do cache ou da página"""
+    if version is None:
+        return None
+    headers = table_validators(table, version, *parts)
+    if is_not_modified(request, headers):
+        return not_modified(request, headers)
+    return None
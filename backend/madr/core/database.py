@@ -1,21 +1,178 @@
+import time
+from contextlib import contextmanager
+from typing import Annotated, Any, Optional, Sequence
+from uuid import uuid4
+
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool
 
 from madr.config import Settings
+from madr.core.instrumentation import record_query
+from madr.core.metrics import WaitTimeGauge
+from madr.core.replicas import (
+    Replica,
+    ReplicaSet,
+    WriteTrackingSession,
+    read_after,
+)
+from madr.core.slow_queries import UNOBSERVED, SlowQueryLog
+from madr.schemas.health import PoolStats
+
+settings = Settings()  # type: ignore
+slow_queries = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    sample_rate=settings.SLOW_QUERY_SAMPLE_RATE,
+    max_pending=settings.SLOW_QUERY_MAX_PENDING,
+    explain_timeout_ms=settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS,
+    path=settings.SLOW_QUERY_LOG_PATH,
+    max_bytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+    backups=settings.SLOW_QUERY_LOG_BACKUPS,
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = WaitTimeGauge()
+
+    def _do_get(self):
+        with self.wait_time.measure():
+            return super()._do_get()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(  # noqa: PLR0913, PLR0917
+    conn, cursor, statement, parameters, context, many
+):
+    context.query_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(  # noqa: PLR0913, PLR0917
+    conn, cursor, statement, parameters, context, many
+):
+    if context.execution_options.get(UNOBSERVED):
+        return
+    elapsed = time.perf_counter() - context.query_started_at
+    record_query(statement, elapsed)
+    if not many:
+        slow_queries.observe(conn.engine, statement, parameters, elapsed)
+
+
+@contextmanager
+def timed_query(
+    session: AsyncSession,
+    statement: str,
+    parameters: Optional[Sequence[Any]] = None,
+):
+    """para consultas feitas direto no asyncpg, fora dos eventos do engine"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record_query(statement, elapsed)
+        slow_queries.observe(
+            session.get_bind(), statement, parameters, elapsed
+        )
+
+
+def prepared_statement_name() -> str:
+    return f'__asyncpg_{uuid4()}__'
 
-engine = create_async_engine(
-    Settings().DATABASE_URL,  # type: ignore
-    echo=False,
-    pool_pre_ping=True,
+
+def engine_options() -> dict:
+    if settings.DB_POOLER_MODE == 'transaction':
+        # PgBouncer em modo transaction: cada transação pode cair em outra
+        # conexão do servidor, então nada de pool local, statements nomeados
+        # reaproveitados ou estado de sessão
+        return {
+            'poolclass': NullPool,
+            'connect_args': {
+                'statement_cache_size': 0,
+                'prepared_statement_cache_size': 0,
+                'prepared_statement_name_func': prepared_statement_name,
+            },
+        }
+
+    return {
+        'pool_pre_ping': True,
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'connect_args': {
+            'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE
+        },
+    }
+
+
+def create_engine(url: str):
+    return create_async_engine(url, echo=False, **engine_options())
+
+
+def create_replica(url: str) -> Replica:
+    replica_engine = create_engine(url)
+    return Replica(
+        url=url,
+        engine=replica_engine,
+        sessionmaker=async_sessionmaker(
+            replica_engine, class_=AsyncSession, expire_on_commit=False
+        ),
+    )
+
+
+engine = create_engine(settings.DATABASE_URL)
+replicas = ReplicaSet(
+    [create_replica(url) for url in settings.database_replica_urls_list],
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    interval=settings.REPLICA_HEALTHCHECK_INTERVAL,
 )
 async_session = async_sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
+    engine,
+    class_=WriteTrackingSession if replicas else AsyncSession,
+    expire_on_commit=False,
 )
 
 
+def get_pool_stats(pool: Pool) -> PoolStats:
+    if not isinstance(pool, InstrumentedQueuePool):
+        return PoolStats()
+
+    wait_time = pool.wait_time
+    return PoolStats(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        waiting=wait_time.waiting,
+        wait_count=wait_time.count,
+        wait_avg=wait_time.avg,
+        wait_max=wait_time.max,
+    )
+
+
 async def get_session():  # pragma: no cover
     async with async_session() as session:
         yield session
+
+
+async def get_read_session(
+    session: Annotated[AsyncSession, Depends(get_session)],
+):
+    state = read_after.get()
+    replica = replicas.choose(state.min_lsn if state else 0)
+    if replica is None:
+        yield session
+        return
+
+    async with replica.sessionmaker() as replica_session:
+        yield replica_session
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import Optional
+
+from asyncpg.exceptions import QueryCanceledError
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+
+from madr.api.utils import is_query_timeout
+from madr.config import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()  # type: ignore
+
+statement_timeout: ContextVar[Optional[int]] = ContextVar(
+    'statement_timeout', default=None
+)
+
+
+@event.listens_for(Session, 'after_begin')
+def set_statement_timeout(session, transaction, connection):
+    """
+    SET LOCAL vale só para a transação, então não vaza para a próxima
+    requisição que pegar a conexão (nem atravessa o PgBouncer)
+    """
+    timeout = statement_timeout.get()
+    if timeout:
+        connection.exec_driver_sql(
+            f'SET LOCAL statement_timeout = {int(timeout)}'
+        )
+
+
+def route_timeout(request: Request) -> int:
+    route = request.scope.get('route')
+    name = getattr(route, 'name', None)
+    return settings.DB_ROUTE_TIMEOUTS_MS.get(
+        name, settings.DB_STATEMENT_TIMEOUT_MS
+    )
+
+
+# só leituras são canceladas quando o cliente cai: uma escrita no meio do
+# commit termina e responde normalmente
+CANCELLABLE_METHODS = {'GET', 'HEAD'}
+# status do nginx para "o cliente fechou a conexão"; ninguém vai ler, mas
+# aparece assim nos logs e nas métricas
+CLIENT_CLOSED_REQUEST = 499
+
+
+class QueryTimeout(Exception):
+    """o statement_timeout da rota estourou (SQLSTATE 57014)"""
+
+
+class ClientDisconnected(Exception):
+    """o cliente desconectou e a leitura em andamento foi cancelada"""
+
+
+async def cancel_on_disconnect(request: Request, task: asyncio.Task):
+    while True:
+        message = await request.receive()
+        if message['type'] == 'http.disconnect':
+            logger.info('client disconnected, cancelling %s', request.url)
+            task.cancel()
+            return
+
+
+async def query_deadline(request: Request):
+    """
+    aplica o orçamento de statement_timeout da rota e, nas leituras,
+    cancela a consulta em andamento se o cliente desconectar
+    """
+    token = statement_timeout.set(route_timeout(request))
+    task = asyncio.current_task()
+    watcher = None
+    if request.method in CANCELLABLE_METHODS:
+        watcher = asyncio.create_task(
+            cancel_on_disconnect(request, task)  # type: ignore
+        )
+    try:
+        yield
+    except asyncio.CancelledError:
+        if watcher is None or not watcher.done() or watcher.cancelled():
+            raise
+        # o cancelamento foi nosso: vira uma resposta comum em vez de uma
+        # exceção solta no servidor
+        task.uncancel()  # type: ignore
+        raise ClientDisconnected from None
+    except DBAPIError as exc:
+        if not is_query_timeout(exc):
+            raise
+        raise QueryTimeout from exc
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        statement_timeout.reset(token)
+
+
+async def query_timeout_handler(request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=HTTPStatus.GATEWAY_TIMEOUT,
+        content={'detail': 'Query timed out'},
+    )
+
+
+async def client_disconnected_handler(request: Request, exc: Exception):
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+async def pool_timeout_handler(request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        content={'detail': 'Database busy'},
+        headers={'Retry-After': str(settings.DB_RETRY_AFTER_SECONDS)},
+    )
+
+
+def add_deadline_handlers(app: FastAPI):
+    app.add_exception_handler(QueryTimeout, query_timeout_handler)
+    # consultas feitas direto no asyncpg (repositories.fetch)
+    app.add_exception_handler(QueryCanceledError, query_timeout_handler)
+    app.add_exception_handler(ClientDisconnected, client_disconnected_handler)
+    app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import asyncpg
+from sqlalchemy import cast, delete, func, select
+from sqlalchemy.dialects.postgresql import REGCLASS
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from madr.core.metrics import CATALOG_SUBSCRIBERS
+from madr.models.catalog_event import CatalogEvent
+
+logger = logging.getLogger(__name__)
+
+Event = Dict[str, Any]
+
+EVENT_COLUMNS = (
+    CatalogEvent.id,
+    CatalogEvent.table_name,
+    CatalogEvent.operation,
+    CatalogEvent.row_id,
+    CatalogEvent.data,
+)
+# ids de eventos já repassados, para não entregar duas vezes o que chegou
+# pelo NOTIFY e pela leitura da tabela depois de reconectar
+RECENT_IDS = 1024
+# eventos por leitura ao recuperar o que passou com o listener desligado
+CATCH_UP_PAGE = 500
+# menor id na tabela e último id que a sequence já entregou: com a tabela
+# vazia pela retenção, só a sequence diz que houve eventos
+HISTORY = select(
+    func.min(CatalogEvent.id),
+    func.pg_sequence_last_value(
+        cast(
+            func.pg_get_serial_sequence(CatalogEvent.__tablename__, 'id'),
+            REGCLASS,
+        )
+    ),
+)
+# de quanto em quanto tempo o listener confirma que a conexão está viva
+KEEPALIVE_SECONDS = 10
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+def asyncpg_dsn(url: str) -> str:
+    return (
+        make_url(url)
+        .set(drivername='postgresql')
+        .render_as_string(hide_password=False)
+    )
+
+
+class Subscriber:
+    def __init__(self, buffer: int):
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(buffer)
+        self.overflowed = False
+
+    def push(self, event: Event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # cliente lento: a conexão fecha e ele volta pelo Last-Event-ID
+            self.overflowed = True
+
+
+class CatalogFeed:
+    """
+    um LISTEN por worker numa conexão dedicada (fora do pool): os NOTIFY
+    dos triggers de books/novelists vão para a fila de cada assinante.
+    A tabela catalog_events cobre o resto: retomada pelo Last-Event-ID e o
+    que foi gravado enquanto o listener estava desconectado
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        dsn: str,
+        channel: str,
+        sessionmaker: async_sessionmaker,
+        buffer: int,
+        max_subscribers: int,
+        replay_limit: int,
+        retention_seconds: float,
+        reconnect_interval: float,
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.sessionmaker = sessionmaker
+        self.buffer = buffer
+        self.max_subscribers = max_subscribers
+        self.replay_limit = replay_limit
+        self.retention_seconds = retention_seconds
+        self.reconnect_interval = reconnect_interval
+        self.subscribers: Set[Subscriber] = set()
+        self.inbox: asyncio.Queue[str] = asyncio.Queue()
+        self.recent: OrderedDict[int, None] = OrderedDict()
+        self.last_id = 0
+        self.listening = asyncio.Event()
+
+    def subscribe(self) -> Subscriber:
+        if len(self.subscribers) >= self.max_subscribers:
+            raise TooManySubscribers
+        subscriber = Subscriber(self.buffer)
+        self.subscribers.add(subscriber)
+        CATALOG_SUBSCRIBERS.set(len(self.subscribers))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        CATALOG_SUBSCRIBERS.set(len(self.subscribers))
+
+    def publish(self, event: Event):
+        if event['id'] in self.recent:
+            return
+        self.recent[event['id']] = None
+        if len(self.recent) > RECENT_IDS:
+            self.recent.popitem(last=False)
+        self.last_id = max(self.last_id, event['id'])
+
+        for subscriber in self.subscribers:
+            subscriber.push(event)
+
+    async def events_after(
+        self, last_id: int, limit: Optional[int] = None
+    ) -> List[Event]:
+        stmt = (
+            select(*EVENT_COLUMNS)
+            .where(CatalogEvent.id > last_id)
+            .order_by(CatalogEvent.id)
+            .limit(limit)
+        )
+        async with self.sessionmaker() as session:
+            return [
+                dict(row) for row in (await session.execute(stmt)).mappings()
+            ]
+
+    async def replay(self, last_id: int) -> Optional[List[Event]]:
+        """
+        eventos depois de last_id, ou None se não dá para reconstruir
+        (já foram apagados pela retenção ou são mais que replay_limit)
+        """
+        async with self.sessionmaker() as session:
+            oldest, issued = (await session.execute(HISTORY)).one()
+        if oldest is None:
+            oldest = (issued or 0) + 1
+        if last_id < oldest - 1:
+            return None
+
+        events = await self.events_after(last_id, self.replay_limit + 1)
+        if len(events) > self.replay_limit:
+            return None
+        return events
+
+    async def catch_up(self):
+        if not self.last_id:
+            # primeira conexão: o feed começa agora
+            async with self.sessionmaker() as session:
+                latest = await session.scalar(
+                    select(func.max(CatalogEvent.id))
+                )
+            self.last_id = latest or 0
+            return
+        after = self.last_id
+        while events := await self.events_after(after, CATCH_UP_PAGE):
+            for event in events:
+                self.publish(event)
+            after = events[-1]['id']
+
+    def on_notify(self, connection, pid, channel, payload: str):
+        self.inbox.put_nowait(payload)
+
+    async def load(self, notice: Event) -> List[Event]:
+        """o NOTIFY de um comando com vários eventos leva só os ids"""
+        first, last = notice['id'], notice.get('last', notice['id'])
+        events = await self.events_after(first - 1, last - first + 1)
+        # ids de outras transações podem cair no meio: o recent descarta
+        # os repetidos e os ainda não commitados chegam pelo NOTIFY deles
+        return [event for event in events if event['id'] <= last]
+
+    async def dispatch(self):
+        while True:
+            notice = json.loads(await self.inbox.get())
+            if 'data' in notice:
+                self.publish(notice)
+                continue
+            try:
+                events = await self.load(notice)
+            except Exception:
+                logger.exception('could not load events %s', notice)
+                continue
+            for event in events:
+                self.publish(event)
+
+    async def listen(self):
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            await connection.add_listener(self.channel, self.on_notify)
+            await self.catch_up()
+            self.listening.set()
+            logger.info('listening on %s', self.channel)
+            while not connection.is_closed():
+                await asyncio.sleep(KEEPALIVE_SECONDS)
+                await connection.execute('SELECT 1')
+        finally:
+            self.listening.clear()
+            await connection.close(timeout=1)
+
+    async def listen_forever(self):
+        while True:
+            try:
+                await self.listen()
+            except Exception:
+                logger.warning('catalog listener lost', exc_info=True)
+            await asyncio.sleep(self.reconnect_interval)
+
+    async def prune_forever(self):
+        while True:
+            try:
+                async with self.sessionmaker() as session:
+                    retention = timedelta(seconds=self.retention_seconds)
+                    await session.execute(
+                        delete(CatalogEvent).where(
+                            CatalogEvent.created_at < func.now() - retention
+                        )
+                    )
+                    await session.commit()
+            except Exception:
+                logger.exception('could not prune catalog events')
+            await asyncio.sleep(min(self.retention_seconds / 10, 3600))
+
+    @asynccontextmanager
+    async def lifespan(self):
+        tasks = [
+            asyncio.create_task(self.dispatch()),
+            asyncio.create_task(self.listen_forever()),
+            asyncio.create_task(self.prune_forever()),
+        ]
+
+        yield
+
+        for task in tasks:
+            task.cancel()
+        # o finally do listen fecha a conexão do LISTEN
+        await asyncio.wait(tasks)
@@ -0,0 +1,287 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from http import HTTPStatus
+from typing import Iterable, List, Optional
+
+from redis.exceptions import RedisError
+from starlette.datastructures import Headers
+
+from madr.core.metrics import record_cache
+from madr.core.security import token_subject
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'idempotency-key'
+REPLAYED_HEADER = 'idempotent-replayed'
+MAX_KEY_LENGTH = 255
+# só o que descreve a resposta; cookies, server-timing etc. são da
+# requisição e ficam com os middlewares de fora
+STORED_HEADERS = {b'content-type', b'location', b'etag'}
+
+
+def digest(*parts: bytes) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part)
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def encode_headers(headers: List[tuple]) -> List[List[str]]:
+    return [
+        [name.decode('latin-1'), value.decode('latin-1')]
+        for name, value in headers
+        if name.lower() in STORED_HEADERS
+    ]
+
+
+def decode_headers(headers: List[List[str]]) -> List[tuple]:
+    return [
+        (name.encode('latin-1'), value.encode('latin-1'))
+        for name, value in headers
+    ]
+
+
+async def send_json(send, status: int, detail: str, headers=()):
+    body = json.dumps({'detail': detail}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class IdempotencyMiddleware:
+    """
+    POSTs com Idempotency-Key: a primeira resposta (status, headers e
+    corpo) fica no redis e é devolvida igual nas repetições; repetições
+    concorrentes esperam o marcador "pending" em vez de ir ao postgres
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        app,
+        paths: Iterable[str],
+        ttl_seconds: int,
+        lock_seconds: int,
+        wait_seconds: float,
+        poll_interval: float,
+    ):
+        self.app = app
+        self.paths = set(paths)
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_interval = poll_interval
+
+    async def __call__(self, scope, receive, send):
+        if not self.applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        key = headers[HEADER]
+        redis = scope['app'].state.redis
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await send_json(
+                send, HTTPStatus.BAD_REQUEST, 'Invalid Idempotency-Key'
+            )
+            return
+
+        subject = token_subject(headers.get('authorization', ''))
+        if subject is None:
+            # sem usuário não há escopo para a chave; a rota responde 401
+            await self.app(scope, receive, send)
+            return
+
+        body = await read_body(receive)
+        # a chave vale por usuário (sobrevive a um token renovado), e a
+        # mesma chave com outro corpo é erro
+        redis_key = f'idempotency:{subject}:{key}'
+        fingerprint = digest(
+            scope['method'].encode(), scope['path'].encode(), body
+        )
+
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            try:
+                acquired = await self.acquire(redis, redis_key, fingerprint)
+            except RedisError:
+                logger.warning('idempotency store unavailable', exc_info=True)
+                await self.app(scope, replay_body(body, receive), send)
+                return
+
+            if acquired:
+                record_cache('idempotency', hit=False)
+                await self.run_and_store(
+                    redis,
+                    redis_key,
+                    fingerprint,
+                    scope,
+                    replay_body(body, receive),
+                    send,
+                )
+                return
+
+            record_cache('idempotency', hit=True)
+            stored = await self.wait_for_response(
+                redis, redis_key, fingerprint, deadline
+            )
+            # None: a primeira falhou e liberou a chave; esta assume
+            if stored is not None:
+                break
+
+        if stored['fingerprint'] != fingerprint:
+            await send_json(
+                send,
+                HTTPStatus.UNPROCESSABLE_ENTITY,
+                'Idempotency-Key reused with a different payload',
+            )
+        elif stored['state'] == 'pending':
+            await send_json(
+                send,
+                HTTPStatus.CONFLICT,
+                'Request with this Idempotency-Key is still in progress',
+                [(b'retry-after', b'1')],
+            )
+        else:
+            await replay(stored, send)
+
+    async def acquire(self, redis, redis_key: str, fingerprint: str) -> bool:
+        return await redis.set(
+            redis_key,
+            json.dumps({'state': 'pending', 'fingerprint': fingerprint}),
+            nx=True,
+            ex=self.lock_seconds,
+        )
+
+    def applies(self, scope) -> bool:
+        # sem redis (ex.: testes sem lifespan) a requisição segue normal
+        return (
+            scope['type'] == 'http'
+            and scope['method'] == 'POST'
+            and scope['path'] in self.paths
+            and HEADER in Headers(scope=scope)
+            and getattr(scope['app'].state, 'redis', None) is not None
+        )
+
+    async def run_and_store(  # noqa: PLR0913, PLR0917
+        self, redis, redis_key, fingerprint, scope, receive, send
+    ):
+        status = HTTPStatus.INTERNAL_SERVER_ERROR
+        response_headers: List[tuple] = []
+        chunks: List[bytes] = []
+
+        async def send_and_capture(message):
+            nonlocal status, response_headers
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                response_headers = list(message.get('headers', []))
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_capture)
+        finally:
+            await self.store(
+                redis,
+                redis_key,
+                {
+                    'state': 'done',
+                    'fingerprint': fingerprint,
+                    'status': int(status),
+                    'headers': encode_headers(response_headers),
+                    'body': base64.b64encode(b''.join(chunks)).decode(),
+                },
+            )
+
+    async def store(self, redis, redis_key: str, response: dict):
+        try:
+            if response['status'] >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                # falha do servidor não é resposta definitiva: libera a chave
+                await redis.delete(redis_key)
+            else:
+                await redis.set(
+                    redis_key, json.dumps(response), ex=self.ttl_seconds
+                )
+        except RedisError:
+            logger.warning(
+                'could not store idempotent response', exc_info=True
+            )
+
+    async def wait_for_response(
+        self, redis, redis_key: str, fingerprint: str, deadline: float
+    ) -> Optional[dict]:
+        """
+        espera o marcador "pending" virar resposta; devolve None se a chave
+        sumiu (a primeira requisição falhou) e o próprio marcador se o
+        prazo acabou ou o redis caiu
+        """
+        pending = {'state': 'pending', 'fingerprint': fingerprint}
+        while True:
+            try:
+                raw = await redis.get(redis_key)
+            except RedisError:
+                logger.warning('idempotency store unavailable', exc_info=True)
+                return pending
+            stored = json.loads(raw) if raw else None
+            if (
+                stored is None
+                or stored['state'] == 'done'
+                or stored['fingerprint'] != fingerprint
+            ):
+                return stored
+            if time.monotonic() >= deadline:
+                return stored
+            await asyncio.sleep(self.poll_interval)
+
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+def replay_body(body: bytes, receive):
+    """entrega o corpo já lido; depois repassa (ex.: http.disconnect)"""
+    sent = False
+
+    async def replay_receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return await receive()
+
+    return replay_receive
+
+
+async def replay(stored: dict, send):
+    body = base64.b64decode(stored['body'])
+    await send({
+        'type': 'http.response.start',
+        'status': stored['status'],
+        'headers': [
+            *decode_headers(stored['headers']),
+            (b'content-length', str(len(body)).encode()),
+            (REPLAYED_HEADER.encode(), b'true'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,141 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestTimings:
+    """tempos acumulados durante uma requisição (em segundos)"""
+
+    queries: int = 0
+    db: float = 0.0
+    redis_commands: int = 0
+    redis: float = 0.0
+    serialization: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    route: Optional[str] = None
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= threshold
+        }
+
+    def server_timing(self, total: float) -> str:
+        return ', '.join((
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"',
+            f'redis;dur={self.redis * 1000:.2f};'
+            f'desc="{self.redis_commands} commands"',
+            f'serialize;dur={self.serialization * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ))
+
+
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    'request_timings', default=None
+)
+
+
+def record_query(statement: str, elapsed: float):
+    timings = request_timings.get()
+    if timings is None:
+        return
+    timings.queries += 1
+    timings.db += elapsed
+    timings.statements[statement] += 1
+
+
+def record_redis(elapsed: float):
+    timings = request_timings.get()
+    if timings is None:
+        return
+    timings.redis_commands += 1
+    timings.redis += elapsed
+
+
+def record_serialization(elapsed: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings.serialization += elapsed
+
+
+async def tag_route(request: Request):
+    """guarda o nome da rota (ex.: read_books_by_filter) para os logs"""
+    timings = request_timings.get()
+    if timings is not None:
+        timings.route = getattr(request.scope.get('route'), 'name', None)
+
+
+class ServerTimingMiddleware:
+    """
+    coleta consultas, redis e serialização da requisição, devolve no
+    header Server-Timing e registra uma linha de log em JSON
+    """
+
+    def __init__(self, app, repeat_threshold: int):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        start = time.perf_counter()
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'Server-Timing',
+                    timings.server_timing(time.perf_counter() - start),
+                )
+            await send(message)
+
+        token = request_timings.set(timings)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            self.log(scope, status, timings, time.perf_counter() - start)
+
+    def log(self, scope, status, timings: RequestTimings, total: float):
+        repeated = timings.repeated(self.repeat_threshold)
+        for statement, count in repeated.items():
+            logger.warning(
+                'possible N+1 in %s %s: %d x %s',
+                scope['method'],
+                scope['path'],
+                count,
+                statement,
+            )
+
+        logger.info(
+            json.dumps({
+                'method': scope['method'],
+                'path': scope['path'],
+                'route': timings.route,
+                'status': status,
+                'duration_ms': round(total * 1000, 2),
+                'db_queries': timings.queries,
+                'db_ms': round(timings.db * 1000, 2),
+                'redis_commands': timings.redis_commands,
+                'redis_ms': round(timings.redis * 1000, 2),
+                'serialization_ms': round(timings.serialization * 1000, 2),
+                'repeated_queries': len(repeated),
+            })
+        )
@@ -0,0 +1,453 @@
+"""
+fila de jobs no redis para trabalho que não cabe numa requisição
+
+    jobs:job:{id}         hash com status, tentativas, progresso e resultado
+    jobs:payload:{id}     payload em JSON, em pedaços de payload_chunk
+    jobs:queue:{type}     ids esperando (FIFO)
+    jobs:running:{type}   ids em execução; o tamanho é o limite por tipo
+    jobs:delayed          retentativas agendadas (score = quando rodar)
+
+o limite de concorrência vale para todos os workers juntos, e um job cujo
+worker morreu (sem heartbeat) volta para a fila
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from uuid import uuid4
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+RETRYING = 'retrying'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# o hash e a entrada na fila juntos: sem job órfão nem id sem hash
+ENQUEUE = """
+redis.call('hset', KEYS[1], unpack(ARGV, 2))
+redis.call('lpush', KEYS[2], ARGV[1])
+"""
+
+# só pega um job se o tipo ainda tem vaga (tamanho da lista running)
+CLAIM = """
+if redis.call('llen', KEYS[2]) >= tonumber(ARGV[1]) then
+    return false
+end
+local id = redis.call('lmove', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+if id then
+    local key = ARGV[2] .. id
+    redis.call('hset', key, 'status', 'running', 'heartbeat', ARGV[3],
+        'updated_at', ARGV[3])
+    redis.call('hincrby', key, 'attempts', 1)
+end
+return id
+"""
+
+# retentativas vencidas voltam para a fila do seu tipo
+PROMOTE = """
+local due = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1],
+    'LIMIT', 0, 100)
+for _, member in ipairs(due) do
+    redis.call('zrem', KEYS[1], member)
+    local kind, id = string.match(member, '^(.*):([^:]+)$')
+    redis.call('hset', ARGV[3] .. id, 'status', 'queued')
+    redis.call('lpush', ARGV[2] .. kind, id)
+end
+return #due
+"""
+
+# running sem heartbeat recente: o worker morreu, volta para a frente da fila
+RECOVER = """
+local moved = 0
+for _, id in ipairs(redis.call('lrange', KEYS[1], 0, -1)) do
+    local key = ARGV[2] .. id
+    local status = redis.call('hget', key, 'status')
+    local beat = tonumber(redis.call('hget', key, 'heartbeat') or '0')
+    if status ~= 'running' then
+        redis.call('lrem', KEYS[1], 1, id)
+    elseif beat < tonumber(ARGV[1]) then
+        redis.call('lrem', KEYS[1], 1, id)
+        redis.call('hset', key, 'status', 'queued')
+        redis.call('rpush', KEYS[2], id)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+
+class JobFailed(Exception):
+    """erro definitivo: o job falha sem novas tentativas"""
+
+
+@dataclass
+class JobType:
+    name: str
+    handler: Callable[['Job'], Awaitable[Any]]
+    concurrency: int
+    max_attempts: int
+
+
+@dataclass
+class Job:
+    id: str
+    type: JobType
+    payload: Any
+    attempts: int
+    queue: 'JobQueue'
+    redis: Redis
+
+    async def progress(self, done: int, total: int, message: str = ''):
+        now = time.time()
+        await self.redis.hset(
+            self.queue.job_key(self.id),
+            mapping={
+                'done': done,
+                'total': total,
+                'message': message,
+                'heartbeat': now,
+                'updated_at': now,
+            },
+        )
+
+
+class JobQueue:
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        prefix: str,
+        result_ttl: int,
+        visibility_timeout: float,
+        backoff: float,
+        backoff_max: float,
+        payload_chunk: int,
+    ):
+        self.prefix = prefix
+        self.result_ttl = result_ttl
+        self.visibility_timeout = visibility_timeout
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.payload_chunk = payload_chunk
+        self.types: Dict[str, JobType] = {}
+
+    def task(self, name: str, concurrency: int = 1, max_attempts: int = 3):
+        def register(handler):
+            self.types[name] = JobType(
+                name, handler, concurrency, max_attempts
+            )
+            return handler
+
+        return register
+
+    def job_key(self, job_id: str) -> str:
+        return f'{self.prefix}:job:{job_id}'
+
+    def payload_key(self, job_id: str) -> str:
+        return f'{self.prefix}:payload:{job_id}'
+
+    def queue_key(self, name: str) -> str:
+        return f'{self.prefix}:queue:{name}'
+
+    def running_key(self, name: str) -> str:
+        return f'{self.prefix}:running:{name}'
+
+    @property
+    def delayed_key(self) -> str:
+        return f'{self.prefix}:delayed'
+
+    async def enqueue(
+        self,
+        redis: Redis,
+        name: str,
+        payload: Any,
+        owner: Optional[int] = None,
+    ) -> str:
+        kind = self.types[name]
+        job_id = uuid4().hex
+        now = time.time()
+        fields = {
+            'id': job_id,
+            'type': name,
+            'status': QUEUED,
+            'attempts': 0,
+            'max_attempts': kind.max_attempts,
+            'created_at': now,
+            'updated_at': now,
+            **({} if owner is None else {'owner': owner}),
+        }
+        try:
+            await self.write_payload(redis, job_id, payload)
+            await redis.eval(
+                ENQUEUE,
+                2,
+                self.job_key(job_id),
+                self.queue_key(name),
+                job_id,
+                *(item for pair in fields.items() for item in pair),
+            )
+        except RedisError:
+            await self.discard_payload(redis, job_id)
+            raise
+        return job_id
+
+    async def write_payload(self, redis: Redis, job_id: str, payload: Any):
+        # um comando por pedaço: cada um cabe no prazo curto do cliente
+        encoded = json.dumps(payload)
+        for start in range(0, len(encoded), self.payload_chunk):
+            await redis.rpush(
+                self.payload_key(job_id),
+                encoded[start : start + self.payload_chunk],
+            )
+
+    async def read_payload(self, redis: Redis, job_id: str) -> Any:
+        key = self.payload_key(job_id)
+        chunks = []
+        while chunk := await redis.lindex(key, len(chunks)):
+            chunks.append(chunk)
+        return json.loads(''.join(chunks) or 'null')
+
+    async def discard_payload(self, redis: Redis, job_id: str):
+        try:
+            await redis.delete(self.payload_key(job_id))
+        except RedisError:
+            logger.warning('could not discard payload of job %s', job_id)
+
+    async def get(
+        self, redis: Redis, job_id: str, owner: Optional[int] = None
+    ) -> Optional[dict]:
+        """com `owner`, o job de outro usuário conta como inexistente"""
+        job = await redis.hgetall(self.job_key(job_id))
+        if not job:
+            return None
+        if owner is not None and job.pop('owner', None) != str(owner):
+            return None
+        job.pop('heartbeat', None)
+        if 'result' in job:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    async def claim(self, redis: Redis, kind: JobType) -> Optional[Job]:
+        job_id = await redis.eval(
+            CLAIM,
+            2,
+            self.queue_key(kind.name),
+            self.running_key(kind.name),
+            kind.concurrency,
+            self.job_key(''),
+            time.time(),
+        )
+        if not job_id:
+            return None
+        attempts = await redis.hget(self.job_key(job_id), 'attempts')
+        return Job(
+            job_id,
+            kind,
+            await self.read_payload(redis, job_id),
+            int(attempts or 1),
+            self,
+            redis,
+        )
+
+    async def promote(self, redis: Redis) -> int:
+        return await redis.eval(
+            PROMOTE,
+            1,
+            self.delayed_key,
+            time.time(),
+            self.queue_key(''),
+            self.job_key(''),
+        )
+
+    async def recover(self, redis: Redis) -> int:
+        cutoff = time.time() - self.visibility_timeout
+        moved = 0
+        for name in self.types:
+            moved += await redis.eval(
+                RECOVER,
+                2,
+                self.running_key(name),
+                self.queue_key(name),
+                cutoff,
+                self.job_key(''),
+            )
+        return moved
+
+    async def finish(self, job: Job, status: str, **fields):
+        # status final antes de sair de running: o recover ignora o resto
+        key = self.job_key(job.id)
+        await job.redis.hset(
+            key,
+            mapping={'status': status, 'updated_at': time.time(), **fields},
+        )
+        await job.redis.hdel(key, 'heartbeat')
+        await job.redis.delete(self.payload_key(job.id))
+        await job.redis.expire(key, self.result_ttl)
+        await job.redis.lrem(self.running_key(job.type.name), 1, job.id)
+
+    async def succeed(self, job: Job, result: Any):
+        await self.finish(job, SUCCEEDED, result=json.dumps(result))
+
+    async def fail(self, job: Job, error: str, retry: bool):
+        if not retry or job.attempts >= job.type.max_attempts:
+            await self.finish(job, FAILED, error=error)
+            return
+
+        delay = min(self.backoff * 2 ** (job.attempts - 1), self.backoff_max)
+        run_at = time.time() + delay * random.uniform(0.5, 1.0)
+        await job.redis.hset(
+            self.job_key(job.id),
+            mapping={
+                'status': RETRYING,
+                'error': error,
+                'updated_at': time.time(),
+            },
+        )
+        await job.redis.zadd(
+            self.delayed_key, {f'{job.type.name}:{job.id}': run_at}
+        )
+        await job.redis.lrem(self.running_key(job.type.name), 1, job.id)
+
+    async def release(self, job: Job):
+        """devolve um job interrompido (shutdown) sem gastar tentativa"""
+        key = self.job_key(job.id)
+        await job.redis.hset(key, 'status', QUEUED)
+        await job.redis.hincrby(key, 'attempts', -1)
+        await job.redis.lrem(self.running_key(job.type.name), 1, job.id)
+        await job.redis.rpush(self.queue_key(job.type.name), job.id)
+
+
+class JobWorker:
+    """
+    executa jobs de todos os tipos registrados; roda dentro do processo da
+    API (lifespan) ou sozinho com `madr worker`
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        redis: Redis,
+        poll_interval: float,
+        shutdown_timeout: float,
+    ):
+        self.queue = queue
+        self.redis = redis
+        self.poll_interval = poll_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.running: Set[asyncio.Task] = set()
+        self.stopping = asyncio.Event()
+        self.recovered_at = 0.0
+
+    async def run(self):
+        while not self.stopping.is_set():
+            try:
+                claimed = await self.poll()
+            except RedisError:
+                logger.warning('job queue unavailable', exc_info=True)
+                claimed = False
+
+            if not claimed:
+                try:
+                    async with asyncio.timeout(self.poll_interval):
+                        await self.stopping.wait()
+                except TimeoutError:
+                    pass
+
+        await self.drain()
+
+    async def poll(self) -> bool:
+        await self.queue.promote(self.redis)
+
+        if time.monotonic() - self.recovered_at > (
+            self.queue.visibility_timeout / 3
+        ):
+            self.recovered_at = time.monotonic()
+            if moved := await self.queue.recover(self.redis):
+                logger.warning('requeued %d orphaned jobs', moved)
+
+        claimed = False
+        for kind in self.queue.types.values():
+            while job := await self.queue.claim(self.redis, kind):
+                self.start(job)
+                claimed = True
+        return claimed
+
+    def start(self, job: Job):
+        # contexto vazio: o job não pertence à requisição que estiver ativa
+        task = asyncio.get_running_loop().create_task(
+            self.execute(job), context=contextvars.Context()
+        )
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def heartbeat(self, job: Job):
+        key = self.queue.job_key(job.id)
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            try:
+                await self.redis.hset(key, 'heartbeat', time.time())
+            except RedisError:
+                logger.warning('could not heartbeat job %s', job.id)
+
+    async def execute(self, job: Job):
+        logger.info(
+            'job %s (%s) attempt %d', job.id, job.type.name, job.attempts
+        )
+        beating = asyncio.create_task(self.heartbeat(job))
+        try:
+            await self.settle(job)
+        except RedisError:
+            # fica em running sem heartbeat: o recover devolve para a fila
+            logger.warning('could not record job %s', job.id, exc_info=True)
+        finally:
+            beating.cancel()
+
+    async def settle(self, job: Job):
+        try:
+            if job.attempts > job.type.max_attempts:
+                # voltou pelo recover depois de gastar todas as tentativas
+                raise JobFailed('worker lost')
+            result = await job.type.handler(job)
+        except asyncio.CancelledError:
+            await self.queue.release(job)
+            raise
+        except JobFailed as exc:
+            await self.queue.fail(job, str(exc), retry=False)
+        except Exception as exc:
+            logger.exception('job %s failed', job.id)
+            await self.queue.fail(job, repr(exc), retry=True)
+        else:
+            await self.queue.succeed(job, result)
+
+    def stop(self):
+        self.stopping.set()
+
+    async def drain(self):
+        if not self.running:
+            return
+        logger.info('waiting for %d running jobs', len(self.running))
+        _, pending = await asyncio.wait(
+            set(self.running), timeout=self.shutdown_timeout
+        )
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+    @asynccontextmanager
+    async def lifespan(self):
+        task = asyncio.create_task(self.run())
+
+        yield
+
+        self.stop()
+        await task
@@ -0,0 +1,94 @@
+import asyncio
+import math
+import os
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+CGROUP_CPU_MAX = Path('/sys/fs/cgroup/cpu.max')
+
+
+def cgroup_cpu_limit(path: Path = CGROUP_CPU_MAX) -> Optional[float]:
+    """limite de CPU do container (cgroup v2), ex.: '200000 100000' = 2"""
+    try:
+        quota, period = path.read_text(encoding='utf-8').split()[:2]
+    except (OSError, ValueError):
+        return None
+    if quota == 'max':
+        return None
+    return int(quota) / int(period)
+
+
+def available_cpus(cgroup: Path = CGROUP_CPU_MAX) -> int:
+    """CPUs que o processo pode usar: afinidade e cota do container"""
+    cpus = os.process_cpu_count() or 1
+    limit = cgroup_cpu_limit(cgroup)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(cpus, 1)
+
+
+class Lifecycle:
+    """
+    estado deste worker: requisições em andamento e se está drenando
+    (recebeu SIGTERM e só termina o que já aceitou)
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def started(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def finished(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    def start_draining(self):
+        self.draining = True
+
+    async def wait_idle(self, timeout: float) -> bool:
+        try:
+            async with asyncio.timeout(timeout):
+                await self._idle.wait()
+        except TimeoutError:
+            return False
+        return True
+
+
+lifecycle = Lifecycle()
+
+
+class InFlightMiddleware:
+    """
+    conta as requisições em andamento; drenando, as respostas saem com
+    Connection: close para o cliente reconectar em outro worker
+    """
+
+    def __init__(self, app, state: Lifecycle = lifecycle):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_closing(message):
+            if message['type'] == 'http.response.start' and (
+                self.state.draining
+            ):
+                MutableHeaders(scope=message)['connection'] = 'close'
+            await send(message)
+
+        self.state.started()
+        try:
+            await self.app(scope, receive, send_closing)
+        finally:
+            self.state.finished()
@@ -0,0 +1,475 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from madr.config import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()  # type: ignore
+
+# contadores dos workers mortos, juntados pelo processo mestre
+ARCHIVE = 'archived.json'
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+
+
+@dataclass
+class WaitTimeGauge:
+    """tempo de espera para obter uma conexão de um pool"""
+
+    waiting: int = 0
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+
+    @contextmanager
+    def measure(self):
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.waiting -= 1
+            self.count += 1
+            self.total += elapsed
+            self.last = elapsed
+            self.max = max(self.max, elapsed)
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Metric:
+    kind = ''
+
+    def __init__(
+        self,
+        registry: 'MetricsRegistry',
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples: Dict[Tuple[str, ...], Any] = {}
+        registry.register(self)
+
+    def key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.key(labels)
+        self.samples[key] = self.samples.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        self.samples[self.key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.key(labels)
+        self.samples[key] = self.samples.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(*args)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        # [contagem por bucket (não cumulativa)..., +Inf, soma]
+        sample = self.samples.setdefault(
+            self.key(labels), [0] * (len(self.buckets) + 1) + [0.0]
+        )
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound),
+            len(self.buckets),
+        )
+        sample[index] += 1
+        sample[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="{escape(value)}"' for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def format_value(value: float) -> str:
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    registro em memória por processo; com um diretório configurado cada
+    worker grava um snapshot <pid>.json e o /metrics soma todos eles
+    """
+
+    def __init__(self, directory: str = ''):
+        self.directory = directory
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric):
+        self.metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """coletor chamado antes de cada snapshot (ex.: gauges de pool)"""
+        self.collectors.append(collector)
+
+    def snapshot(self, include_gauges: bool = True) -> dict:
+        for collector in self.collectors:
+            collector()
+        return {
+            name: [[list(key), value] for key, value in metric.samples.items()]
+            for name, metric in self.metrics.items()
+            if include_gauges or metric.kind != 'gauge'
+        }
+
+    def path(self, pid: int) -> Path:
+        return Path(self.directory) / f'{pid}.json'
+
+    def flush(self, include_gauges: bool = True):
+        self.write(self.snapshot(include_gauges))
+
+    def write(self, snapshot: dict):
+        if not self.directory:
+            return
+        path = self.path(os.getpid())
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(snapshot))
+        os.replace(tmp, path)
+
+    def load(self, current: Optional[dict] = None) -> List[dict]:
+        if current is None:
+            current = self.snapshot()
+        if not self.directory:
+            return [current]
+
+        self.write(current)
+        snapshots = {}
+        for path in Path(self.directory).glob('*.json'):
+            if path.name == ARCHIVE:
+                continue
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if not is_alive(int(path.stem)):
+                snapshot = self.without_gauges(snapshot)
+            snapshots[int(path.stem)] = snapshot
+        # lido depois dos workers: um snapshot que já entrou no arquivo
+        # enquanto listávamos o diretório não conta duas vezes
+        archive = self.load_archive()
+        return [archive['metrics']] + [
+            snapshot
+            for pid, snapshot in snapshots.items()
+            if pid not in archive['pids']
+        ]
+
+    def without_gauges(self, snapshot: dict) -> dict:
+        # contadores de workers mortos continuam valendo, gauges não
+        return {
+            name: samples
+            for name, samples in snapshot.items()
+            if name in self.metrics and self.metrics[name].kind != 'gauge'
+        }
+
+    def load_archive(self) -> dict:
+        try:
+            return json.loads((Path(self.directory) / ARCHIVE).read_text())
+        except (OSError, ValueError):
+            return {'pids': [], 'metrics': {}}
+
+    def compact(self):
+        """
+        junta os snapshots de workers mortos (já colhidos) no arquivo e
+        apaga os deles: com respawns o diretório não cresce sem limite
+        """
+        if not self.directory:
+            return
+
+        dead = {}
+        for path in Path(self.directory).glob('*.json'):
+            if path.name == ARCHIVE or is_alive(int(path.stem)):
+                continue
+            try:
+                dead[path] = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+        if not dead:
+            return
+
+        merged = self.merge([
+            self.load_archive()['metrics'],
+            *map(self.without_gauges, dead.values()),
+        ])
+        archive = {
+            # só os da última compactação: os arquivos deles somem agora
+            'pids': [int(path.stem) for path in dead],
+            'metrics': {
+                name: [[list(key), value] for key, value in samples.items()]
+                for name, samples in merged.items()
+            },
+        }
+        target = Path(self.directory) / ARCHIVE
+        tmp = target.with_suffix('.tmp')
+        tmp.write_text(json.dumps(archive))
+        os.replace(tmp, target)
+        for path in dead:
+            path.unlink(missing_ok=True)
+
+    def merge(self, snapshots: List[dict]) -> Dict[str, Dict[tuple, Any]]:
+        merged: Dict[str, Dict[tuple, Any]] = {
+            name: {} for name in self.metrics
+        }
+        for snapshot in snapshots:
+            for name, samples in snapshot.items():
+                if name not in merged:
+                    continue
+                for key, value in samples:
+                    current = merged[name].get(tuple(key))
+                    if current is None:
+                        merged[name][tuple(key)] = value
+                    elif isinstance(value, list):
+                        merged[name][tuple(key)] = [
+                            a + b for a, b in zip(current, value)
+                        ]
+                    else:
+                        merged[name][tuple(key)] = current + value
+        return merged
+
+    def render(self, current: Optional[dict] = None) -> str:
+        """
+        com `current` (snapshot tirado no loop) não toca nas amostras vivas
+        e pode rodar numa thread, longe do loop
+        """
+        merged = self.merge(self.load(current))
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.extend((
+                f'# HELP {name} {metric.documentation}',
+                f'# TYPE {name} {metric.kind}',
+            ))
+            for key, value in sorted(merged[name].items()):
+                if metric.kind == 'histogram':
+                    lines.extend(render_histogram(metric, key, value))
+                    continue
+                labels = format_labels(metric.labelnames, key)
+                lines.append(f'{name}{labels} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    @asynccontextmanager
+    async def lifespan(self, interval: float):
+        if not self.directory:
+            yield
+            return
+
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+
+        async def flush_forever():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await asyncio.to_thread(self.write, self.snapshot())
+                except OSError:
+                    logger.exception('could not flush metrics')
+
+        task = asyncio.create_task(flush_forever())
+
+        yield
+
+        task.cancel()
+        self.flush(include_gauges=False)
+
+
+def render_histogram(metric: Histogram, key, value) -> List[str]:
+    names = (*metric.labelnames, 'le')
+    lines = []
+    cumulative = 0
+    bounds = [format_value(bound) for bound in metric.buckets] + ['+Inf']
+    for bound, count in zip(bounds, value[:-1]):
+        cumulative += count
+        labels = format_labels(names, (*key, bound))
+        lines.append(
+            f'{metric.name}_bucket{labels} {format_value(cumulative)}'
+        )
+    labels = format_labels(metric.labelnames, key)
+    lines.extend((
+        f'{metric.name}_sum{labels} {format_value(value[-1])}',
+        f'{metric.name}_count{labels} {format_value(cumulative)}',
+    ))
+    return lines
+
+
+registry = MetricsRegistry(settings.METRICS_DIR)
+
+REQUESTS = Counter(
+    registry,
+    'madr_http_requests_total',
+    'Requisições HTTP concluídas',
+    ('method', 'route', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    registry,
+    'madr_http_request_duration_seconds',
+    'Latência das requisições HTTP',
+    ('method', 'route'),
+)
+IN_FLIGHT = Gauge(
+    registry,
+    'madr_http_requests_in_flight',
+    'Requisições HTTP em andamento',
+)
+POOL_CONNECTIONS = Gauge(
+    registry,
+    'madr_pool_connections',
+    'Conexões dos pools de banco e redis por estado (inclui quem espera)',
+    ('pool', 'state'),
+)
+CACHE_REQUESTS = Counter(
+    registry,
+    'madr_cache_requests_total',
+    'Consultas a caches (hit/miss/refresh/wait/stale/bypass)',
+    ('cache', 'result'),
+)
+CACHE_LOCK_WAIT = Histogram(
+    registry,
+    'madr_cache_lock_wait_seconds',
+    'Tempo esperando outro worker recalcular uma entrada do cache',
+    ('cache',),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+SINGLEFLIGHT_REQUESTS = Counter(
+    registry,
+    'madr_singleflight_requests_total',
+    'Leituras que executaram (leader), reaproveitaram (follower) a '
+    'consulta de outra requisição idêntica ou não puderam reaproveitar '
+    '(bypass, read-your-writes)',
+    ('group', 'result'),
+)
+CONDITIONAL_REQUESTS = Counter(
+    registry,
+    'madr_conditional_requests_total',
+    'GETs com validadores respondidos com 304 (not_modified) ou corpo (full)',
+    ('result',),
+)
+REDIS_CIRCUIT_OPEN = Gauge(
+    registry,
+    'madr_redis_circuit_open',
+    'Circuit breaker do redis aberto (1) ou fechado (0)',
+)
+ADMISSION_REQUESTS = Counter(
+    registry,
+    'madr_admission_requests_total',
+    'Requisições admitidas ou recusadas (503) pelo controle de admissão',
+    ('route_class', 'result'),
+)
+EVENT_LOOP_LAG = Gauge(
+    registry,
+    'madr_event_loop_lag_seconds',
+    'Atraso do event loop medido pelo controle de admissão',
+)
+CATALOG_SUBSCRIBERS = Gauge(
+    registry,
+    'madr_catalog_subscribers',
+    'Clientes conectados ao feed SSE /events/catalog',
+)
+PASSWORD_HASH_DURATION = Histogram(
+    registry,
+    'madr_password_hash_duration_seconds',
+    'Tempo gasto no argon2',
+    ('operation',),
+)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def route_label(scope) -> str:
+    route = scope.get('route')
+    # só o template da rota, para não explodir a cardinalidade
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = HTTPStatus.INTERNAL_SERVER_ERROR
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            route = route_label(scope)
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope['method'],
+                route=route,
+            )
+            REQUESTS.inc(
+                method=scope['method'], route=route, status=int(status)
+            )
@@ -1,31 +1,173 @@
+import asyncio
+import logging
+import time
 from contextlib import asynccontextmanager
+from typing import Optional
 
 import ipdb  # noqa: F401
-from fastapi import FastAPI
-from redis.asyncio import ConnectionPool, Redis
+from fastapi import FastAPI, Request
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.exceptions import RedisError, ResponseError
 
-from madr.settings import Settings
+from madr.config import Settings
+from madr.core.instrumentation import record_redis
+from madr.core.metrics import REDIS_CIRCUIT_OPEN, WaitTimeGauge
+from madr.schemas.health import PoolStats
 
+logger = logging.getLogger(__name__)
 settings = Settings()  # type: ignore
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    redis_pool = ConnectionPool.from_url(
-        settings.REDIS_URL,
+class RedisUnavailable(RedisError):
+    """circuito aberto ou comando estourou o tempo: trate como cache vazio"""
+
+
+class CircuitBreaker:
+    """
+    abre depois de failure_threshold falhas seguidas; aberto, recusa tudo
+    sem tocar na rede até reset_timeout, quando deixa passar uma tentativa
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            # meio aberto: a próxima chamada decide se fecha ou reabre
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        if self.opened_at is not None:
+            logger.info('redis circuit closed')
+            self.opened_at = None
+            REDIS_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(
+                    'redis circuit open after %d failures', self.failures
+                )
+                REDIS_CIRCUIT_OPEN.set(1)
+            self.opened_at = time.monotonic()
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = WaitTimeGauge()
+
+    async def get_connection(self, *args, **kwargs):
+        with self.wait_time.measure():
+            return await super().get_connection(*args, **kwargs)
+
+
+class InstrumentedRedis(Redis):
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_redis(time.perf_counter() - start)
+
+
+class ResilientRedis(InstrumentedRedis):
+    """
+    cada comando tem prazo (inclui esperar conexão do pool) e passa pelo
+    circuit breaker; qualquer falha vira RedisUnavailable
+    """
+
+    def __init__(
+        self,
+        *args,
+        command_timeout: float,
+        breaker: CircuitBreaker,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.command_timeout = command_timeout
+        self.breaker = breaker
+
+    async def execute_command(self, *args, **options):
+        if not self.breaker.allow():
+            raise RedisUnavailable('circuit open')
+        try:
+            async with asyncio.timeout(self.command_timeout):
+                result = await super().execute_command(*args, **options)
+        except ResponseError:
+            # o redis respondeu: erro do comando, não indisponibilidade
+            self.breaker.record_success()
+            raise
+        except (RedisError, OSError, TimeoutError) as err:
+            self.breaker.record_failure()
+            raise RedisUnavailable(str(err) or type(err).__name__) from err
+        self.breaker.record_success()
+        return result
+
+
+def create_redis(url: str) -> ResilientRedis:
+    pool = InstrumentedConnectionPool.from_url(
+        url,
         decode_responses=True,
-        max_connections=10,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_COMMAND_TIMEOUT,
+    )
+    return ResilientRedis(
+        connection_pool=pool,
+        command_timeout=settings.REDIS_COMMAND_TIMEOUT,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.REDIS_BREAKER_FAILURES,
+            reset_timeout=settings.REDIS_BREAKER_RESET_SECONDS,
+        ),
     )
-    app.state.redis = Redis(connection_pool=redis_pool)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.redis = create_redis(settings.REDIS_URL)
 
     yield
 
-    await app.state.redis.close()
-    await redis_pool.aclose()
+    await app.state.redis.aclose()
+    await app.state.redis.connection_pool.aclose()
+
 
+def get_redis(request: Request) -> Optional[Redis]:
+    """
+    cliente único do lifespan; None quando o app rodou sem lifespan.
+    comandos podem levantar RedisError: quem usa cai para o postgres
+    """
+    return getattr(request.app.state, 'redis', None)
 
-def get_redis(request) -> Redis:
-    return Redis(connection_pool=request.app.state.redis_pool)
+
+def get_redis_pool_stats(pool) -> PoolStats:
+    if not isinstance(pool, InstrumentedConnectionPool):
+        return PoolStats()
+
+    wait_time = pool.wait_time
+    return PoolStats(
+        size=pool.max_connections,
+        checked_out=len(pool._in_use_connections),
+        idle=len(pool._available_connections),
+        waiting=wait_time.waiting,
+        wait_count=wait_time.count,
+        wait_avg=wait_time.avg,
+        wait_max=wait_time.max,
+    )
 
 
 async def get_user_token_version(redis: Redis, user_id: int) -> int:
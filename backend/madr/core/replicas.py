@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+)
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+LSN_COOKIE = 'madr_lsn'
+LSN_HEADER = 'x-madr-lsn'
+
+CURRENT_LSN = text('SELECT pg_current_wal_lsn()::text')
+REPLICA_STATUS = text(
+    'SELECT pg_last_wal_replay_lsn()::text AS replay_lsn, '
+    'CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+    'END AS lag'
+)
+
+
+def parse_lsn(value: Optional[str]) -> int:
+    if not value:
+        return 0
+    try:
+        high, low = value.split('/')
+        return (int(high, 16) << 32) | int(low, 16)
+    except ValueError:
+        return 0
+
+
+def format_lsn(value: int) -> str:
+    return f'{value >> 32:X}/{value & 0xFFFFFFFF:X}'
+
+
+def lsn_signature(lsn: str, secret: str) -> str:
+    return hmac.new(secret.encode(), lsn.encode(), hashlib.sha256).hexdigest()
+
+
+def sign_lsn(value: int, secret: str) -> str:
+    lsn = format_lsn(value)
+    return f'{lsn}.{lsn_signature(lsn, secret)}'
+
+
+def verify_lsn(value: Optional[str], secret: str) -> int:
+    """
+    só vale LSN que este serviço emitiu: um valor forjado e enorme
+    fixaria o cliente no primário para sempre
+    """
+    lsn, _, signature = (value or '').partition('.')
+    if not hmac.compare_digest(signature, lsn_signature(lsn, secret)):
+        return 0
+    return parse_lsn(lsn)
+
+
+@dataclass
+class ReadAfter:
+    """LSN mínimo que a leitura precisa enxergar e LSN da última escrita"""
+
+    min_lsn: int = 0
+    write_lsn: int = 0
+
+
+read_after: ContextVar[Optional[ReadAfter]] = ContextVar(
+    'read_after', default=None
+)
+
+
+def is_pinned() -> bool:
+    """
+    a requisição precisa enxergar uma escrita recente: não pode reaproveitar
+    uma leitura que outra começou, talvez numa réplica atrasada
+    """
+    state = read_after.get()
+    return state is not None and state.min_lsn > 0
+
+
+class WriteTrackingSession(AsyncSession):
+    async def commit(self) -> None:
+        await super().commit()
+
+        state = read_after.get()
+        if state is None:
+            return
+
+        # em autocommit e devolvida logo ao pool: o SELECT não abre outra
+        # transação nem deixa a conexão "idle in transaction" até a sessão
+        # fechar
+        connection = await self.connection(
+            execution_options={'isolation_level': 'AUTOCOMMIT'}
+        )
+        lsn = parse_lsn(await connection.scalar(CURRENT_LSN))
+        await super().commit()
+        state.write_lsn = max(state.write_lsn, lsn)
+
+
+@dataclass
+class Replica:
+    url: str
+    engine: AsyncEngine
+    sessionmaker: async_sessionmaker
+    healthy: bool = False
+    replay_lsn: int = 0
+    lag: float = 0.0
+
+    async def check(self, max_lag: float, timeout: float):
+        try:
+            async with (
+                asyncio.timeout(timeout),
+                self.engine.connect() as conn,
+            ):
+                row = (await conn.execute(REPLICA_STATUS)).one()
+        except (SQLAlchemyError, OSError, TimeoutError):
+            logger.warning('replica %s unreachable', self.engine.url)
+            self.healthy = False
+            return
+
+        if row.replay_lsn is None:
+            logger.warning('%s is not a standby', self.engine.url)
+            self.healthy = False
+            return
+
+        self.replay_lsn = parse_lsn(row.replay_lsn)
+        self.lag = float(row.lag or 0)
+        self.healthy = self.lag <= max_lag
+        if not self.healthy:
+            logger.warning(
+                'replica %s lagging %.1fs', self.engine.url, self.lag
+            )
+
+
+class ReplicaSet:
+    def __init__(
+        self,
+        replicas: List[Replica],
+        max_lag: float,
+        interval: float,
+    ):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.interval = interval
+        self._counter = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self, min_lsn: int = 0) -> Optional[Replica]:
+        candidates = [
+            replica
+            for replica in self.replicas
+            if replica.healthy and replica.replay_lsn >= min_lsn
+        ]
+        if not candidates:
+            return None
+        return candidates[next(self._counter) % len(candidates)]
+
+    async def check(self):
+        await asyncio.gather(
+            # uma réplica travada não pode segurar as outras: o prazo é o
+            # intervalo entre verificações
+            *(
+                replica.check(self.max_lag, timeout=self.interval)
+                for replica in self.replicas
+            )
+        )
+
+    async def _run_health_checks(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    @asynccontextmanager
+    async def lifespan(self):
+        if not self.replicas:
+            yield
+            return
+
+        await self.check()
+        task = asyncio.create_task(self._run_health_checks())
+
+        yield
+
+        task.cancel()
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+class ReadYourWritesMiddleware:
+    """
+    fixa o cliente no primário enquanto as réplicas não alcançarem
+    a última escrita dele (LSN assinado, em cookie ou header)
+    """
+
+    def __init__(self, app, pin_seconds: int, secret: str):
+        self.app = app
+        self.pin_seconds = pin_seconds
+        self.secret = secret
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        cookie = SimpleCookie(headers.get('cookie', ''))
+        required = headers.get(LSN_HEADER) or (
+            cookie[LSN_COOKIE].value if LSN_COOKIE in cookie else None
+        )
+        state = ReadAfter(min_lsn=verify_lsn(required, self.secret))
+
+        async def send_with_lsn(message):
+            if message['type'] == 'http.response.start' and state.write_lsn:
+                lsn = sign_lsn(state.write_lsn, self.secret)
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append(LSN_HEADER, lsn)
+                response_headers.append(
+                    'set-cookie',
+                    f'{LSN_COOKIE}={lsn}; Max-Age={self.pin_seconds}; '
+                    'Path=/; HttpOnly; SameSite=Lax',
+                )
+            await send(message)
+
+        token = read_after.set(state)
+        try:
+            await self.app(scope, receive, send_with_lsn)
+        finally:
+            read_after.reset(token)
@@ -0,0 +1,112 @@
+import inspect
+import time
+from functools import wraps
+from http import HTTPStatus
+from typing import Any, Callable
+
+from fastapi import Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+from madr.core.instrumentation import record_serialization
+
+SKIPPED_HEADERS = {b'content-length', b'content-type'}
+
+
+class PydanticJSONResponse(Response):
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:  # noqa: PLR6301
+        if isinstance(content, bytes):
+            return content
+        return to_json(content, by_alias=True)
+
+
+def render_body(adapter: TypeAdapter, result: Any) -> bytes:
+    """o corpo JSON que o ModelRoute enviaria para este retorno"""
+    if isinstance(result, Response):
+        return result.body
+    start = time.perf_counter()
+    if not isinstance(result, BaseModel):
+        result = adapter.validate_python(result, from_attributes=True)
+    body = adapter.dump_json(result, by_alias=True)
+    record_serialization(time.perf_counter() - start)
+    return body
+
+
+def encode_response(
+    endpoint: Callable[..., Any], response_model: Any, status_code: int
+) -> Callable[..., Any]:
+    """
+    serializa o retorno do endpoint em uma passada (pydantic-core, com os
+    aliases camelCase) sem revalidar models que já são do response_model
+    """
+    adapter = TypeAdapter(response_model)
+    model_class = response_model if isinstance(response_model, type) else ()
+
+    signature = inspect.signature(endpoint)
+    response_param = next(
+        (
+            name
+            for name, param in signature.parameters.items()
+            if param.annotation is Response
+        ),
+        None,
+    )
+
+    @wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        if response_param is None:
+            sub_response = kwargs.pop('_response')
+        else:
+            sub_response = kwargs[response_param]
+        result = await endpoint(*args, **kwargs)
+
+        if not isinstance(result, Response):
+            start = time.perf_counter()
+            if not isinstance(result, model_class):
+                result = adapter.validate_python(result, from_attributes=True)
+            result = PydanticJSONResponse(
+                adapter.dump_json(result, by_alias=True),
+                status_code=sub_response.status_code or status_code,
+            )
+            record_serialization(time.perf_counter() - start)
+
+        result.raw_headers.extend(
+            header
+            for header in sub_response.raw_headers
+            if header[0] not in SKIPPED_HEADERS
+        )
+        return result
+
+    if response_param is None:
+        wrapper.__signature__ = signature.replace(  # type: ignore
+            parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(
+                    '_response',
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=Response,
+                ),
+            ]
+        )
+    wrapper.encoded = True  # type: ignore
+    return wrapper
+
+
+class ModelRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        response_model = kwargs.get('response_model')
+        if (
+            response_model is not None
+            and not isinstance(response_model, DefaultPlaceholder)
+            and not getattr(endpoint, 'encoded', False)
+        ):
+            endpoint = encode_response(
+                endpoint,
+                response_model,
+                kwargs.get('status_code') or HTTPStatus.OK,
+            )
+        super().__init__(path, endpoint, **kwargs)
@@ -12,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from madr.config import Settings
 from madr.core.database import get_session
+from madr.core.metrics import PASSWORD_HASH_DURATION
 from madr.models.user import User
 
 password_hash = PasswordHash.recommended()
@@ -19,6 +20,21 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/auth/token')
 settings = Settings()  # type: ignore
 
 
+def token_subject(authorization: str) -> Optional[str]:
+    """`sub` de um "Bearer <jwt>" válido, sem ir ao banco"""
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except jwt.InvalidTokenError:
+        return None
+    subject = payload.get('sub')
+    return None if subject is None else str(subject)
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     session: Annotated[AsyncSession, Depends(get_session)],
@@ -64,15 +80,17 @@ async def get_current_user(
 def verify_password(
     plain_password: str, hashed_password: str
 ) -> tuple[bool, bool]:
-    is_valid, new_hash = password_hash.verify_and_update(
-        plain_password, hashed_password
-    )
+    with PASSWORD_HASH_DURATION.time(operation='verify'):
+        is_valid, new_hash = password_hash.verify_and_update(
+            plain_password, hashed_password
+        )
     needs_rehash = new_hash is not None
     return (is_valid, needs_rehash)
 
 
 def get_hash(plain_text: str) -> str:
-    return password_hash.hash(plain_text)
+    with PASSWORD_HASH_DURATION.time(operation='hash'):
+        return password_hash.hash(plain_text)
 
 
 def generate_token(data: dict, exp_time_delta: Optional[timedelta] = None):
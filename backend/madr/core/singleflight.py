@@ -0,0 +1,70 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from madr.core.metrics import SINGLEFLIGHT_REQUESTS
+
+T = TypeVar('T')
+
+
+@dataclass
+class Flight:
+    future: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    followers: int = 0
+
+
+class SingleFlight:
+    """
+    chamadas concorrentes com a mesma chave (no mesmo worker) esperam uma
+    única execução e recebem o mesmo resultado, inclusive o mesmo erro;
+    quando bypass() é verdadeiro a chamada roda sozinha
+    """
+
+    def __init__(
+        self, group: str, bypass: Optional[Callable[[], bool]] = None
+    ):
+        self.group = group
+        self.bypass = bypass
+        self.flights: Dict[str, Flight] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        if self.bypass is not None and self.bypass():
+            SINGLEFLIGHT_REQUESTS.inc(group=self.group, result='bypass')
+            return await fn()
+
+        flight = self.flights.get(key)
+        if flight is not None:
+            return await self.follow(key, flight, fn)
+
+        SINGLEFLIGHT_REQUESTS.inc(group=self.group, result='leader')
+        flight = self.flights[key] = Flight()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except Exception as err:
+            if flight.followers:
+                flight.future.set_exception(err)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            del self.flights[key]
+
+    async def follow(
+        self, key: str, flight: Flight, fn: Callable[[], Awaitable[Any]]
+    ):
+        SINGLEFLIGHT_REQUESTS.inc(group=self.group, result='follower')
+        flight.followers += 1
+        try:
+            return await asyncio.shield(flight.future)
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if not flight.future.cancelled() or (task and task.cancelling()):
+                raise
+        # quem executava foi cancelado (ex.: cliente desconectou): refaz
+        return await self.do(key, fn)
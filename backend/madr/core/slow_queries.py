@@ -0,0 +1,171 @@
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Optional, Sequence, Set
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from madr.core.instrumentation import request_timings
+
+logger = logging.getLogger(__name__)
+
+# WITH fica de fora: um CTE pode ter INSERT/UPDATE/DELETE dentro
+EXPLAINABLE = ('SELECT', 'VALUES', 'TABLE')
+LOCKING = re.compile(
+    r'\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b',
+    re.IGNORECASE,
+)
+# execution option das conexões do próprio log: o EXPLAIN ANALYZE de uma
+# consulta lenta também é lento e não pode virar outra entrada
+UNOBSERVED = 'madr_unobserved'
+
+
+def redact(value: Any) -> Any:
+    """mantém números e datas, esconde o conteúdo de textos e binários"""
+    if value is None or isinstance(value, (bool, int, float, Decimal)):
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (str, bytes)):
+        return f'<{type(value).__name__}:{len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def redact_plan(plan: str, parameters: Sequence[Any]) -> str:
+    """o plano com ANALYZE mostra os valores como literais ('...'::text)"""
+    for value in parameters:
+        if isinstance(value, str) and value:
+            literal = "'" + value.replace("'", "''") + "'"
+            plan = plan.replace(literal, f"'{redact(value)}'")
+    return plan
+
+
+def is_explainable(statement: str) -> bool:
+    # EXPLAIN ANALYZE executa a consulta, então escrita nunca é reexecutada
+    # e um SELECT ... FOR UPDATE reexecutado pegaria os locks de novo
+    words = statement.lstrip().split(None, 1)
+    return (
+        bool(words)
+        and words[0].upper() in EXPLAINABLE
+        and LOCKING.search(statement) is None
+    )
+
+
+class SlowQueryLog:
+    """
+    registra consultas acima do limite; uma amostra delas é reexplicada
+    com EXPLAIN (ANALYZE, BUFFERS) numa task separada da requisição
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        threshold_ms: float,
+        sample_rate: float,
+        max_pending: int,
+        explain_timeout_ms: int,
+        path: str,
+        max_bytes: int,
+        backups: int,
+    ):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.explain_timeout_ms = explain_timeout_ms
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.pending: Set[asyncio.Task] = set()
+        self._logger: Optional[logging.Logger] = None
+
+    @property
+    def file_logger(self) -> logging.Logger:
+        if self._logger is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                self.path,
+                maxBytes=self.max_bytes,
+                backupCount=self.backups,
+                encoding='utf-8',
+            )
+            self._logger = logging.getLogger(f'{__name__}.{self.path}')
+            self._logger.handlers = [handler]
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+        return self._logger
+
+    def sampled(self) -> bool:
+        return (
+            len(self.pending) < self.max_pending
+            and random.random() < self.sample_rate
+        )
+
+    def observe(
+        self,
+        engine: Engine,
+        statement: str,
+        parameters: Optional[Sequence[Any]],
+        elapsed: float,
+    ):
+        if not self.threshold_ms or elapsed * 1000 < self.threshold_ms:
+            return
+
+        timings = request_timings.get()
+        entry = {
+            'route': timings.route if timings else None,
+            'duration_ms': round(elapsed * 1000, 2),
+            'statement': statement,
+            'parameters': [redact(value) for value in parameters or ()],
+            'plan': None,
+        }
+
+        if not (is_explainable(statement) and self.sampled()):
+            self.write(entry)
+            return
+
+        # contexto vazio: o EXPLAIN não entra nos tempos da requisição
+        task = asyncio.get_running_loop().create_task(
+            self.explain(AsyncEngine(engine), entry, parameters),
+            context=contextvars.Context(),
+        )
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def explain(
+        self,
+        engine: AsyncEngine,
+        entry: dict,
+        parameters: Optional[Sequence[Any]],
+    ):
+        unobserved = engine.execution_options(**{UNOBSERVED: True})
+        try:
+            async with unobserved.connect() as conn:
+                await conn.exec_driver_sql(
+                    'SET LOCAL statement_timeout = '
+                    f'{int(self.explain_timeout_ms)}'
+                )
+                result = await conn.exec_driver_sql(
+                    f'EXPLAIN (ANALYZE, BUFFERS) {entry["statement"]}',
+                    tuple(parameters or ()),
+                )
+                entry['plan'] = redact_plan(
+                    '\n'.join(row[0] for row in result), parameters or ()
+                )
+                await conn.rollback()
+        except SQLAlchemyError:
+            logger.exception('could not explain slow query')
+        self.write(entry)
+
+    def write(self, entry: dict):
+        try:
+            self.file_logger.info(json.dumps(entry, ensure_ascii=False))
+        except OSError:
+            logger.exception('could not write slow query log')
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+logger = logging.getLogger(__name__)
+
+HotQuery = Callable[[AsyncSession], Awaitable[Any]]
+Prefill = Callable[[Redis, AsyncSession], Awaitable[Any]]
+
+OK = 'ok'
+
+
+class Warmup:
+    """
+    aquece o worker antes de ele receber tráfego: abre as conexões mínimas
+    de cada pool e roda as consultas quentes em cada uma (o asyncpg prepara
+    os statements por conexão), pinga o redis e, se pedido, preenche as
+    chaves de cache mais lidas. Só o primário é obrigatório: sem redis a
+    API funciona sem cache e réplica fora só aparece nos `checks`
+    """
+
+    def __init__(self):
+        self.queries: Dict[str, HotQuery] = {}
+        self.prefills: Dict[str, Prefill] = {}
+        self.checks: Dict[str, str] = {}
+        self.done = False
+
+    def query(self, name: str):
+        def register(query: HotQuery) -> HotQuery:
+            self.queries[name] = query
+            return query
+
+        return register
+
+    def prefill(self, name: str):
+        def register(prefill: Prefill) -> Prefill:
+            self.prefills[name] = prefill
+            return prefill
+
+        return register
+
+    async def check(self, name: str, step: Awaitable[Any]) -> bool:
+        try:
+            await step
+        except Exception as exc:
+            logger.warning('warmup %s failed: %r', name, exc)
+            self.checks[name] = f'failed: {type(exc).__name__}'
+            return False
+        self.checks[name] = OK
+        return True
+
+    async def warm_pool(self, engine: AsyncEngine, connections: int):
+        async with AsyncExitStack() as stack:
+            # todas abertas ao mesmo tempo, senão o pool reaproveita uma só
+            held = await asyncio.gather(
+                *(
+                    stack.enter_async_context(engine.connect())
+                    for _ in range(connections)
+                )
+            )
+            for connection in held:
+                async with AsyncSession(bind=connection) as session:
+                    for query in self.queries.values():
+                        await query(session)
+
+    async def fill_caches(self, redis: Redis, engine: AsyncEngine):
+        async with AsyncSession(engine) as session:
+            for name, prefill in self.prefills.items():
+                await self.check(f'cache:{name}', prefill(redis, session))
+
+    async def run(
+        self,
+        engines: Sequence[AsyncEngine],
+        redis: Optional[Redis],
+        connections: int,
+        prefill: bool = False,
+    ) -> bool:
+        """True com todos os bancos quentes; o ready depende só do primário"""
+        results = [
+            await self.check(
+                f'replica:{index}' if index else 'database',
+                self.warm_pool(engine, connections),
+            )
+            for index, engine in enumerate(engines)
+        ]
+        if redis is not None:
+            await self.check('redis', redis.ping())
+            if prefill and self.checks['redis'] == OK:
+                await self.fill_caches(redis, engines[0])
+
+        self.done = results[0]
+        return all(results)
+
+    @asynccontextmanager
+    async def lifespan(  # noqa: PLR0913, PLR0917
+        self,
+        engines: Sequence[AsyncEngine],
+        redis: Optional[Redis],
+        connections: int,
+        prefill: bool,
+        timeout: float,
+        retry_interval: float,
+    ):
+        """
+        a primeira tentativa segura o startup (o worker só aceita conexões
+        depois dela); se falhar, o worker sobe sem ficar pronto e continua
+        tentando em segundo plano até as réplicas também aquecerem
+        """
+
+        async def attempt() -> bool:
+            try:
+                async with asyncio.timeout(timeout):
+                    return await self.run(engines, redis, connections, prefill)
+            except TimeoutError:
+                logger.warning('warmup timed out after %ss', timeout)
+                return False
+
+        async def retry_forever():
+            while not await attempt():
+                await asyncio.sleep(retry_interval)
+            logger.info('warmup finished')
+
+        task = None
+        if not await attempt():
+            task = asyncio.create_task(retry_forever())
+
+        yield
+
+        if task is not None:
+            task.cancel()
+        self.done = False
+
+
+warmup = Warmup()
@@ -0,0 +1,140 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import DDL, BigInteger, DateTime, event, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_as_dataclass, mapped_column
+
+from madr.models import table_registry
+from madr.models.book import Book
+from madr.models.novelist import Novelist
+
+CHANNEL = 'catalog_events'
+# o NOTIFY aceita até 8000 bytes: acima disso vai só o id e o listener
+# busca o evento na tabela
+MAX_NOTIFY_BYTES = 7900
+
+# acima disso um comando vira um só evento `bulk` (o cliente recarrega a
+# lista): uma importação não enche a fila de cada assinante. cobre um
+# lote do write batcher (DB_WRITE_BATCH_SIZE)
+MAX_ROW_EVENTS = 100
+BULK = 'bulk'
+
+# os eventos e o NOTIFY saem na mesma transação da escrita: quem escuta só
+# recebe depois do commit, e na ordem dos commits. um NOTIFY por comando;
+# com mais de um evento ele leva só o intervalo de ids e o listener lê a
+# tabela. UPDATE só conta se algum campo além de updated_at mudou (upsert
+# repetido ou PATCH com os mesmos valores não contam)
+NOTIFY_CATALOG_EVENT = DDL(f"""
+CREATE OR REPLACE FUNCTION notify_catalog_event() RETURNS trigger AS $$
+DECLARE
+    changed jsonb[];
+    first_id bigint;
+    last_id bigint;
+    message text;
+BEGIN
+    -- uma linha além do limite basta para saber que é bulk
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(row_data) INTO changed FROM (
+            SELECT to_jsonb(r) AS row_data FROM new_rows r
+            ORDER BY r.id LIMIT {MAX_ROW_EVENTS} + 1
+        ) AS picked;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(row_data) INTO changed FROM (
+            SELECT to_jsonb(r) AS row_data FROM old_rows r
+            ORDER BY r.id LIMIT {MAX_ROW_EVENTS} + 1
+        ) AS picked;
+    ELSE
+        SELECT array_agg(row_data) INTO changed FROM (
+            SELECT to_jsonb(n) AS row_data
+            FROM new_rows n JOIN old_rows o USING (id)
+            WHERE to_jsonb(o) - 'updated_at' IS DISTINCT FROM
+                to_jsonb(n) - 'updated_at'
+            ORDER BY n.id LIMIT {MAX_ROW_EVENTS} + 1
+        ) AS picked;
+    END IF;
+    IF changed IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF cardinality(changed) > {MAX_ROW_EVENTS} THEN
+        INSERT INTO catalog_events (table_name, operation, row_id, data)
+        VALUES (
+            TG_TABLE_NAME, '{BULK}', NULL,
+            jsonb_build_object('operation', lower(TG_OP))
+        )
+        RETURNING id, id INTO first_id, last_id;
+    ELSE
+        WITH inserted AS (
+            INSERT INTO catalog_events (table_name, operation, row_id, data)
+            SELECT TG_TABLE_NAME, lower(TG_OP), (row_data->>'id')::bigint,
+                row_data
+            FROM unnest(changed) AS row_data
+            RETURNING id
+        )
+        SELECT min(id), max(id) INTO first_id, last_id FROM inserted;
+    END IF;
+
+    IF first_id = last_id THEN
+        SELECT json_build_object(
+            'id', id, 'table_name', table_name, 'operation', operation,
+            'row_id', row_id, 'data', data
+        )::text INTO message
+        FROM catalog_events WHERE id = first_id;
+    END IF;
+    IF message IS NULL OR octet_length(message) > {MAX_NOTIFY_BYTES} THEN
+        message := json_build_object('id', first_id, 'last', last_id)::text;
+    END IF;
+    PERFORM pg_notify('{CHANNEL}', message);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""")
+# tabela de transição só existe em trigger de um evento só
+PUBLISH_INSERTS = DDL("""
+CREATE TRIGGER %(table)s_catalog_insert
+AFTER INSERT ON %(table)s
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_event()
+""")
+PUBLISH_UPDATES = DDL("""
+CREATE TRIGGER %(table)s_catalog_update
+AFTER UPDATE ON %(table)s
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_event()
+""")
+PUBLISH_DELETES = DDL("""
+CREATE TRIGGER %(table)s_catalog_delete
+AFTER DELETE ON %(table)s
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_event()
+""")
+DROP_NOTIFY_CATALOG_EVENT = DDL('DROP FUNCTION IF EXISTS notify_catalog_event')
+
+
+@mapped_as_dataclass(table_registry)
+class CatalogEvent:
+    """mudanças em livros e romancistas, para o feed SSE e o Last-Event-ID"""
+
+    __tablename__ = 'catalog_events'
+
+    id: Mapped[int] = mapped_column(BigInteger, init=False, primary_key=True)
+    table_name: Mapped[str]
+    operation: Mapped[str]
+    # None nos eventos `bulk`
+    row_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    data: Mapped[Dict[str, Any]] = mapped_column(JSONB)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        default=None,
+        index=True,
+    )
+
+
+event.listen(table_registry.metadata, 'before_create', NOTIFY_CATALOG_EVENT)
+event.listen(table_registry.metadata, 'after_drop', DROP_NOTIFY_CATALOG_EVENT)
+PUBLISH_CHANGES = (PUBLISH_INSERTS, PUBLISH_UPDATES, PUBLISH_DELETES)
+for published in (Book.__table__, Novelist.__table__):
+    for trigger in PUBLISH_CHANGES:
+        event.listen(published, 'after_create', trigger)
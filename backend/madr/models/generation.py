@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from sqlalchemy import DDL, BigInteger, DateTime, event, func
+from sqlalchemy.orm import Mapped, mapped_as_dataclass, mapped_column
+
+from madr.models import table_registry
+from madr.models.book import Book
+from madr.models.novelist import Novelist
+
+# quantas linhas de contador cada tabela tem: cada conexão escreve na sua
+# (pelo pid), então escritas concorrentes não esperam umas pelas outras
+GENERATION_SLOTS = 256
+
+# o contador é incrementado na mesma transação da escrita: só fica visível
+# junto com os dados (uma sequence vazaria antes do commit). a versão é a
+# soma dos slots, que avança a cada commit que mudou alguma linha
+BUMP_GENERATION = DDL(f"""
+CREATE OR REPLACE FUNCTION bump_table_generation() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM 1 FROM new_rows LIMIT 1;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM 1 FROM old_rows LIMIT 1;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM 1 FROM new_rows JOIN old_rows USING (id)
+        WHERE to_jsonb(new_rows) IS DISTINCT FROM to_jsonb(old_rows)
+        LIMIT 1;
+    END IF;
+    IF TG_OP <> 'TRUNCATE' AND NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO table_generations (name, slot, generation, changed_at)
+    VALUES (
+        TG_TABLE_NAME, mod(pg_backend_pid(), {GENERATION_SLOTS}), 1, now()
+    )
+    ON CONFLICT (name, slot) DO UPDATE
+    SET generation = table_generations.generation + 1, changed_at = now();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""")
+# tabela de transição só existe em trigger de um evento só
+TRACK_INSERTS = DDL("""
+CREATE TRIGGER %(table)s_generation_insert
+AFTER INSERT ON %(table)s
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_generation()
+""")
+TRACK_UPDATES = DDL("""
+CREATE TRIGGER %(table)s_generation_update
+AFTER UPDATE ON %(table)s
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_generation()
+""")
+TRACK_DELETES = DDL("""
+CREATE TRIGGER %(table)s_generation_delete
+AFTER DELETE ON %(table)s
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_generation()
+""")
+TRACK_TRUNCATES = DDL("""
+CREATE TRIGGER %(table)s_generation_truncate
+AFTER TRUNCATE ON %(table)s
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_generation()
+""")
+DROP_BUMP_GENERATION = DDL('DROP FUNCTION IF EXISTS bump_table_generation')
+
+
+@mapped_as_dataclass(table_registry)
+class TableGeneration:
+    """um slot da versão de uma tabela, usada nos validadores das listagens"""
+
+    __tablename__ = 'table_generations'
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    slot: Mapped[int] = mapped_column(primary_key=True)
+    generation: Mapped[int] = mapped_column(BigInteger, default=0)
+    changed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), default=None
+    )
+
+
+event.listen(table_registry.metadata, 'before_create', BUMP_GENERATION)
+event.listen(table_registry.metadata, 'after_drop', DROP_BUMP_GENERATION)
+TRACK_CHANGES = (TRACK_INSERTS, TRACK_UPDATES, TRACK_DELETES, TRACK_TRUNCATES)
+for tracked in (Book.__table__, Novelist.__table__):
+    for trigger in TRACK_CHANGES:
+        event.listen(tracked, 'after_create', trigger)
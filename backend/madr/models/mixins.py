@@ -1,13 +1,20 @@
 from datetime import datetime
 
-from sqlalchemy import func
+from sqlalchemy import DateTime, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 
 class DateMixin:
+    # created_at/updated_at voltam no RETURNING do INSERT/UPDATE
+    __mapper_args__ = {'eager_defaults': True}
+
+    # timestamptz: o instante não depende do TimeZone da sessão que gravou
     created_at: Mapped[datetime] = mapped_column(
-        init=False, server_default=func.now()
+        DateTime(timezone=True), init=False, server_default=func.now()
     )
     updated_at: Mapped[datetime] = mapped_column(
-        init=False, server_default=func.now(), onupdate=func.now()
+        DateTime(timezone=True),
+        init=False,
+        server_default=func.now(),
+        onupdate=func.now(),
     )
@@ -0,0 +1,127 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Response
+from sqlalchemy import literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core.database import timed_query
+
+# no RETURNING de um upsert, xmax = 0 só para linhas recém inseridas
+INSERTED = literal_column('xmax = 0').label('inserted')
+
+# parâmetros nomeados %(nome)s: o asyncpg só aceita $n, e bind() numera
+PARAMETER = re.compile(r'%\((\w+)\)s')
+
+PAGE_JSON = """
+SELECT CASE WHEN count(*) = 0 THEN format(
+    '{{"data":[],"total":0,"page":%s,"hasPrev":%s,"hasNext":false}}',
+    %(page)s::int,
+    {empty_has_prev}
+) ELSE format(
+    '{{"data":[%s],"total":%s,"page":%s,"hasPrev":%s,"hasNext":%s}}',
+    string_agg({item}, ',' ORDER BY position),
+    max(total),
+    %(page)s::int,
+    to_json(%(page)s::int > 1),
+    to_json(%(offset)s::bigint + %(limit)s::bigint < max(total))
+) END
+FROM ({query}) AS page
+"""
+
+
+def bind(sql: str, params: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """troca %(nome)s por $n (o mesmo nome reaproveita o número)"""
+    names: List[str] = []
+
+    def number(match: re.Match) -> str:
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f'${names.index(match.group(1)) + 1}'
+
+    sql = PARAMETER.sub(number, sql)
+    return sql, [params[name] for name in names]
+
+
+async def driver_connection(session: AsyncSession):
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+async def fetch(
+    session: AsyncSession, sql: str, params: Dict[str, Any]
+) -> List[Any]:
+    """executa direto na conexão asyncpg da sessão (cache de statements)"""
+    connection = await driver_connection(session)
+    sql, args = bind(sql, params)
+    with timed_query(session, sql, args):
+        return await connection.fetch(sql, *args)
+
+
+async def fetch_json(
+    session: AsyncSession, sql: str, params: Dict[str, Any]
+) -> Response:
+    """devolve o JSON montado pelo postgres sem decodificar as linhas"""
+    connection = await driver_connection(session)
+    sql, args = bind(sql, params)
+    with timed_query(session, sql, args):
+        body = await connection.fetchval(sql, *args)
+    return Response(content=body.encode(), media_type='application/json')
+
+
+def json_page(
+    query: str, columns: Sequence[str], empty_has_prev: bool = False
+) -> str:
+    """
+    envolve a consulta paginada para o postgres renderizar o OutputPaginated
+    byte a byte igual ao pydantic (json compacto, chaves em camelCase).
+    A consulta expõe `position` (ordem na página) e usa %(offset)s e
+    %(limit)s; a página vem em %(page)s
+    """
+    template = ','.join(f'"{column}":%s' for column in columns)
+    values = ', '.join(f'to_json({column})' for column in columns)
+    return PAGE_JSON.format(
+        query=query,
+        item=f"format('{{{template}}}', {values})",
+        empty_has_prev=(
+            'to_json(%(page)s::int > 1)' if empty_has_prev else "'false'"
+        ),
+    )
+
+
+def like_pattern(value: Optional[str]) -> Optional[str]:
+    if value and value.strip():
+        return f'%{value.strip()}%'
+    return None
+
+
+def order_clause(fields: Dict[str, Any], order_by: str, order_dir: str):
+    column = fields[order_by].expression.name
+    return f'{column} {"ASC" if order_dir == "asc" else "DESC"}'
+
+
+def paginated(
+    rows: Sequence[Any],
+    columns: Sequence[str],
+    page: int,
+    offset: int,
+    limit: int,
+) -> Dict[str, Any]:
+    if not rows:
+        return {
+            'data': [],
+            'total': 0,
+            'page': page,
+            'hasPrev': False,
+            'hasNext': False,
+        }
+
+    total = rows[0]['total']
+    return {
+        'data': [dict(zip(columns, row)) for row in rows],
+        'total': total,
+        'page': page,
+        'hasPrev': page > 1,
+        'hasNext': (offset + limit) < total,
+    }
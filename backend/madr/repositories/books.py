@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Sequence
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import RowMapping, case, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.models.book import Book
+from madr.repositories import (
+    INSERTED,
+    fetch,
+    fetch_json,
+    json_page,
+    like_pattern,
+    order_clause,
+    paginated,
+)
+from madr.schemas.books import ORDERABLE_FIELDS, BookQueryParams
+
+COLUMNS = ('name', 'year', 'title', 'id')
+
+LIST_BOOKS = """
+SELECT name, year, title, id, count(*) OVER () AS total,
+    row_number() OVER (ORDER BY {order}) AS position
+FROM books
+WHERE (%(year_from)s::int IS NULL OR year >= %(year_from)s)
+  AND (%(year_to)s::int IS NULL OR year < %(year_to)s)
+  AND (%(name)s::text IS NULL OR name ILIKE %(name)s)
+  AND (%(title)s::text IS NULL OR title ILIKE %(title)s)
+ORDER BY {order}
+OFFSET %(offset)s LIMIT %(limit)s
+"""
+
+LIST_NOVELIST_BOOKS = """
+SELECT name, year, title, id, count(*) OVER () AS total,
+    row_number() OVER (ORDER BY {order}) AS position
+FROM books
+WHERE id_novelist = %(novelist_id)s
+ORDER BY {order}
+OFFSET %(offset)s LIMIT %(limit)s
+"""
+
+
+def _order(query: BookQueryParams) -> str:
+    return order_clause(ORDERABLE_FIELDS, query.order_by, query.order_dir)
+
+
+def _params(query: BookQueryParams) -> Dict[str, Any]:
+    return {
+        'year_from': query.year_from,
+        'year_to': query.year_to,
+        'name': like_pattern(query.name),
+        'title': like_pattern(query.title),
+        'offset': query.offset,
+        'limit': query.limit,
+        'page': query.page,
+    }
+
+
+async def list_books(
+    session: AsyncSession, query: BookQueryParams
+) -> JSONResponse:
+    rows = await fetch(
+        session, LIST_BOOKS.format(order=_order(query)), _params(query)
+    )
+    return JSONResponse(
+        paginated(rows, COLUMNS, query.page, query.offset, query.limit)
+    )
+
+
+async def render_books(
+    session: AsyncSession, query: BookQueryParams
+) -> Response:
+    sql = json_page(LIST_BOOKS.format(order=_order(query)), COLUMNS)
+    return await fetch_json(session, sql, _params(query))
+
+
+def _novelist_params(
+    novelist_id: int, query: BookQueryParams
+) -> Dict[str, Any]:
+    return {
+        'novelist_id': novelist_id,
+        'offset': query.offset,
+        'limit': query.limit,
+        'page': query.page,
+    }
+
+
+async def list_novelist_books(
+    session: AsyncSession, novelist_id: int, query: BookQueryParams
+) -> JSONResponse:
+    rows = await fetch(
+        session,
+        LIST_NOVELIST_BOOKS.format(order=_order(query)),
+        _novelist_params(novelist_id, query),
+    )
+    response = paginated(rows, COLUMNS, query.page, query.offset, query.limit)
+    response['hasPrev'] = query.page > 1
+    return JSONResponse(response)
+
+
+async def render_novelist_books(
+    session: AsyncSession, novelist_id: int, query: BookQueryParams
+) -> Response:
+    sql = json_page(
+        LIST_NOVELIST_BOOKS.format(order=_order(query)),
+        COLUMNS,
+        empty_has_prev=True,
+    )
+    return await fetch_json(session, sql, _novelist_params(novelist_id, query))
+
+
+async def upsert_books(
+    session: AsyncSession, rows: List[Dict[str, Any]]
+) -> Sequence[RowMapping]:
+    """
+    um único INSERT ... ON CONFLICT (name) DO UPDATE para o lote todo;
+    updated_at só muda se algum campo mudou, então repetir é idempotente
+    """
+    stmt = insert(Book).values(rows)
+    excluded = stmt.excluded
+    changed = tuple_(Book.year, Book.title, Book.id_novelist).is_distinct_from(
+        tuple_(excluded.year, excluded.title, excluded.id_novelist)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Book.name],
+        set_={
+            'year': excluded.year,
+            'title': excluded.title,
+            'id_novelist': excluded.id_novelist,
+            'updated_at': case((changed, func.now()), else_=Book.updated_at),
+        },
+    ).returning(
+        Book.id, Book.name, Book.year, Book.title, Book.updated_at, INSERTED
+    )
+    return (await session.execute(stmt)).mappings().all()
@@ -0,0 +1,38 @@
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.models.generation import TableGeneration
+
+logger = logging.getLogger(__name__)
+TableVersion = Tuple[int, Optional[datetime]]
+
+
+async def table_version(session: AsyncSession, table: str) -> TableVersion:
+    """geração e hora da última escrita (0, None se nunca houve escrita)"""
+    # a soma dos slots; sum de bigint volta numeric
+    row = (
+        await session.execute(
+            select(
+                func.coalesce(func.sum(TableGeneration.generation), 0),
+                func.max(TableGeneration.changed_at),
+            ).where(TableGeneration.name == table)
+        )
+    ).one()
+    return int(row[0]), row[1]
+
+
+async def try_table_version(
+    session: AsyncSession, table: str
+) -> Optional[TableVersion]:
+    """com o banco fora, a checagem do 304 é pulada e o cache responde"""
+    try:
+        return await table_version(session, table)
+    except SQLAlchemyError:
+        logger.warning('could not read %s generation', table, exc_info=True)
+        await session.rollback()
+        return None
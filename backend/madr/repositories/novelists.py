@@ -0,0 +1,76 @@
+from typing import Any, Dict, List, Sequence
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import RowMapping
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.models.novelist import Novelist
+from madr.repositories import (
+    INSERTED,
+    fetch,
+    fetch_json,
+    json_page,
+    like_pattern,
+    order_clause,
+    paginated,
+)
+from madr.schemas.novelists import ORDERABLE_FIELDS, NovelistQueryParams
+
+COLUMNS = ('name', 'id')
+
+LIST_NOVELISTS = """
+SELECT name, id, count(*) OVER () AS total,
+    row_number() OVER (ORDER BY {order}) AS position
+FROM novelists
+WHERE (%(name)s::text IS NULL OR name ILIKE %(name)s)
+ORDER BY {order}
+OFFSET %(offset)s LIMIT %(limit)s
+"""
+
+
+def _sql(query: NovelistQueryParams) -> str:
+    order = order_clause(ORDERABLE_FIELDS, query.order_by, query.order_dir)
+    return LIST_NOVELISTS.format(order=order)
+
+
+def _params(query: NovelistQueryParams) -> Dict[str, Any]:
+    return {
+        'name': like_pattern(query.name),
+        'offset': query.offset,
+        'limit': query.limit,
+        'page': query.page,
+    }
+
+
+async def list_novelists(
+    session: AsyncSession, query: NovelistQueryParams
+) -> JSONResponse:
+    rows = await fetch(session, _sql(query), _params(query))
+    return JSONResponse(
+        paginated(rows, COLUMNS, query.page, query.offset, query.limit)
+    )
+
+
+async def render_novelists(
+    session: AsyncSession, query: NovelistQueryParams
+) -> Response:
+    return await fetch_json(
+        session, json_page(_sql(query), COLUMNS), _params(query)
+    )
+
+
+async def upsert_novelists(
+    session: AsyncSession, names: List[str]
+) -> Sequence[RowMapping]:
+    """
+    o nome é o único campo: no conflito o UPDATE é vazio (não mexe em
+    updated_at) e existe só para o RETURNING devolver a linha existente
+    """
+    stmt = insert(Novelist).values([{'name': name} for name in names])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Novelist.name],
+        set_={'name': stmt.excluded.name},
+    ).returning(Novelist.id, Novelist.name, Novelist.updated_at, INSERTED)
+    return (await session.execute(stmt)).mappings().all()
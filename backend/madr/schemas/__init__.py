@@ -32,3 +32,10 @@ class OutputPaginated(BaseModel, Generic[T]):
     page: int
     has_prev: bool = False
     has_next: bool = False
+
+
+class OutputUpserted(BaseModel, Generic[T]):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+    data: List[T] = []
+    created: int = 0
+    updated: int = 0
@@ -5,7 +5,11 @@ from pydantic.alias_generators import to_camel
 
 from madr.models.book import Book
 from madr.models.novelist import Novelist
-from madr.schemas import OutputPaginated, PaginateOrderParams
+from madr.schemas import (
+    OutputPaginated,
+    OutputUpserted,
+    PaginateOrderParams,
+)
 from madr.schemas.mixins import DateSchema
 
 ORDERABLE_FIELDS: Dict[str, Any] = {
@@ -46,6 +50,16 @@ class BookUpdate(BaseModel):
     id_novelist: Optional[int] = None
 
 
+class BookUpsert(BaseModel):
+    """corpo do PUT /books/by-name/{name}; o nome vem do caminho"""
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    year: int
+    title: str
+    id_novelist: int
+
+
 class BookDb(DateSchema, BookCreate):
     model_config = ConfigDict(
         alias_generator=to_camel,
@@ -68,3 +82,4 @@ class BookQueryParams(PaginateOrderParams):
 
 
 PublicBooksPaginated = OutputPaginated[BookPublic]
+UpsertedBooks = OutputUpserted[BookPublic]
@@ -0,0 +1,25 @@
+from typing import Dict
+
+from pydantic import BaseModel
+
+
+class PoolStats(BaseModel):
+    size: int = 0
+    checked_out: int = 0
+    idle: int = 0
+    overflow: int = 0
+    waiting: int = 0
+    wait_count: int = 0
+    wait_avg: float = 0.0
+    wait_max: float = 0.0
+
+
+class PoolsStatus(BaseModel):
+    database: PoolStats
+    redis: PoolStats
+
+
+class Readiness(BaseModel):
+    ready: bool
+    draining: bool
+    checks: Dict[str, str] = {}
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, computed_field
+from pydantic.alias_generators import to_camel
+
+JobStatus = Literal['queued', 'running', 'retrying', 'succeeded', 'failed']
+
+
+class JobAccepted(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    id: str
+    status: JobStatus = 'queued'
+
+
+class JobPublic(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    id: str
+    type: str
+    status: JobStatus
+    attempts: int
+    max_attempts: int
+    done: int = 0
+    total: int = 0
+    message: str = ''
+    result: Any = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    @computed_field
+    @property
+    def progress(self) -> float:
+        if self.status == 'succeeded':
+            return 1.0
+        return self.done / self.total if self.total else 0.0
@@ -3,7 +3,11 @@ from typing import List, Literal, Optional
 from pydantic import BaseModel
 
 from madr.models.novelist import Novelist
-from madr.schemas import OutputPaginated, PaginateOrderParams
+from madr.schemas import (
+    OutputPaginated,
+    OutputUpserted,
+    PaginateOrderParams,
+)
 from madr.schemas.books import BookPublic
 from madr.schemas.mixins import DateSchema
 
@@ -39,4 +43,5 @@ class NovelistQueryParams(PaginateOrderParams):
 
 
 PublicNovelistsPaginated = OutputPaginated[NovelistPublic]
+UpsertedNovelists = OutputUpserted[NovelistPublic]
 ORDERABLE_FIELDS = {'id': Novelist.id, 'name': Novelist.name}
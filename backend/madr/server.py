@@ -0,0 +1,259 @@
+"""
+servidor de produção: pré-carrega o app, congela o heap (gc.freeze) e faz
+fork de um worker uvicorn por CPU, todos no mesmo socket
+
+    madr serve [--workers N] [--host H] [--port P]
+"""
+
+import asyncio
+import gc
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import uvicorn
+
+from madr.config import Settings
+from madr.core.lifecycle import lifecycle
+
+if TYPE_CHECKING:
+    from madr.core.metrics import MetricsRegistry
+
+settings = Settings()  # type: ignore
+
+# mesmo logger do uvicorn, que já vem configurado pelo Config
+logger = logging.getLogger('uvicorn.error')
+
+# o uvicorn sai com 3 quando o lifespan (ou o import do app) falha
+STARTUP_FAILURE = 3
+# worker que cai seguidamente volta com espera dobrando até o teto; um que
+# viveu mais que o teto zera a conta
+RESPAWN_BACKOFF_SECONDS = 0.5
+RESPAWN_BACKOFF_MAX_SECONDS = 30
+
+
+def best_available(module: str, fallback: str) -> str:
+    return module if importlib.util.find_spec(module) else fallback
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    no SIGTERM marca o worker como drenando (readiness falha), continua
+    aceitando por drain_delay segundos para o balanceador tirá-lo de
+    rotação e só então fecha o socket e espera as requisições em andamento
+    """
+
+    def __init__(self, config: uvicorn.Config, drain_delay: float = 0):
+        super().__init__(config)
+        self.drain_delay = drain_delay
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None):
+        lifecycle.start_draining()
+        if self.drain_delay:
+            await asyncio.sleep(self.drain_delay)
+        logger.info(
+            'worker %d draining %d in-flight requests',
+            os.getpid(),
+            lifecycle.in_flight,
+        )
+        await super().shutdown(sockets)
+        if lifecycle.in_flight:
+            logger.warning(
+                'worker %d abandoned %d requests after %ss',
+                os.getpid(),
+                lifecycle.in_flight,
+                self.config.timeout_graceful_shutdown,
+            )
+
+
+class Supervisor:
+    """
+    processo mestre: mantém `workers` filhos vivos e, no SIGTERM/SIGINT,
+    repassa o sinal e espera a drenagem (SIGKILL depois do prazo);
+    `shutdown_timeout` é o que o lifespan leva depois das requisições
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        drain_delay: float = 0,
+        shutdown_timeout: float = 0,
+        metrics: Optional['MetricsRegistry'] = None,
+    ):
+        self.config = config
+        self.workers = workers
+        self.drain_delay = drain_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.metrics = metrics
+        # pid -> quando subiu
+        self.children: Dict[int, float] = {}
+        self.failures = 0
+        self.respawn_at = 0.0
+        self.should_exit = False
+        self.exit_code = 0
+
+    def run(self) -> int:
+        sock = self.config.bind_socket()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self.handle_exit)
+
+        # o heap pré-carregado fica fora da coleta e segue compartilhado
+        # (copy-on-write) entre os filhos
+        gc.collect()
+        gc.freeze()
+        logger.info(
+            'master %d starting %d workers on %s:%d',
+            os.getpid(),
+            self.workers,
+            self.config.host,
+            self.config.port,
+        )
+
+        while not self.should_exit:
+            self.spawn_missing(sock)
+            self.reap()
+            time.sleep(0.2)
+
+        self.stop()
+        sock.close()
+        return self.exit_code
+
+    def handle_exit(self, signum, frame):
+        self.should_exit = True
+
+    def spawn_missing(self, sock: socket.socket):
+        if time.monotonic() < self.respawn_at:
+            return
+        while len(self.children) < self.workers and not self.should_exit:
+            pid = os.fork()
+            if pid == 0:
+                os._exit(self.run_worker(sock))
+            self.children[pid] = time.monotonic()
+
+    def run_worker(self, sock: socket.socket) -> int:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        gc.enable()
+        server = DrainingServer(self.config, drain_delay=self.drain_delay)
+        try:
+            server.run(sockets=[sock])
+        except Exception:
+            logger.exception('worker %d crashed', os.getpid())
+            return 1
+        return STARTUP_FAILURE if not server.started else 0
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, time.monotonic())
+            self.compact_metrics()
+            code = os.waitstatus_to_exitcode(status)
+            if code == STARTUP_FAILURE:
+                # não adianta refazer o fork: config, banco ou import quebrado
+                logger.error('worker %d failed to boot, stopping', pid)
+                self.exit_code = STARTUP_FAILURE
+                self.should_exit = True
+            elif not self.should_exit:
+                delay = self.backoff(time.monotonic() - started)
+                logger.warning(
+                    'worker %d exited (%d), respawning in %.1fs',
+                    pid,
+                    code,
+                    delay,
+                )
+
+    def compact_metrics(self):
+        if self.metrics is None:
+            return
+        try:
+            self.metrics.compact()
+        except OSError:
+            logger.exception('could not compact metrics snapshots')
+
+    def backoff(self, lifetime: float) -> float:
+        if lifetime > RESPAWN_BACKOFF_MAX_SECONDS:
+            self.failures = 0
+        delay = min(
+            RESPAWN_BACKOFF_MAX_SECONDS,
+            RESPAWN_BACKOFF_SECONDS * 2**self.failures,
+        )
+        self.failures += 1
+        self.respawn_at = time.monotonic() + delay
+        return delay
+
+    def stop(self):
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+
+        grace = self.config.timeout_graceful_shutdown or 0
+        deadline = (
+            time.monotonic()
+            + self.drain_delay
+            + grace
+            + self.shutdown_timeout
+            + 5
+        )
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+
+        for pid in self.children:
+            logger.warning('worker %d did not drain in time, killing', pid)
+            os.kill(pid, signal.SIGKILL)
+        self.reap()
+
+
+def serve(  # noqa: PLR0913, PLR0917
+    host: str,
+    port: int,
+    workers: int,
+    graceful_timeout: float,
+    drain_delay: float = 0,
+    access_log: bool = True,
+) -> int:
+    # desliga a coleta antes de carregar o app: objetos criados no import
+    # não fragmentam páginas que serão compartilhadas pelos filhos
+    gc.disable()
+    from madr.app import app  # noqa: PLC0415
+    from madr.core.metrics import registry  # noqa: PLC0415
+
+    config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        loop=best_available('uvloop', 'asyncio'),
+        http=best_available('httptools', 'h11'),
+        lifespan='on',
+        access_log=access_log,
+        # o uvicorn só repassa para o asyncio.wait_for: fração vale
+        timeout_graceful_shutdown=graceful_timeout,  # type: ignore
+    )
+    logger.info('event loop: %s, http: %s', config.loop, config.http)
+
+    if workers == 1:
+        gc.enable()
+        server = DrainingServer(config, drain_delay=drain_delay)
+        server.run()
+        return 0 if server.started else STARTUP_FAILURE
+
+    return Supervisor(
+        config,
+        workers,
+        drain_delay=drain_delay,
+        # o JobWorker em processo drena depois das requisições
+        shutdown_timeout=settings.JOBS_SHUTDOWN_TIMEOUT
+        if settings.JOBS_IN_PROCESS
+        else 0,
+        metrics=registry,
+    ).run()
@@ -0,0 +1,61 @@
+"""jobs da aplicação: a API enfileira, `madr worker` ou o lifespan executa"""
+
+from typing import Any, Dict, List
+
+from sqlalchemy.exc import IntegrityError
+
+from madr.api.utils import is_fk_violation
+from madr.config import Settings
+from madr.core.database import async_session
+from madr.core.jobs import Job, JobFailed, JobQueue
+from madr.repositories import books as books_repository
+
+settings = Settings()  # type: ignore
+
+jobs = JobQueue(
+    'jobs',
+    result_ttl=settings.JOBS_RESULT_TTL_SECONDS,
+    visibility_timeout=settings.JOBS_VISIBILITY_TIMEOUT,
+    backoff=settings.JOBS_BACKOFF_SECONDS,
+    backoff_max=settings.JOBS_BACKOFF_MAX_SECONDS,
+    payload_chunk=settings.JOBS_PAYLOAD_CHUNK_CHARS,
+)
+
+IMPORT_BOOKS = 'books.import'
+
+
+@jobs.task(
+    IMPORT_BOOKS,
+    concurrency=settings.JOBS_CONCURRENCY.get(IMPORT_BOOKS, 1),
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+)
+async def import_books(job: Job) -> Dict[str, Any]:
+    """
+    upsert por nome em lotes de DB_UPSERT_MAX_BATCH, um commit por lote;
+    repetir o job depois de uma falha no meio é seguro (o upsert é
+    idempotente)
+    """
+    # o postgres recusa o mesmo nome duas vezes no lote: vale o último
+    rows: List[dict] = list({row['name']: row for row in job.payload}.values())
+    size = settings.DB_UPSERT_MAX_BATCH
+    created = updated = 0
+
+    for start in range(0, len(rows), size):
+        async with async_session() as session:
+            try:
+                upserted = await books_repository.upsert_books(
+                    session, rows[start : start + size]
+                )
+                await session.commit()
+            except IntegrityError as err:
+                await session.rollback()
+                if is_fk_violation(err):
+                    raise JobFailed('Novelist not found') from err
+                raise JobFailed('Integrity violation') from err
+
+        inserted = sum(row['inserted'] for row in upserted)
+        created += inserted
+        updated += len(upserted) - inserted
+        await job.progress(min(start + size, len(rows)), len(rows))
+
+    return {'created': created, 'updated': updated}
@@ -0,0 +1,49 @@
+"""
+executa os jobs da fila fora do processo da API
+
+    madr worker
+"""
+
+import asyncio
+import logging
+import signal
+
+from madr.config import Settings
+from madr.core.database import engine
+from madr.core.jobs import JobWorker
+from madr.core.redis import create_redis
+from madr.tasks import jobs
+
+logger = logging.getLogger(__name__)
+settings = Settings()  # type: ignore
+
+
+async def run() -> int:
+    redis = create_redis(settings.REDIS_URL)
+    worker = JobWorker(
+        jobs,
+        redis,
+        poll_interval=settings.JOBS_POLL_INTERVAL,
+        shutdown_timeout=settings.JOBS_SHUTDOWN_TIMEOUT,
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    logger.info('worker started for %s', ', '.join(jobs.types))
+    try:
+        await worker.run()
+    finally:
+        await redis.aclose()
+        await redis.connection_pool.aclose()
+        await engine.dispose()
+    logger.info('worker stopped')
+    return 0
+
+
+def work() -> int:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+    )
+    return asyncio.run(run())
@@ -0,0 +1,56 @@
+"""table generations
+
+Revision ID: 5c01e54c71d1
+Revises: 5909060e93bb
+Create Date: 2026-10-19 10:12:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c01e54c71d1'
+down_revision: Union[str, Sequence[str], None] = '5909060e93bb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRACKED = ('books', 'novelists')
+BUMP_GENERATION = """
+CREATE OR REPLACE FUNCTION bump_table_generation() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_generations (name, generation, changed_at)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (name) DO UPDATE
+    SET generation = table_generations.generation + 1, changed_at = now();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('table_generations',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('generation', sa.BigInteger(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute(BUMP_GENERATION)
+    for table in TRACKED:
+        op.execute(
+            f'CREATE TRIGGER {table}_generation '
+            f'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_generation()'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRACKED:
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_generation ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS bump_table_generation')
+    op.drop_table('table_generations')
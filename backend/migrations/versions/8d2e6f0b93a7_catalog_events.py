@@ -0,0 +1,89 @@
+"""catalog events
+
+Revision ID: 8d2e6f0b93a7
+Revises: 5c01e54c71d1
+Create Date: 2026-10-19 14:03:27.902113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e6f0b93a7'
+down_revision: Union[str, Sequence[str], None] = '5c01e54c71d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PUBLISHED = ('books', 'novelists')
+NOTIFY_CATALOG_EVENT = """
+CREATE OR REPLACE FUNCTION notify_catalog_event() RETURNS trigger AS $$
+DECLARE
+    row_data jsonb;
+    event_id bigint;
+    message text;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_data := to_jsonb(OLD);
+    ELSE
+        row_data := to_jsonb(NEW);
+    END IF;
+
+    INSERT INTO catalog_events (table_name, operation, row_id, data)
+    VALUES (TG_TABLE_NAME, lower(TG_OP), (row_data->>'id')::bigint, row_data)
+    RETURNING id INTO event_id;
+
+    message := json_build_object(
+        'id', event_id, 'table_name', TG_TABLE_NAME,
+        'operation', lower(TG_OP), 'row_id', (row_data->>'id')::bigint,
+        'data', row_data
+    )::text;
+    IF octet_length(message) > 7900 THEN
+        message := json_build_object('id', event_id)::text;
+    END IF;
+    PERFORM pg_notify('catalog_events', message);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('catalog_events',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('operation', sa.String(), nullable=False),
+    sa.Column('row_id', sa.BigInteger(), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_catalog_events_created_at'), 'catalog_events', ['created_at'], unique=False)
+    op.execute(NOTIFY_CATALOG_EVENT)
+    for table in PUBLISHED:
+        op.execute(
+            f'CREATE TRIGGER {table}_catalog_write '
+            f'AFTER INSERT OR DELETE ON {table} '
+            'FOR EACH ROW EXECUTE FUNCTION notify_catalog_event()'
+        )
+        op.execute(
+            f'CREATE TRIGGER {table}_catalog_update '
+            f'AFTER UPDATE ON {table} '
+            "FOR EACH ROW WHEN (to_jsonb(OLD) - 'updated_at' "
+            "IS DISTINCT FROM to_jsonb(NEW) - 'updated_at') "
+            'EXECUTE FUNCTION notify_catalog_event()'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in PUBLISHED:
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_catalog_update ON {table}')
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_catalog_write ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS notify_catalog_event')
+    op.drop_index(op.f('ix_catalog_events_created_at'), table_name='catalog_events')
+    op.drop_table('catalog_events')
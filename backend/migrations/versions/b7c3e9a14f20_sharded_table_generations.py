@@ -0,0 +1,114 @@
+"""sharded table generations
+
+Revision ID: b7c3e9a14f20
+Revises: 8d2e6f0b93a7
+Create Date: 2026-10-19 16:41:08.377120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c3e9a14f20'
+down_revision: Union[str, Sequence[str], None] = '8d2e6f0b93a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRACKED = ('books', 'novelists')
+BUMP_GENERATION = """
+CREATE OR REPLACE FUNCTION bump_table_generation() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM 1 FROM new_rows LIMIT 1;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM 1 FROM old_rows LIMIT 1;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM 1 FROM new_rows JOIN old_rows USING (id)
+        WHERE to_jsonb(new_rows) IS DISTINCT FROM to_jsonb(old_rows)
+        LIMIT 1;
+    END IF;
+    IF TG_OP <> 'TRUNCATE' AND NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO table_generations (name, slot, generation, changed_at)
+    VALUES (TG_TABLE_NAME, mod(pg_backend_pid(), 256), 1, now())
+    ON CONFLICT (name, slot) DO UPDATE
+    SET generation = table_generations.generation + 1, changed_at = now();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+OLD_BUMP_GENERATION = """
+CREATE OR REPLACE FUNCTION bump_table_generation() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_generations (name, generation, changed_at)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (name) DO UPDATE
+    SET generation = table_generations.generation + 1, changed_at = now();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+TRIGGERS = {
+    'insert': 'REFERENCING NEW TABLE AS new_rows',
+    'update': 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'delete': 'REFERENCING OLD TABLE AS old_rows',
+    'truncate': '',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TRACKED:
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_generation ON {table}')
+    # a soma dos slots continua a geração que já existia
+    op.add_column('table_generations', sa.Column('slot', sa.Integer(), server_default='0', nullable=False))
+    op.alter_column('table_generations', 'slot', server_default=None)
+    op.drop_constraint('table_generations_pkey', 'table_generations', type_='primary')
+    op.create_primary_key('table_generations_pkey', 'table_generations', ['name', 'slot'])
+    op.execute(BUMP_GENERATION)
+    for table in TRACKED:
+        for operation, referencing in TRIGGERS.items():
+            op.execute(
+                f'CREATE TRIGGER {table}_generation_{operation} '
+                f'AFTER {operation.upper()} ON {table} {referencing} '
+                'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_generation()'
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRACKED:
+        for operation in TRIGGERS:
+            op.execute(
+                f'DROP TRIGGER IF EXISTS {table}_generation_{operation} '
+                f'ON {table}'
+            )
+    # junta os slots no menor, somando: a geração não anda para trás
+    op.execute(
+        'UPDATE table_generations g '
+        'SET generation = s.generation, changed_at = s.changed_at '
+        'FROM (SELECT name, min(slot) AS slot, sum(generation) AS generation, '
+        'max(changed_at) AS changed_at FROM table_generations GROUP BY name) s '
+        'WHERE g.name = s.name AND g.slot = s.slot'
+    )
+    op.execute(
+        'DELETE FROM table_generations g '
+        'USING (SELECT name, min(slot) AS slot FROM table_generations '
+        'GROUP BY name) s '
+        'WHERE g.name = s.name AND g.slot <> s.slot'
+    )
+    op.drop_constraint('table_generations_pkey', 'table_generations', type_='primary')
+    op.drop_column('table_generations', 'slot')
+    op.create_primary_key('table_generations_pkey', 'table_generations', ['name'])
+    op.execute(OLD_BUMP_GENERATION)
+    for table in TRACKED:
+        op.execute(
+            f'CREATE TRIGGER {table}_generation '
+            f'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_generation()'
+        )
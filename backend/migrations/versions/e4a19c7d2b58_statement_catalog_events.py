@@ -0,0 +1,163 @@
+"""statement catalog events
+
+Revision ID: e4a19c7d2b58
+Revises: b7c3e9a14f20
+Create Date: 2026-10-19 17:22:51.604381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a19c7d2b58'
+down_revision: Union[str, Sequence[str], None] = 'b7c3e9a14f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PUBLISHED = ('books', 'novelists')
+NOTIFY_CATALOG_EVENT = """
+CREATE OR REPLACE FUNCTION notify_catalog_event() RETURNS trigger AS $$
+DECLARE
+    changed jsonb[];
+    first_id bigint;
+    last_id bigint;
+    message text;
+BEGIN
+    -- uma linha além do limite basta para saber que é bulk
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(row_data) INTO changed FROM (
+            SELECT to_jsonb(r) AS row_data FROM new_rows r
+            ORDER BY r.id LIMIT 100 + 1
+        ) AS picked;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(row_data) INTO changed FROM (
+            SELECT to_jsonb(r) AS row_data FROM old_rows r
+            ORDER BY r.id LIMIT 100 + 1
+        ) AS picked;
+    ELSE
+        SELECT array_agg(row_data) INTO changed FROM (
+            SELECT to_jsonb(n) AS row_data
+            FROM new_rows n JOIN old_rows o USING (id)
+            WHERE to_jsonb(o) - 'updated_at' IS DISTINCT FROM
+                to_jsonb(n) - 'updated_at'
+            ORDER BY n.id LIMIT 100 + 1
+        ) AS picked;
+    END IF;
+    IF changed IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF cardinality(changed) > 100 THEN
+        INSERT INTO catalog_events (table_name, operation, row_id, data)
+        VALUES (
+            TG_TABLE_NAME, 'bulk', NULL,
+            jsonb_build_object('operation', lower(TG_OP))
+        )
+        RETURNING id, id INTO first_id, last_id;
+    ELSE
+        WITH inserted AS (
+            INSERT INTO catalog_events (table_name, operation, row_id, data)
+            SELECT TG_TABLE_NAME, lower(TG_OP), (row_data->>'id')::bigint,
+                row_data
+            FROM unnest(changed) AS row_data
+            RETURNING id
+        )
+        SELECT min(id), max(id) INTO first_id, last_id FROM inserted;
+    END IF;
+
+    IF first_id = last_id THEN
+        SELECT json_build_object(
+            'id', id, 'table_name', table_name, 'operation', operation,
+            'row_id', row_id, 'data', data
+        )::text INTO message
+        FROM catalog_events WHERE id = first_id;
+    END IF;
+    IF message IS NULL OR octet_length(message) > 7900 THEN
+        message := json_build_object('id', first_id, 'last', last_id)::text;
+    END IF;
+    PERFORM pg_notify('catalog_events', message);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+OLD_NOTIFY_CATALOG_EVENT = """
+CREATE OR REPLACE FUNCTION notify_catalog_event() RETURNS trigger AS $$
+DECLARE
+    row_data jsonb;
+    event_id bigint;
+    message text;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_data := to_jsonb(OLD);
+    ELSE
+        row_data := to_jsonb(NEW);
+    END IF;
+
+    INSERT INTO catalog_events (table_name, operation, row_id, data)
+    VALUES (TG_TABLE_NAME, lower(TG_OP), (row_data->>'id')::bigint, row_data)
+    RETURNING id INTO event_id;
+
+    message := json_build_object(
+        'id', event_id, 'table_name', TG_TABLE_NAME,
+        'operation', lower(TG_OP), 'row_id', (row_data->>'id')::bigint,
+        'data', row_data
+    )::text;
+    IF octet_length(message) > 7900 THEN
+        message := json_build_object('id', event_id)::text;
+    END IF;
+    PERFORM pg_notify('catalog_events', message);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+TRIGGERS = {
+    'insert': 'REFERENCING NEW TABLE AS new_rows',
+    'update': 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'delete': 'REFERENCING OLD TABLE AS old_rows',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in PUBLISHED:
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_catalog_update ON {table}')
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_catalog_write ON {table}')
+    # eventos `bulk` não apontam para uma linha
+    op.alter_column('catalog_events', 'row_id', existing_type=sa.BigInteger(), nullable=True)
+    op.execute(NOTIFY_CATALOG_EVENT)
+    for table in PUBLISHED:
+        for operation, referencing in TRIGGERS.items():
+            op.execute(
+                f'CREATE TRIGGER {table}_catalog_{operation} '
+                f'AFTER {operation.upper()} ON {table} {referencing} '
+                'FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_event()'
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in PUBLISHED:
+        for operation in TRIGGERS:
+            op.execute(
+                f'DROP TRIGGER IF EXISTS {table}_catalog_{operation} '
+                f'ON {table}'
+            )
+    op.execute("DELETE FROM catalog_events WHERE operation = 'bulk'")
+    op.alter_column('catalog_events', 'row_id', existing_type=sa.BigInteger(), nullable=False)
+    op.execute(OLD_NOTIFY_CATALOG_EVENT)
+    for table in PUBLISHED:
+        op.execute(
+            f'CREATE TRIGGER {table}_catalog_write '
+            f'AFTER INSERT OR DELETE ON {table} '
+            'FOR EACH ROW EXECUTE FUNCTION notify_catalog_event()'
+        )
+        op.execute(
+            f'CREATE TRIGGER {table}_catalog_update '
+            f'AFTER UPDATE ON {table} '
+            "FOR EACH ROW WHEN (to_jsonb(OLD) - 'updated_at' "
+            "IS DISTINCT FROM to_jsonb(NEW) - 'updated_at') "
+            'EXECUTE FUNCTION notify_catalog_event()'
+        )
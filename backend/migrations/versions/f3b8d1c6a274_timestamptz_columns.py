@@ -0,0 +1,57 @@
+"""timestamptz columns
+
+Revision ID: f3b8d1c6a274
+Revises: e4a19c7d2b58
+Create Date: 2026-10-19 21:04:37.118520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1c6a274'
+down_revision: Union[str, Sequence[str], None] = 'e4a19c7d2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# os valores antigos foram gravados com now() no TimeZone da sessão, que
+# é o mesmo que o ALTER usa para interpretá-los
+COLUMNS = (
+    ('users', 'created_at'),
+    ('users', 'updated_at'),
+    ('novelists', 'created_at'),
+    ('novelists', 'updated_at'),
+    ('books', 'created_at'),
+    ('books', 'updated_at'),
+    ('table_generations', 'changed_at'),
+    ('catalog_events', 'created_at'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column in COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.DateTime(timezone=True),
+            existing_type=sa.DateTime(),
+            existing_nullable=False,
+            existing_server_default=sa.text('now()'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column in COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.DateTime(),
+            existing_type=sa.DateTime(timezone=True),
+            existing_nullable=False,
+            existing_server_default=sa.text('now()'),
+        )
@@ -9,9 +9,11 @@ from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.pool import NullPool
 from testcontainers.postgres import PostgresContainer
+from testcontainers.redis import RedisContainer
 
 from madr.app import app
 from madr.core.database import get_session
+from madr.core.redis import create_redis
 from madr.core.security import generate_token, get_hash
 from madr.models import table_registry
 from madr.models.book import Book
@@ -56,6 +58,29 @@ def engine():
 #     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope='session')
+def redis_url():
+    with RedisContainer('redis:7') as container:
+        host = container.get_container_host_ip()
+        port = container.get_exposed_port(container.port)
+        yield f'redis://{host}:{port}/0'
+
+
+@pytest_asyncio.fixture
+async def redis(redis_url: str):
+    """
+    o ASGITransport não roda o lifespan: sem esta fixture o app fica sem
+    app.state.redis e as camadas que dependem dele são ignoradas
+    """
+    client = create_redis(redis_url)
+    await client.flushdb()
+    app.state.redis = client
+    yield client
+    del app.state.redis
+    await client.aclose()
+    await client.connection_pool.aclose()
+
+
 @pytest_asyncio.fixture
 async def client(session: AsyncSession, user: User):
     async def override_get_db():
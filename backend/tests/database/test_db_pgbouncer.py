@@ -0,0 +1,99 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from testcontainers.core.container import DockerContainer
+from testcontainers.core.network import Network
+from testcontainers.core.waiting_utils import wait_for_logs
+from testcontainers.postgres import PostgresContainer
+
+from madr.core import database
+from madr.models import table_registry
+from madr.models.novelist import Novelist
+
+
+@pytest.fixture(scope='module')
+def pgbouncer():
+    with Network() as network:
+        postgres = (
+            PostgresContainer('postgres:17', driver='asyncpg')
+            .with_network(network)
+            .with_network_aliases('postgres')
+        )
+        with postgres:
+            bouncer = (
+                DockerContainer('edoburu/pgbouncer:latest')
+                .with_network(network)
+                .with_env('DB_HOST', 'postgres')
+                .with_env('DB_USER', postgres.username)
+                .with_env('DB_PASSWORD', postgres.password)
+                .with_env('DB_NAME', postgres.dbname)
+                .with_env('AUTH_TYPE', 'scram-sha-256')
+                .with_env('POOL_MODE', 'transaction')
+                .with_env('MAX_PREPARED_STATEMENTS', '0')
+                .with_env('DEFAULT_POOL_SIZE', '2')
+                .with_exposed_ports(5432)
+            )
+            with bouncer:
+                wait_for_logs(bouncer, 'process up')
+                url = (
+                    f'postgresql+asyncpg://{postgres.username}:'
+                    f'{postgres.password}@{bouncer.get_container_host_ip()}:'
+                    f'{bouncer.get_exposed_port(5432)}/{postgres.dbname}'
+                )
+                yield postgres, url
+
+
+@pytest.mark.asyncio
+async def test_engine_em_modo_transaction_deve_funcionar_via_pgbouncer(
+    pgbouncer,
+):
+    postgres, bouncer_url = pgbouncer
+    direct_engine = create_async_engine(
+        postgres.get_connection_url(), poolclass=NullPool
+    )
+    async with direct_engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.create_all)
+
+    with patch.object(database.settings, 'DB_POOLER_MODE', 'transaction'):
+        engine = database.create_engine(bouncer_url)
+
+    async def worker(n: int):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            session.add(Novelist(name=f'bouncer_{n}'))
+            await session.commit()
+            for _ in range(5):
+                total = await session.scalar(
+                    select(func.count())
+                    .select_from(Novelist)
+                    .where(Novelist.name.like(f'bouncer_{n}%'))
+                )
+                assert total >= 1
+
+    try:
+        await asyncio.gather(*(worker(n) for n in range(20)))
+
+        async with AsyncSession(engine) as session:
+            total = await session.scalar(
+                select(func.count()).select_from(Novelist)
+            )
+        assert total == 20  # noqa: PLR2004
+    finally:
+        await engine.dispose()
+        async with direct_engine.begin() as conn:
+            await conn.run_sync(table_registry.metadata.drop_all)
+        await direct_engine.dispose()
+
+
+def test_engine_em_modo_transaction_nao_deve_manter_pool_nem_cache():
+    with patch.object(database.settings, 'DB_POOLER_MODE', 'transaction'):
+        options = database.engine_options()
+
+    assert options['poolclass'] is NullPool
+    assert options['connect_args']['statement_cache_size'] == 0
+    assert options['connect_args']['prepared_statement_cache_size'] == 0
+    name_func = options['connect_args']['prepared_statement_name_func']
+    assert name_func() != name_func()
@@ -0,0 +1,203 @@
+import asyncio
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import madr.app as app_module
+from madr.core.admission import (
+    AdmissionMiddleware,
+    AdmissionPolicy,
+    Gate,
+    Overloaded,
+    route_class,
+)
+from madr.schemas.health import PoolStats
+from madr.schemas.security import Token
+
+BULK = [('PUT', '/books/by-name')]
+
+
+@pytest.mark.parametrize(
+    ('method', 'path', 'expected'),
+    [
+        ('GET', '/books/', 'read'),
+        ('HEAD', '/books/1', 'read'),
+        ('PUT', '/books/by-name', 'bulk'),
+        ('PUT', '/books/by-name/', 'bulk'),
+        ('PUT', '/books/by-name/duna', 'write'),
+        ('POST', '/books/', 'write'),
+        ('POST', '/auth/token', 'auth'),
+        ('POST', '/users/', 'auth'),
+        ('DELETE', '/users/', 'write'),
+    ],
+)
+def test_route_class(method, path, expected):
+    assert route_class(method, path, set(BULK)) == expected
+
+
+def test_import_de_livros_deve_entrar_como_bulk():
+    bulk = set(app_module.settings.ADMISSION_BULK_ROUTES)
+
+    assert route_class('POST', '/books/import', bulk) == 'bulk'
+
+
+@pytest.mark.asyncio
+async def test_gate_deve_recusar_com_a_fila_cheia():
+    gate = Gate(limit=1, queue_size=1, timeout=1)
+    await gate.acquire()
+    waiting = asyncio.create_task(gate.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded, match='queue_full'):
+        await gate.acquire()
+
+    gate.release()
+    await waiting
+    assert gate.active == 1
+    assert not gate.waiters
+
+
+@pytest.mark.asyncio
+async def test_gate_deve_recusar_depois_do_prazo_e_liberar_a_fila():
+    gate = Gate(limit=1, queue_size=4, timeout=0.01)
+    await gate.acquire()
+
+    with pytest.raises(Overloaded, match='queue_timeout'):
+        await gate.acquire()
+
+    assert not gate.waiters
+    gate.release()
+    assert gate.active == 0
+
+
+@pytest.mark.asyncio
+async def test_gate_deve_atender_em_ordem():
+    gate = Gate(limit=1, queue_size=4, timeout=1)
+    order = []
+    await gate.acquire()
+
+    async def enter(name):
+        await gate.acquire()
+        order.append(name)
+        gate.release()
+
+    tasks = [asyncio.create_task(enter(name)) for name in 'abc']
+    await asyncio.sleep(0)
+    gate.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ['a', 'b', 'c']
+    assert gate.active == 0
+
+
+def policy(**overrides):
+    values = {
+        'limit': 10,
+        'queue_size': 10,
+        'queue_timeout': 1,
+        'max_pool_waiting': 10,
+        'max_loop_lag': 1,
+    }
+    return AdmissionPolicy(**{**values, **overrides})
+
+
+def client_for(policies, pool_waiting=0, loop_lag=0.0, gate=None):
+    async def handler(request):
+        if gate is not None:
+            await gate.wait()
+        return PlainTextResponse('ok')
+
+    app = Starlette(
+        routes=[
+            Route('/books/', handler),
+            Route('/books/by-name', handler, methods=['PUT']),
+            Route('/health/live', handler),
+        ]
+    )
+    middleware = AdmissionMiddleware(
+        app,
+        policies={name: policy() for name in ('read', 'write', 'auth')}
+        | policies,
+        bulk=BULK,
+        retry_after=7,
+        pool_waiting=lambda: pool_waiting,
+        loop_lag=lambda: loop_lag,
+    )
+    return AsyncClient(
+        transport=ASGITransport(app=middleware), base_url='http://t'
+    )
+
+
+@pytest.mark.asyncio
+async def test_fila_no_pool_deve_derrubar_lotes_antes_das_leituras():
+    policies = {
+        'read': policy(max_pool_waiting=5),
+        'bulk': policy(max_pool_waiting=0),
+    }
+
+    async with client_for(policies, pool_waiting=3) as client:
+        read = await client.get('/books/')
+        bulk = await client.put('/books/by-name')
+
+    assert read.status_code == HTTPStatus.OK
+    assert bulk.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert bulk.headers['retry-after'] == '7'
+    assert bulk.json() == {'detail': 'Server overloaded'}
+
+
+@pytest.mark.asyncio
+async def test_atraso_do_event_loop_deve_recusar_na_entrada():
+    policies = {'read': policy(max_loop_lag=0.2), 'bulk': policy()}
+
+    async with client_for(policies, loop_lag=0.5) as client:
+        response = await client.get('/books/')
+        health = await client.get('/health/live')
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert health.status_code == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_limite_da_classe_deve_enfileirar_e_recusar_no_prazo():
+    gate = asyncio.Event()
+    policies = {
+        'read': policy(limit=1, queue_size=1, queue_timeout=0.05),
+        'bulk': policy(),
+    }
+
+    async with client_for(policies, gate=gate) as client:
+        first = asyncio.create_task(client.get('/books/'))
+        await asyncio.sleep(0.02)
+        queued = await client.get('/books/')
+        gate.set()
+        after = await client.get('/books/')
+
+    assert (await first).status_code == HTTPStatus.OK
+    assert queued.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert after.status_code == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_app_deve_recusar_upsert_em_lote_com_o_pool_saturado(
+    client: AsyncClient, authenticated_token: Token
+):
+    saturated = PoolStats(waiting=1)
+
+    with patch.object(app_module, 'get_pool_stats', return_value=saturated):
+        read = await client.get('/books/')
+        bulk = await client.put(
+            '/books/by-name',
+            json=[],
+            headers={
+                'Authorization': f'Bearer {authenticated_token.access_token}'
+            },
+        )
+
+    assert read.status_code == HTTPStatus.OK
+    assert bulk.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert 'retry-after' in bulk.headers
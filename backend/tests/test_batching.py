@@ -0,0 +1,119 @@
+import asyncio
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from madr.api.utils import is_fk_violation, is_unique_violation
+from madr.api.v1 import books
+from madr.core.batching import WriteBatcher
+from madr.models.book import Book
+from madr.models.novelist import Novelist
+from madr.schemas.security import Token
+from tests.utils import captured_statements, table_statements
+
+
+@pytest_asyncio.fixture
+async def book_writes(session, engine):
+    return WriteBatcher(
+        Book.__table__,  # type: ignore
+        async_sessionmaker(engine, expire_on_commit=False),
+        max_delay=0.01,
+        max_size=100,
+    )
+
+
+def book_row(novelist_id: int, n: int) -> dict:
+    return {
+        'name': f'livro_{n}',
+        'year': 2000 + n,
+        'title': f'Título {n}',
+        'id_novelist': novelist_id,
+    }
+
+
+@pytest.mark.asyncio
+async def test_escritas_concorrentes_devem_virar_um_unico_insert(
+    book_writes: WriteBatcher, novelist: Novelist, engine
+):
+    with captured_statements(engine) as statements:
+        rows = await asyncio.gather(
+            *(book_writes.submit(book_row(novelist.id, n)) for n in range(20))
+        )
+
+    assert [row['name'] for row in rows] == [f'livro_{n}' for n in range(20)]
+    assert len({row['id'] for row in rows}) == 20  # noqa: PLR2004
+    (statement,) = table_statements(statements, 'books')
+    assert statement.startswith('INSERT INTO books')
+
+
+@pytest.mark.asyncio
+async def test_cada_chamador_deve_receber_o_proprio_erro(
+    book_writes: WriteBatcher, novelist: Novelist
+):
+    results = await asyncio.gather(
+        book_writes.submit(book_row(novelist.id, 1)),
+        book_writes.submit(book_row(99999, 2)),
+        book_writes.submit(book_row(novelist.id, 1)),
+        book_writes.submit({**book_row(novelist.id, 3), 'name': ''}),
+        book_writes.submit(book_row(novelist.id, 4)),
+        return_exceptions=True,
+    )
+
+    ok, fk, duplicated, empty, other = results
+    assert ok['name'] == 'livro_1'
+    assert other['name'] == 'livro_4'
+    assert isinstance(fk, IntegrityError)
+    assert is_fk_violation(fk)
+    assert isinstance(duplicated, IntegrityError)
+    assert is_unique_violation(duplicated)
+    assert isinstance(empty, IntegrityError)
+    assert 'ck_book_name_len' in str(empty)
+
+
+@pytest.mark.asyncio
+async def test_erro_de_dado_deve_ficar_com_quem_mandou(
+    book_writes: WriteBatcher, novelist: Novelist
+):
+    ok, out_of_range = await asyncio.gather(
+        book_writes.submit(book_row(novelist.id, 1)),
+        book_writes.submit({**book_row(novelist.id, 2), 'year': 2**40}),
+        return_exceptions=True,
+    )
+
+    assert ok['name'] == 'livro_1'
+    assert isinstance(out_of_range, DBAPIError)
+    assert not isinstance(out_of_range, IntegrityError)
+
+
+@pytest.mark.asyncio
+async def test_create_book_com_batching_deve_responder_cada_requisicao(
+    client: AsyncClient,
+    authenticated_token: Token,
+    novelist: Novelist,
+    book_writes: WriteBatcher,
+):
+    auth = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+    payloads = [
+        {'name': 'a', 'year': 1, 'title': 'A', 'idNovelist': novelist.id},
+        {'name': 'b', 'year': 2, 'title': 'B', 'idNovelist': 99999},
+    ]
+
+    with (
+        patch.object(books.settings, 'DB_WRITE_BATCHING', True),
+        patch.object(books, 'book_writes', book_writes),
+    ):
+        # a sessão dos testes não aceita requisições concorrentes
+        created, missing = [
+            await client.post('/books/', json=payload, headers=auth)
+            for payload in payloads
+        ]
+
+    assert created.status_code == HTTPStatus.CREATED
+    assert created.json()['name'] == 'a'
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+    assert missing.json() == {'detail': 'Novelist not found'}
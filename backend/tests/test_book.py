@@ -18,7 +18,11 @@ from madr.models.user import User
 from madr.schemas.books import BookPublic
 from madr.schemas.security import Token
 from tests.factories import BookFactory
-from tests.utils import frozen_context
+from tests.utils import (
+    captured_statements,
+    frozen_context,
+    table_statements,
+)
 
 base_url = '/books/'
 
@@ -45,6 +49,28 @@ async def test_create_book_deve_ter_exito_e_retornar_book_com_id(
     assert response.status_code == HTTPStatus.CREATED
 
 
+@pytest.mark.asyncio
+async def test_create_book_deve_usar_um_unico_insert_returning(
+    client: AsyncClient,
+    authenticated_token: Token,
+    book_payload: dict,
+    engine,
+):
+    with captured_statements(engine) as statements:
+        response = await client.post(
+            base_url,
+            json=book_payload,
+            headers={
+                'Authorization': f'Bearer {authenticated_token.access_token}'
+            },
+        )
+
+    assert response.status_code == HTTPStatus.CREATED
+    (statement,) = table_statements(statements, 'books')
+    assert statement.startswith('INSERT INTO books')
+    assert 'RETURNING' in statement
+
+
 # @pytest.mark.asyncio
 # async def test_create_book_deve_falhar_com_conflict(
 #     session: AsyncSession,
@@ -505,6 +531,249 @@ async def test_update_book_deve_falhar_integrity_error_generico(
     mock_session.rollback.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_update_book_deve_usar_um_unico_update_returning(
+    client: AsyncClient,
+    authenticated_token: Token,
+    book: Book,
+    engine,
+):
+    with captured_statements(engine) as statements:
+        response = await client.put(
+            f'{base_url}{book.id}',
+            json={'title': 'Single Round Trip'},
+            headers={
+                'Authorization': f'Bearer {authenticated_token.access_token}'
+            },
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    (statement,) = table_statements(statements, 'books')
+    assert statement.startswith('UPDATE books')
+    assert 'RETURNING' in statement
+
+
+@pytest.mark.asyncio
+async def test_update_book_com_if_match_atual_deve_ter_exito(
+    client: AsyncClient,
+    authenticated_token: Token,
+    book: Book,
+):
+    etag = (await client.get(f'{base_url}{book.id}')).headers['etag']
+
+    response = await client.put(
+        f'{base_url}{book.id}',
+        json={'title': 'With Precondition'},
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}',
+            'If-Match': etag,
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['title'] == 'With Precondition'
+    assert response.headers['etag'] != etag
+    read = await client.get(f'{base_url}{book.id}')
+    assert read.headers['etag'] == response.headers['etag']
+
+
+@pytest.mark.asyncio
+async def test_update_book_com_if_match_desatualizado_deve_falhar_com_412(
+    client: AsyncClient,
+    authenticated_token: Token,
+    book: Book,
+):
+    auth = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+    etag = (await client.get(f'{base_url}{book.id}')).headers['etag']
+    await client.put(
+        f'{base_url}{book.id}', json={'title': 'First Writer'}, headers=auth
+    )
+
+    response = await client.put(
+        f'{base_url}{book.id}',
+        json={'title': 'Second Writer'},
+        headers={**auth, 'If-Match': etag},
+    )
+
+    assert response.status_code == HTTPStatus.PRECONDITION_FAILED
+    assert response.json() == {'detail': 'Book has been modified'}
+    read = await client.get(f'{base_url}{book.id}')
+    assert read.json()['title'] == 'First Writer'
+
+
+@pytest.mark.asyncio
+async def test_update_book_com_if_match_em_book_inexistente_deve_dar_404(
+    client: AsyncClient,
+    authenticated_token: Token,
+):
+    response = await client.put(
+        f'{base_url}99999',
+        json={'title': 'Nobody'},
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}',
+            'If-Match': '"1"',
+        },
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Book not found'}
+
+
+# ============================================================================
+# UPSERT TESTS
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_upsert_book_deve_criar_e_depois_atualizar_pelo_nome(
+    client: AsyncClient,
+    authenticated_token: Token,
+    novelist: Novelist,
+    engine,
+):
+    auth = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+    payload = {'year': 1990, 'title': 'Primeiro', 'idNovelist': novelist.id}
+
+    with captured_statements(engine) as statements:
+        created = await client.put(
+            f'{base_url}by-name/livro', json=payload, headers=auth
+        )
+    updated = await client.put(
+        f'{base_url}by-name/livro',
+        json={**payload, 'title': 'Segundo'},
+        headers=auth,
+    )
+
+    assert created.status_code == HTTPStatus.CREATED
+    assert updated.status_code == HTTPStatus.OK
+    assert updated.json() == {
+        'name': 'livro',
+        'year': 1990,
+        'title': 'Segundo',
+        'id': created.json()['id'],
+    }
+    assert updated.headers['etag'] != created.headers['etag']
+    (statement,) = table_statements(statements, 'books')
+    assert 'ON CONFLICT (name) DO UPDATE' in statement
+
+
+@pytest.mark.asyncio
+async def test_upsert_book_repetido_deve_ser_idempotente(
+    client: AsyncClient, authenticated_token: Token, book: Book
+):
+    auth = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+    before = await client.get(f'{base_url}{book.id}')
+    payload = {
+        'year': book.year,
+        'title': book.title,
+        'idNovelist': book.id_novelist,
+    }
+
+    response = await client.put(
+        f'{base_url}by-name/{book.name}', json=payload, headers=auth
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['id'] == book.id
+    assert response.headers['etag'] == before.headers['etag']
+
+
+@pytest.mark.asyncio
+async def test_upsert_book_com_novelist_inexistente_deve_dar_404(
+    client: AsyncClient, authenticated_token: Token
+):
+    response = await client.put(
+        f'{base_url}by-name/livro',
+        json={'year': 1990, 'title': 'Sem autor', 'idNovelist': 99999},
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}'
+        },
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Novelist not found'}
+
+
+@pytest.mark.asyncio
+async def test_upsert_books_em_lote_deve_usar_um_unico_statement(
+    client: AsyncClient,
+    authenticated_token: Token,
+    book: Book,
+    engine,
+):
+    def item(name: str, title: str) -> dict:
+        return {
+            'name': name,
+            'year': 2001,
+            'title': title,
+            'idNovelist': book.id_novelist,
+        }
+
+    payload = [
+        item(book.name, 'Atualizado'),
+        item('novo_1', 'Novo'),
+        item('novo_2', 'Rascunho'),
+        item('novo_2', 'Final'),
+    ]
+
+    with captured_statements(engine) as statements:
+        response = await client.put(
+            f'{base_url}by-name',
+            json=payload,
+            headers={
+                'Authorization': f'Bearer {authenticated_token.access_token}'
+            },
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert body['created'] == 2  # noqa: PLR2004
+    assert body['updated'] == 1
+    titles = {b['name']: b['title'] for b in body['data']}
+    assert titles == {
+        book.name: 'Atualizado',
+        'novo_1': 'Novo',
+        'novo_2': 'Final',
+    }
+    (statement,) = table_statements(statements, 'books')
+    assert statement.startswith('INSERT INTO books')
+
+
+@pytest.mark.asyncio
+async def test_upsert_books_acima_do_limite_deve_falhar_com_422(
+    client: AsyncClient, authenticated_token: Token
+):
+    item = {'name': 'x', 'year': 1, 'title': 'x', 'idNovelist': 1}
+
+    response = await client.put(
+        f'{base_url}by-name',
+        json=[item] * 1001,
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}'
+        },
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_upsert_books_com_titulo_vazio_deve_falhar_com_422(
+    client: AsyncClient, authenticated_token: Token, novelist
+):
+    item = {'name': 'x', 'year': 1, 'title': '', 'idNovelist': novelist.id}
+
+    response = await client.put(
+        f'{base_url}by-name',
+        json=[item],
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}'
+        },
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'Invalid book'}
+
+
 # ============================================================================
 # DELETE TESTS
 # ============================================================================
@@ -0,0 +1,318 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from redis.asyncio import Redis
+from sqlalchemy.exc import OperationalError
+
+from madr.api.v1 import books
+from madr.core.cache import (
+    REVALIDATION_FAILED,
+    STALE,
+    Cached,
+    CacheEntry,
+    ReadCache,
+)
+from madr.core.metrics import CACHE_LOCK_WAIT
+from madr.models.book import Book
+from madr.schemas.security import Token
+from tests.utils import captured_statements, table_statements
+
+
+@asynccontextmanager
+async def no_session():
+    yield None
+
+
+def build_cache(**kwargs) -> ReadCache:
+    options = {
+        'ttl': 30,
+        'hard_ttl': 600,
+        'lock_seconds': 5,
+        'lock_wait': 2,
+        'poll_interval': 0.01,
+        'sessions': no_session,
+        **kwargs,
+    }
+    return ReadCache('teste', **options)
+
+
+class Counter:
+    def __init__(self, delay: float = 0, error: Exception | None = None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self, session) -> Cached:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return b'{"n":%d}' % self.calls, {'ETag': f'"{self.calls}"'}
+
+
+DB_DOWN = OperationalError('select', {}, Exception('connection refused'))
+
+
+def entry(body: bytes, age: float, ttl: float, delta: float = 0.01):
+    now = time.time()
+    return CacheEntry(body, {'ETag': '"0"'}, now - age, now - age + ttl, delta)
+
+
+@pytest.mark.asyncio
+async def test_cache_deve_recalcular_so_na_falta(redis: Redis):
+    cache = build_cache()
+    compute = Counter()
+
+    first = await cache.fetch(redis, cache.key('q'), None, compute)
+    second = await cache.fetch(redis, cache.key('q'), None, compute)
+
+    assert first == second == (b'{"n":1}', {'ETag': '"1"'})
+    assert compute.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_falta_concorrente_deve_recalcular_uma_vez(redis: Redis):
+    cache = build_cache()
+    compute = Counter(delay=0.05)
+    waits_before = sum(
+        sample[-2] for sample in CACHE_LOCK_WAIT.samples.values()
+    )
+
+    results = await asyncio.gather(
+        *(cache.fetch(redis, cache.key('q'), None, compute) for _ in range(20))
+    )
+
+    assert {body for body, _ in results} == {b'{"n":1}'}
+    assert compute.calls == 1
+    waits = CACHE_LOCK_WAIT.samples[('teste',)]
+    assert sum(waits[:-1]) - waits_before >= 19  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ('remaining', 'expected'),
+    [(100, False), (0.001, True)],
+)
+def test_xfetch_deve_renovar_perto_de_expirar(remaining, expected):
+    cache = build_cache()
+    fresh = entry(b'{}', age=0, ttl=remaining, delta=0.5)
+
+    with patch('madr.core.cache.random.random', return_value=0.5):
+        assert cache.expires_early(fresh) is expected
+
+
+@pytest.mark.asyncio
+async def test_renovacao_antecipada_deve_manter_a_entrada_para_os_outros(
+    redis: Redis,
+):
+    cache = build_cache()
+    key = cache.key('q')
+    await redis.set(key, entry(b'"velho"', age=0, ttl=30).dumps())
+    await redis.set(f'{key}:lock', 'outro-worker')
+    compute = Counter()
+
+    with patch.object(cache, 'expires_early', return_value=True):
+        result = await cache.fetch(redis, key, None, compute)
+
+    assert result == (b'"velho"', {'ETag': '"0"'})
+    assert compute.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_entrada_velha_deve_ser_servida_e_renovada_em_segundo_plano(
+    redis: Redis,
+):
+    cache = build_cache()
+    key = cache.key('q')
+    await redis.set(key, entry(b'"velho"', age=40, ttl=30).dumps())
+    compute = Counter(delay=0.05)
+
+    body, headers = await cache.fetch(redis, key, None, compute)
+
+    assert body == b'"velho"'
+    assert headers == {'ETag': '"0"', 'Age': '40', 'Warning': STALE}
+    assert compute.calls == 0  # a requisição não esperou o banco
+    await asyncio.gather(*cache.refreshing)
+    assert compute.calls == 1
+    body, headers = await cache.fetch(redis, key, None, compute)
+    assert (body, headers['ETag']) == (b'{"n":1}', '"1"')
+
+
+@pytest.mark.asyncio
+async def test_renovacao_em_segundo_plano_deve_ser_unica(redis: Redis):
+    cache = build_cache()
+    key = cache.key('q')
+    await redis.set(key, entry(b'"velho"', age=40, ttl=30).dumps())
+    compute = Counter(delay=0.05)
+
+    await asyncio.gather(
+        *(cache.fetch(redis, key, None, compute) for _ in range(10))
+    )
+    await asyncio.gather(*cache.refreshing)
+
+    assert compute.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_erro_no_banco_deve_manter_a_entrada_velha(redis: Redis):
+    cache = build_cache()
+    key = cache.key('q')
+    await redis.set(key, entry(b'"velho"', age=40, ttl=30).dumps())
+    compute = Counter(error=DB_DOWN)
+
+    for _ in range(2):
+        body, headers = await cache.fetch(redis, key, None, compute)
+        await asyncio.gather(*cache.refreshing)
+
+    assert compute.calls == 2  # noqa: PLR2004
+    assert body == b'"velho"'
+    assert headers['Warning'] == STALE
+    assert not await redis.exists(f'{key}:lock')
+
+
+@pytest.mark.asyncio
+async def test_erro_ao_renovar_entrada_fresca_deve_servir_a_antiga(
+    redis: Redis,
+):
+    cache = build_cache()
+    key = cache.key('q')
+    await redis.set(key, entry(b'"antigo"', age=5, ttl=30).dumps())
+
+    with patch.object(cache, 'expires_early', return_value=True):
+        body, headers = await cache.fetch(
+            redis, key, None, Counter(error=DB_DOWN)
+        )
+
+    assert body == b'"antigo"'
+    assert headers == {
+        'ETag': '"0"',
+        'Age': '5',
+        'Warning': REVALIDATION_FAILED,
+    }
+
+
+@pytest.mark.asyncio
+async def test_entrada_deve_sumir_no_hard_ttl(redis: Redis):
+    cache = build_cache(ttl=0.01, hard_ttl=0.05)
+    key = cache.key('q')
+    await cache.fetch(redis, key, None, Counter())
+
+    assert 0 < await redis.pttl(key) <= 50  # noqa: PLR2004
+    await asyncio.sleep(0.1)
+    with pytest.raises(OperationalError):
+        await cache.fetch(redis, key, None, Counter(error=DB_DOWN))
+
+
+@pytest.mark.asyncio
+async def test_sem_redis_deve_calcular_direto():
+    cache = build_cache()
+    compute = Counter()
+
+    await cache.fetch(None, cache.key('q'), None, compute)
+    await cache.fetch(None, cache.key('q'), None, compute)
+
+    assert compute.calls == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_bypass_deve_ler_direto_do_banco(redis: Redis):
+    cache = build_cache(bypass=lambda: True)
+    compute = Counter()
+
+    await cache.fetch(redis, cache.key('q'), None, compute)
+    await cache.fetch(redis, cache.key('q'), None, compute)
+
+    assert compute.calls == 2  # noqa: PLR2004
+    assert not await redis.exists(cache.key('q'))
+
+
+def test_chave_deve_mudar_com_a_geracao():
+    cache = build_cache()
+
+    first = cache.key('q', (1, None))
+
+    assert cache.key('q', (2, None)) != first
+    # banco fora: vale a última geração vista
+    assert cache.key('q') == cache.key('q', (2, None))
+
+
+@pytest.mark.asyncio
+async def test_read_books_deve_servir_do_cache(
+    client: AsyncClient, book: Book, redis: Redis, engine
+):
+    first = await client.get('/books/?page=1')
+    with captured_statements(engine) as statements:
+        second = await client.get('/books/?page=1')
+
+    assert second.status_code == first.status_code
+    assert second.content == first.content
+    assert second.json()['data'][0]['id'] == book.id
+    assert table_statements(statements, 'books') == []
+
+
+@pytest.mark.asyncio
+async def test_read_books_deve_servir_copia_velha_se_o_banco_falhar(
+    client: AsyncClient, book: Book, redis: Redis
+):
+    with patch.object(books.books_cache, 'ttl', 0):
+        first = await client.get('/books/?page=1')  # já nasce velha
+    with (
+        patch.object(books, 'table_version', side_effect=DB_DOWN),
+        patch.object(books, '_read_books', side_effect=DB_DOWN),
+    ):
+        second = await client.get('/books/?page=1')
+        await asyncio.gather(*books.books_cache.refreshing)
+
+    assert second.status_code == HTTPStatus.OK
+    assert second.content == first.content
+    assert second.headers['warning'] == STALE
+    assert 'age' in second.headers
+
+
+@pytest.mark.asyncio
+async def test_escrita_deve_tirar_a_lista_do_cache(
+    client: AsyncClient,
+    book: Book,
+    redis: Redis,
+    authenticated_token: Token,
+):
+    await client.get('/books/?page=1')
+    await client.put(
+        f'/books/{book.id}',
+        json={'title': 'Outro'},
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}'
+        },
+    )
+
+    response = await client.get('/books/?page=1')
+
+    assert response.json()['data'][0]['title'] == 'Outro'
+
+
+@pytest.mark.asyncio
+async def test_copia_velha_nao_deve_esconder_uma_escrita(
+    client: AsyncClient,
+    book: Book,
+    redis: Redis,
+    authenticated_token: Token,
+):
+    with patch.object(books.books_cache, 'ttl', 0):
+        await client.get('/books/?page=1')  # já nasce velha
+    await client.put(
+        f'/books/{book.id}',
+        json={'title': 'Outro'},
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}'
+        },
+    )
+
+    response = await client.get('/books/?page=1')
+    await asyncio.gather(*books.books_cache.refreshing)
+
+    assert 'warning' not in response.headers
+    assert response.json()['data'][0]['title'] == 'Outro'
@@ -0,0 +1,222 @@
+from datetime import UTC, datetime, timedelta
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.api.v1 import books
+from madr.core import conditional
+from madr.core.conditional import etag_matches
+from madr.models.book import Book
+from madr.models.novelist import Novelist
+from madr.repositories.generations import table_version
+from madr.schemas.security import Token
+from tests.utils import captured_statements, table_statements
+
+
+@pytest.mark.parametrize(
+    ('if_none_match', 'expected'),
+    [
+        ('"a"', True),
+        ('W/"a"', True),
+        ('"b", "a"', True),
+        ('*', True),
+        ('"b"', False),
+        ('a', False),
+    ],
+)
+def test_if_none_match_deve_usar_comparacao_fraca(if_none_match, expected):
+    assert etag_matches(if_none_match, '"a"') is expected
+
+
+@pytest.mark.asyncio
+async def test_get_book_deve_enviar_validadores(
+    client: AsyncClient, book: Book
+):
+    response = await client.get(f'/books/{book.id}')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['etag'].startswith('"')
+    assert response.headers['last-modified'].endswith(' GMT')
+    assert response.headers['cache-control'] == 'no-cache'
+
+
+@pytest.mark.asyncio
+async def test_last_modified_nao_deve_depender_do_fuso_da_sessao(
+    client: AsyncClient, session: AsyncSession
+):
+    await session.execute(text("SET LOCAL TIME ZONE 'America/Sao_Paulo'"))
+    novelist = Novelist(name='fuso')
+    session.add(novelist)
+    await session.commit()
+
+    response = await client.get(f'/novelists/{novelist.id}')
+
+    last_modified = parsedate_to_datetime(response.headers['last-modified'])
+    assert abs(datetime.now(UTC) - last_modified) < timedelta(minutes=1)
+
+
+@pytest.mark.asyncio
+async def test_get_book_com_if_none_match_deve_responder_304_sem_corpo(
+    client: AsyncClient, book: Book
+):
+    etag = (await client.get(f'/books/{book.id}')).headers['etag']
+
+    with patch.object(books, 'render_body') as render:
+        response = await client.get(
+            f'/books/{book.id}', headers={'If-None-Match': etag}
+        )
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.content == b''
+    assert response.headers['etag'] == etag
+    render.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_book_com_if_modified_since(client: AsyncClient, book: Book):
+    last_modified = (await client.get(f'/books/{book.id}')).headers[
+        'last-modified'
+    ]
+
+    same = await client.get(
+        f'/books/{book.id}', headers={'If-Modified-Since': last_modified}
+    )
+    older = await client.get(
+        f'/books/{book.id}',
+        headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'},
+    )
+
+    assert same.status_code == HTTPStatus.NOT_MODIFIED
+    assert older.status_code == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_etag_do_get_deve_continuar_valendo_para_o_if_match(
+    client: AsyncClient, book: Book, authenticated_token: Token
+):
+    etag = (await client.get(f'/books/{book.id}')).headers['etag']
+
+    response = await client.put(
+        f'/books/{book.id}',
+        json={'title': 'Outro'},
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}',
+            'If-Match': etag,
+        },
+    )
+    read = await client.get(
+        f'/books/{book.id}', headers={'If-None-Match': etag}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert read.status_code == HTTPStatus.OK
+    assert read.headers['etag'] == response.headers['etag']
+
+
+@pytest.mark.asyncio
+async def test_escritas_devem_avancar_a_geracao_da_tabela(
+    session: AsyncSession, novelist: Novelist
+):
+    generation, _ = await table_version(session, 'books')
+    session.add(Book(year=2000, title='T', name='n', id_novelist=novelist.id))
+    await session.commit()
+
+    after, changed_at = await table_version(session, 'books')
+    assert after == generation + 1
+    assert changed_at is not None
+    assert (await table_version(session, 'users'))[0] == 0
+
+
+@pytest.mark.asyncio
+async def test_escrita_sem_mudanca_nao_deve_avancar_a_geracao(
+    session: AsyncSession, novelist: Novelist
+):
+    version = await table_version(session, 'novelists')
+    await session.execute(
+        update(Novelist).where(Novelist.id == -1).values(name='x')
+    )
+    # como o upsert repetido: reescreve a linha com os mesmos valores
+    await session.execute(
+        update(Novelist)
+        .where(Novelist.id == novelist.id)
+        .values(name=novelist.name, updated_at=Novelist.updated_at)
+    )
+    await session.commit()
+
+    assert await table_version(session, 'novelists') == version
+
+
+@pytest.mark.asyncio
+async def test_lista_com_if_none_match_deve_responder_304_sem_consultar(
+    client: AsyncClient, book: Book, engine
+):
+    first = await client.get('/books/?page=1')
+
+    with (
+        patch.object(books.settings, 'DB_LIST_BACKEND', 'orm'),
+        captured_statements(engine) as statements,
+    ):
+        response = await client.get(
+            '/books/?page=1', headers={'If-None-Match': first.headers['etag']}
+        )
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['etag'] == first.headers['etag']
+    assert 'stale-while-revalidate' in response.headers['cache-control']
+    assert table_statements(statements, 'books') == []
+
+
+@pytest.mark.asyncio
+async def test_escrita_deve_mudar_o_etag_da_lista(
+    client: AsyncClient,
+    book: Book,
+    authenticated_token: Token,
+):
+    first = await client.get('/books/?page=1')
+    await client.put(
+        f'/books/{book.id}',
+        json={'title': 'Outro'},
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}'
+        },
+    )
+
+    response = await client.get(
+        '/books/?page=1', headers={'If-None-Match': first.headers['etag']}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['etag'] != first.headers['etag']
+    assert response.json()['data'][0]['title'] == 'Outro'
+
+
+@pytest.mark.asyncio
+async def test_etag_da_lista_deve_depender_da_consulta(
+    client: AsyncClient, book: Book
+):
+    first = await client.get('/books/?page=1')
+    other = await client.get(
+        '/books/?page=2', headers={'If-None-Match': first.headers['etag']}
+    )
+
+    assert other.status_code == HTTPStatus.OK
+    assert other.headers['etag'] != first.headers['etag']
+
+
+@pytest.mark.asyncio
+async def test_cache_control_deve_ser_configuravel_por_rota(
+    client: AsyncClient, novelist: Novelist
+):
+    with patch.dict(
+        conditional.settings.HTTP_CACHE_CONTROL,
+        {'read_novelists_by': 'private, max-age=60'},
+    ):
+        response = await client.get('/novelists/')
+
+    assert response.headers['cache-control'] == 'private, max-age=60'
+    assert response.headers['etag'].startswith('"novelists.')
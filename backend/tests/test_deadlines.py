@@ -0,0 +1,177 @@
+import asyncio
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core import deadlines
+from madr.core.deadlines import add_deadline_handlers, query_deadline
+
+SLEEPING = text(
+    'SELECT count(*) FROM pg_stat_activity '
+    "WHERE query LIKE '%pg_sleep(5.0)%' AND state = 'active' "
+    'AND pid <> pg_backend_pid()'
+)
+
+
+async def sleeping(engine) -> int:
+    # pg_stat_activity é fotografado por transação, então uma por consulta
+    async with engine.connect() as conn:
+        return await conn.scalar(SLEEPING)
+
+
+def build_app(engine) -> FastAPI:
+    app = FastAPI(dependencies=[Depends(query_deadline, scope='function')])
+    add_deadline_handlers(app)
+
+    @app.get('/sleep/{seconds}')
+    async def slow(seconds: float):
+        async with AsyncSession(engine) as session:
+            await session.execute(text(f'SELECT pg_sleep({seconds})'))
+            timeout = await session.scalar(text('SHOW statement_timeout'))
+        return {'timeout': timeout}
+
+    @app.post('/sleep/{seconds}')
+    async def slow_write(seconds: float):
+        async with AsyncSession(engine) as session:
+            await session.execute(text(f'SELECT pg_sleep({seconds})'))
+        return {'done': True}
+
+    @app.get('/broken')
+    async def broken():
+        async with AsyncSession(engine) as session:
+            await session.execute(text('SELECT 1 / 0'))
+
+    @app.get('/busy')
+    async def busy():
+        raise PoolTimeoutError('QueuePool limit reached')
+
+    return app
+
+
+async def get(app: FastAPI, uri: str):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        return await client.get(uri)
+
+
+@pytest.mark.asyncio
+async def test_query_deadline_deve_aplicar_timeout_da_rota(engine):
+    with patch.dict(deadlines.settings.DB_ROUTE_TIMEOUTS_MS, {'slow': 1500}):
+        response = await get(build_app(engine), '/sleep/0')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {'timeout': '1500ms'}
+
+    async with AsyncSession(engine) as session:
+        timeout = await session.scalar(text('SHOW statement_timeout'))
+    assert timeout == '0'
+
+
+@pytest.mark.asyncio
+async def test_query_deadline_estourado_deve_retornar_504(engine):
+    with patch.dict(deadlines.settings.DB_ROUTE_TIMEOUTS_MS, {'slow': 50}):
+        response = await get(build_app(engine), '/sleep/1')
+
+    assert response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+    assert response.json() == {'detail': 'Query timed out'}
+
+
+@pytest.mark.asyncio
+async def test_outros_erros_do_banco_nao_viram_504(engine):
+    with pytest.raises(DBAPIError, match='division by zero'):
+        await get(build_app(engine), '/broken')
+
+
+@pytest.mark.asyncio
+async def test_pool_esgotado_deve_retornar_503_com_retry_after(engine):
+    response = await get(build_app(engine), '/busy')
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json() == {'detail': 'Database busy'}
+    assert response.headers['retry-after'] == str(
+        deadlines.settings.DB_RETRY_AFTER_SECONDS
+    )
+
+
+def request_scope(method: str, path: str) -> dict:
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'test')],
+        'server': ('test', 80),
+        'client': ('127.0.0.1', 1234),
+    }
+
+
+def disconnecting_client(disconnected: asyncio.Event, sent: list):
+    messages = iter([{'type': 'http.request', 'body': b''}])
+
+    async def receive():
+        message = next(messages, None)
+        if message is not None:
+            return message
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    return receive, send
+
+
+@pytest.mark.asyncio
+async def test_cliente_desconectado_deve_cancelar_a_consulta(engine):
+    disconnected = asyncio.Event()
+    sent = []
+    request = asyncio.create_task(
+        build_app(engine)(
+            request_scope('GET', '/sleep/5'),
+            *disconnecting_client(disconnected, sent),
+        )
+    )
+    for _ in range(50):
+        if await sleeping(engine):
+            break
+        await asyncio.sleep(0.05)
+    else:
+        pytest.fail('a consulta não começou')
+
+    disconnected.set()
+    # termina sem exceção: o servidor não loga um erro por desconexão
+    await asyncio.wait_for(request, timeout=2)
+
+    await asyncio.sleep(0.1)
+    assert await sleeping(engine) == 0
+    assert sent[0]['status'] == deadlines.CLIENT_CLOSED_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_escrita_nao_deve_ser_cancelada_pela_desconexao(engine):
+    disconnected = asyncio.Event()
+    disconnected.set()
+    sent = []
+
+    await asyncio.wait_for(
+        build_app(engine)(
+            request_scope('POST', '/sleep/0.2'),
+            *disconnecting_client(disconnected, sent),
+        ),
+        timeout=2,
+    )
+
+    assert sent[0]['status'] == HTTPStatus.OK
@@ -0,0 +1,281 @@
+import asyncio
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from madr.api.v1 import events
+from madr.core.events import CatalogFeed, TooManySubscribers, asyncpg_dsn
+from madr.core.lifecycle import lifecycle
+from madr.models.catalog_event import (
+    CHANNEL,
+    MAX_ROW_EVENTS,
+    CatalogEvent,
+)
+from madr.models.novelist import Novelist
+
+
+def make_feed(session: AsyncSession, **overrides) -> CatalogFeed:
+    values = {
+        'buffer': 16,
+        'max_subscribers': 2,
+        'replay_limit': 10,
+        'retention_seconds': 60,
+        'reconnect_interval': 0.05,
+    }
+    return CatalogFeed(
+        asyncpg_dsn(session.bind.url.render_as_string(hide_password=False)),
+        CHANNEL,
+        async_sessionmaker(session.bind, expire_on_commit=False),
+        **{**values, **overrides},
+    )
+
+
+async def next_event(subscriber):
+    async with asyncio.timeout(5):
+        return await subscriber.queue.get()
+
+
+@pytest_asyncio.fixture
+async def draining():
+    # o stream termina depois do histórico em vez de esperar por eventos
+    lifecycle.draining = True
+    yield
+    lifecycle.draining = False
+
+
+@pytest.mark.asyncio
+async def test_escritas_devem_chegar_aos_assinantes(session: AsyncSession):
+    feed = make_feed(session)
+
+    async with feed.lifespan():
+        await asyncio.wait_for(feed.listening.wait(), 5)
+        subscriber = feed.subscribe()
+
+        novelist = Novelist(name='clarice')
+        session.add(novelist)
+        await session.commit()
+        await session.execute(
+            update(Novelist)
+            .where(Novelist.id == novelist.id)
+            .values(name='clarice')
+        )
+        await session.execute(
+            update(Novelist)
+            .where(Novelist.id == novelist.id)
+            .values(name='clarice lispector')
+        )
+        await session.execute(
+            delete(Novelist).where(Novelist.id == novelist.id)
+        )
+        await session.commit()
+
+        created = await next_event(subscriber)
+        updated = await next_event(subscriber)
+        deleted = await next_event(subscriber)
+
+    assert (created['table_name'], created['operation']) == (
+        'novelists',
+        'insert',
+    )
+    assert created['row_id'] == novelist.id
+    assert created['data']['name'] == 'clarice'
+    # o update sem mudança não gera evento
+    assert updated['operation'] == 'update'
+    assert updated['data']['name'] == 'clarice lispector'
+    assert deleted['operation'] == 'delete'
+    assert created['id'] < updated['id'] < deleted['id']
+    assert subscriber.queue.empty()
+    assert feed.last_id == deleted['id']
+
+
+@pytest.mark.asyncio
+async def test_comando_com_varias_linhas_deve_chegar_inteiro(
+    session: AsyncSession,
+):
+    feed = make_feed(session)
+
+    async with feed.lifespan():
+        await asyncio.wait_for(feed.listening.wait(), 5)
+        subscriber = feed.subscribe()
+        await session.execute(
+            insert(Novelist).values([{'name': f'n{n}'} for n in range(3)])
+        )
+        await session.commit()
+
+        received = [await next_event(subscriber) for _ in range(3)]
+
+    assert [e['data']['name'] for e in received] == ['n0', 'n1', 'n2']
+    assert {e['operation'] for e in received} == {'insert'}
+
+
+@pytest.mark.asyncio
+async def test_comando_grande_deve_virar_um_evento_bulk(
+    session: AsyncSession,
+):
+    feed = make_feed(session)
+    names = [{'name': f'n{n}'} for n in range(MAX_ROW_EVENTS + 1)]
+
+    async with feed.lifespan():
+        await asyncio.wait_for(feed.listening.wait(), 5)
+        subscriber = feed.subscribe()
+        await session.execute(insert(Novelist).values(names))
+        await session.execute(update(Novelist).values(name=Novelist.name))
+        await session.execute(delete(Novelist))
+        await session.commit()
+
+        bulk = await next_event(subscriber)
+        deleted = await next_event(subscriber)
+
+    assert (bulk['table_name'], bulk['operation']) == ('novelists', 'bulk')
+    assert bulk['row_id'] is None
+    assert bulk['data'] == {'operation': 'insert'}
+    # o update sem mudança não gera evento
+    assert deleted['data'] == {'operation': 'delete'}
+    assert subscriber.queue.empty()
+    assert await session.scalar(select(func.count(CatalogEvent.id))) == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_lifespan_deve_fechar_a_conexao_do_listen(
+    session: AsyncSession,
+):
+    feed = make_feed(session)
+
+    async with feed.lifespan():
+        await asyncio.wait_for(feed.listening.wait(), 5)
+
+    assert not feed.listening.is_set()
+
+
+def test_evento_bulk_deve_ir_sem_o_formato_da_linha():
+    event = {
+        'id': 7,
+        'table_name': 'books',
+        'operation': 'bulk',
+        'row_id': None,
+        'data': {'operation': 'insert'},
+    }
+
+    assert events.format_event(event) == (
+        'id: 7\nevent: books.bulk\ndata: {"operation":"insert"}\n\n'
+    )
+
+
+@pytest.mark.asyncio
+async def test_replay_deve_pedir_reset_fora_do_historico(
+    session: AsyncSession,
+):
+    feed = make_feed(session, replay_limit=2)
+    session.add_all([Novelist(name=f'n{n}') for n in range(3)])
+    await session.commit()
+    ids = (await session.scalars(select(CatalogEvent.id))).all()
+
+    assert [e['id'] for e in await feed.replay(ids[0])] == ids[1:]
+    assert await feed.replay(ids[0] - 1) is None
+
+    await session.execute(
+        delete(CatalogEvent).where(CatalogEvent.id == ids[0])
+    )
+    await session.commit()
+
+    assert [e['id'] for e in await feed.replay(ids[0])] == ids[1:]
+    assert await feed.replay(ids[0] - 1) is None
+
+
+@pytest.mark.asyncio
+async def test_replay_deve_pedir_reset_com_a_tabela_vazia(
+    session: AsyncSession,
+):
+    feed = make_feed(session)
+    session.add_all([Novelist(name=f'n{n}') for n in range(2)])
+    await session.commit()
+    ids = (await session.scalars(select(CatalogEvent.id))).all()
+
+    await session.execute(delete(CatalogEvent))
+    await session.commit()
+
+    assert await feed.replay(ids[0]) is None
+    assert await feed.replay(ids[-1]) == []
+
+
+@pytest.mark.asyncio
+async def test_catch_up_deve_ler_em_paginas(session: AsyncSession):
+    feed = make_feed(session)
+    session.add(Novelist(name='antes'))
+    await session.commit()
+    await feed.catch_up()
+
+    session.add_all([Novelist(name=f'n{n}') for n in range(5)])
+    await session.commit()
+    ids = (await session.scalars(select(CatalogEvent.id))).all()
+    subscriber = feed.subscribe()
+
+    with (
+        patch('madr.core.events.CATCH_UP_PAGE', 2),
+        patch.object(feed, 'events_after', wraps=feed.events_after) as read,
+    ):
+        await feed.catch_up()
+
+    assert {call.args[1] for call in read.call_args_list} == {2}
+    assert feed.last_id == ids[-1]
+    assert subscriber.queue.qsize() == 5  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_assinante_lento_deve_ser_desligado(session: AsyncSession):
+    feed = make_feed(session, buffer=1)
+    slow = feed.subscribe()
+    fast = feed.subscribe()
+
+    with pytest.raises(TooManySubscribers):
+        feed.subscribe()
+
+    feed.publish({'id': 1})
+    feed.publish({'id': 1})
+    assert fast.queue.get_nowait() == {'id': 1}
+    feed.publish({'id': 2})
+
+    assert slow.overflowed
+    assert not fast.overflowed
+
+    feed.unsubscribe(slow)
+    feed.subscribe()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('draining')
+async def test_stream_deve_retomar_pelo_last_event_id(
+    client: AsyncClient, session: AsyncSession, novelist: Novelist
+):
+    feed = make_feed(session)
+    first = await session.scalar(select(CatalogEvent.id))
+    novelist.name = 'outro nome'
+    await session.commit()
+    # a retenção apagou o primeiro evento
+    await session.execute(delete(CatalogEvent).where(CatalogEvent.id == first))
+    await session.commit()
+
+    with patch.object(events, 'catalog_feed', feed):
+        response = await client.get(
+            '/events/catalog', headers={'Last-Event-ID': str(first)}
+        )
+        reset = await client.get(
+            '/events/catalog', headers={'Last-Event-ID': str(first - 1)}
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/event-stream')
+    assert response.headers['cache-control'] == 'no-cache'
+    assert response.text == (
+        'retry: 3000\n\n'
+        f'id: {first + 1}\n'
+        'event: novelists.update\n'
+        f'data: {{"name":"outro nome","id":{novelist.id}}}\n\n'
+    )
+    assert 'event: reset\n' in reset.text
+    assert not feed.subscribers
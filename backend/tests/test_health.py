@@ -0,0 +1,188 @@
+import asyncio
+from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from madr.api.v1.books import books_cache
+from madr.app import app
+from madr.core.database import engine, get_pool_stats
+from madr.core.lifecycle import lifecycle
+from madr.core.metrics import WaitTimeGauge
+from madr.core.redis import InstrumentedConnectionPool, get_redis_pool_stats
+from madr.core.warmup import Warmup, warmup
+from madr.schemas.books import BookQueryParams
+
+
+def test_wait_time_gauge_deve_acumular_esperas():
+    gauge = WaitTimeGauge()
+
+    with gauge.measure():
+        assert gauge.waiting == 1
+    with gauge.measure():
+        pass
+
+    assert gauge.waiting == 0
+    assert gauge.count == 2  # noqa: PLR2004
+    assert gauge.max >= gauge.last
+    assert gauge.avg == gauge.total / 2
+
+
+def test_get_pool_stats_deve_refletir_configuracao_do_engine():
+    stats = get_pool_stats(engine.pool)
+
+    assert stats.size == engine.pool.size()
+    assert stats.checked_out == 0
+    assert stats.overflow == 0
+
+
+def test_get_redis_pool_stats_deve_refletir_max_connections():
+    pool = InstrumentedConnectionPool.from_url(
+        'redis://localhost:6379/0', max_connections=7
+    )
+
+    stats = get_redis_pool_stats(pool)
+
+    assert stats.size == 7  # noqa: PLR2004
+    assert stats.checked_out == 0
+
+
+@pytest.mark.asyncio
+async def test_pools_deve_retornar_metricas_dos_pools():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        response = await client.get('/health/pools')
+
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert body['database']['size'] == engine.pool.size()
+    assert body['redis'] == {
+        'size': 0,
+        'checked_out': 0,
+        'idle': 0,
+        'overflow': 0,
+        'waiting': 0,
+        'wait_count': 0,
+        'wait_avg': 0.0,
+        'wait_max': 0.0,
+    }
+
+
+@pytest_asyncio.fixture
+async def health_client():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        yield client
+
+    warmup.done = False
+    warmup.checks = {}
+    lifecycle.draining = False
+
+
+@pytest.mark.asyncio
+async def test_live_nao_depende_do_aquecimento(health_client: AsyncClient):
+    response = await health_client.get('/health/live')
+
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_ready_deve_falhar_antes_do_aquecimento(
+    health_client: AsyncClient,
+):
+    response = await health_client.get('/health/ready')
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json()['ready'] is False
+
+
+@pytest.mark.asyncio
+async def test_aquecimento_deve_liberar_o_ready_ate_drenar(
+    health_client: AsyncClient, session: AsyncSession, redis
+):
+    engine = session.bind
+
+    assert await warmup.run([engine], redis, connections=2, prefill=True)
+
+    ready = await health_client.get('/health/ready')
+    lifecycle.start_draining()
+    draining = await health_client.get('/health/ready')
+
+    assert ready.status_code == HTTPStatus.OK
+    assert ready.json()['checks']['database'] == 'ok'
+    assert ready.json()['checks']['redis'] == 'ok'
+    assert ready.json()['checks']['cache:books'] == 'ok'
+    assert draining.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert draining.json()['draining'] is True
+
+    key = books_cache.key(BookQueryParams().model_dump_json())
+    assert await redis.exists(key)
+
+
+@pytest.mark.asyncio
+async def test_aquecimento_deve_rodar_as_consultas_em_cada_conexao(
+    session: AsyncSession,
+):
+    local = Warmup()
+    seen = set()
+
+    @local.query('pid')
+    async def backend_pid(session: AsyncSession):
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        seen.add(raw.driver_connection.get_server_pid())
+
+    assert await local.run([session.bind], None, connections=3)
+    assert len(seen) == 3  # noqa: PLR2004
+    assert 'redis' not in local.checks
+
+
+@pytest.mark.asyncio
+async def test_banco_fora_do_ar_deve_manter_o_worker_fora_de_rotacao():
+    local = Warmup()
+    broken = create_async_engine('postgresql+asyncpg://u:p@127.0.0.1:1/db')
+
+    assert await local.run([broken], None, connections=1) is False
+    assert local.checks['database'].startswith('failed')
+    await broken.dispose()
+
+
+@pytest.mark.asyncio
+async def test_replica_fora_do_ar_nao_deve_tirar_o_worker_de_rotacao(
+    session: AsyncSession,
+):
+    local = Warmup()
+    broken = create_async_engine('postgresql+asyncpg://u:p@127.0.0.1:1/db')
+
+    assert await local.run([session.bind, broken], None, connections=1) is (
+        False
+    )
+    assert local.done is True
+    assert local.checks['database'] == 'ok'
+    assert local.checks['replica:1'].startswith('failed')
+    await broken.dispose()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_deve_continuar_tentando_em_segundo_plano():
+    local = Warmup()
+
+    async def succeed_second_time(*args):
+        local.done = run.await_count > 1
+        return local.done
+
+    run = AsyncMock(side_effect=succeed_second_time)
+    with patch.object(local, 'run', run):
+        async with local.lifespan(
+            [], None, 1, prefill=False, timeout=1, retry_interval=0.01
+        ):
+            assert local.done is False
+            await asyncio.sleep(0.05)
+            assert local.done is True
+
+    assert local.done is False
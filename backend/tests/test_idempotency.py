@@ -0,0 +1,194 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from redis.asyncio import Redis
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from madr.core.idempotency import IdempotencyMiddleware
+from madr.core.security import generate_token
+from madr.models.user import User
+from madr.schemas.security import Token
+from tests.utils import captured_statements, table_statements
+
+url_base = '/novelists/'
+
+
+def auth_headers(token: Token, key: str) -> dict:
+    return {
+        'Authorization': f'Bearer {token.access_token}',
+        'Idempotency-Key': key,
+    }
+
+
+@pytest.mark.asyncio
+async def test_repeticao_deve_devolver_a_primeira_resposta(
+    client: AsyncClient, authenticated_token: Token, redis: Redis, engine
+):
+    headers = auth_headers(authenticated_token, 'chave-1')
+
+    first = await client.post(
+        url_base, json={'name': 'Machado'}, headers=headers
+    )
+    with captured_statements(engine) as statements:
+        retry = await client.post(
+            url_base, json={'name': 'Machado'}, headers=headers
+        )
+
+    assert first.status_code == HTTPStatus.CREATED
+    assert retry.status_code == HTTPStatus.CREATED
+    assert retry.content == first.content
+    assert retry.headers['idempotent-replayed'] == 'true'
+    assert 'idempotent-replayed' not in first.headers
+    assert table_statements(statements, 'novelists') == []
+
+
+@pytest.mark.asyncio
+async def test_mesma_chave_com_outro_corpo_deve_falhar_com_422(
+    client: AsyncClient, authenticated_token: Token, redis: Redis
+):
+    headers = auth_headers(authenticated_token, 'chave-2')
+
+    await client.post(url_base, json={'name': 'Machado'}, headers=headers)
+    response = await client.post(
+        url_base, json={'name': 'Clarice'}, headers=headers
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {
+        'detail': 'Idempotency-Key reused with a different payload'
+    }
+
+
+@pytest.mark.asyncio
+async def test_repeticoes_concorrentes_devem_esperar_a_primeira(
+    client: AsyncClient, authenticated_token: Token, redis: Redis, engine
+):
+    headers = auth_headers(authenticated_token, 'chave-3')
+
+    with captured_statements(engine) as statements:
+        responses = await asyncio.gather(
+            *(
+                client.post(
+                    url_base, json={'name': 'Machado'}, headers=headers
+                )
+                for _ in range(3)
+            )
+        )
+
+    assert {r.status_code for r in responses} == {HTTPStatus.CREATED}
+    assert len({r.content for r in responses}) == 1
+    assert len(table_statements(statements, 'novelists')) == 1
+
+
+@pytest.mark.asyncio
+async def test_sem_redis_a_chave_deve_ser_ignorada(
+    client: AsyncClient, authenticated_token: Token
+):
+    headers = auth_headers(authenticated_token, 'chave-4')
+
+    await client.post(url_base, json={'name': 'Machado'}, headers=headers)
+    retry = await client.post(
+        url_base, json={'name': 'Machado'}, headers=headers
+    )
+
+    assert retry.status_code == HTTPStatus.CONFLICT
+    assert retry.json() == {'detail': 'Novelist already exists'}
+
+
+@pytest.mark.asyncio
+async def test_token_renovado_deve_repetir_a_mesma_resposta(
+    client: AsyncClient, authenticated_token: Token, user: User, redis: Redis
+):
+    renewed = Token(
+        access_token=generate_token({'sub': user.id, 'jti': 'outro'}),
+        token_type='bearer',
+    )
+
+    first = await client.post(
+        url_base,
+        json={'name': 'Machado'},
+        headers=auth_headers(authenticated_token, 'chave-5'),
+    )
+    retry = await client.post(
+        url_base,
+        json={'name': 'Machado'},
+        headers=auth_headers(renewed, 'chave-5'),
+    )
+
+    assert retry.status_code == first.status_code == HTTPStatus.CREATED
+    assert retry.headers['idempotent-replayed'] == 'true'
+
+
+def items_app(redis: Redis, endpoint) -> Starlette:
+    app = Starlette(routes=[Route('/items', endpoint, methods=['POST'])])
+    app.state.redis = redis
+    app.add_middleware(
+        IdempotencyMiddleware,
+        paths={'/items'},
+        ttl_seconds=60,
+        lock_seconds=5,
+        wait_seconds=2,
+        poll_interval=0.01,
+    )
+    return app
+
+
+@pytest.mark.asyncio
+async def test_espera_deve_assumir_se_a_primeira_falhar(redis: Redis):
+    calls = []
+
+    async def create(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(0.05)
+            return PlainTextResponse('boom', status_code=500)
+        return PlainTextResponse('ok', status_code=201)
+
+    app = items_app(redis, create)
+    token = Token(access_token=generate_token({'sub': 1}), token_type='b')
+    headers = auth_headers(token, 'chave-6')
+
+    async def post(delay: float):
+        await asyncio.sleep(delay)
+        return await client.post('/items', content=b'x', headers=headers)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        failed, retried = await asyncio.gather(post(0), post(0.01))
+
+    assert failed.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert retried.status_code == HTTPStatus.CREATED
+    assert len(calls) == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_repeticao_nao_deve_devolver_headers_da_requisicao(
+    redis: Redis,
+):
+    async def create(request):
+        response = PlainTextResponse('ok', status_code=201)
+        response.headers['location'] = '/items/1'
+        response.headers['server-timing'] = 'db;dur=1'
+        response.set_cookie('madr_lsn', '0/1')
+        return response
+
+    app = items_app(redis, create)
+    token = Token(access_token=generate_token({'sub': 1}), token_type='b')
+    headers = auth_headers(token, 'chave-7')
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        await client.post('/items', content=b'x', headers=headers)
+        retry = await client.post('/items', content=b'x', headers=headers)
+
+    assert retry.status_code == HTTPStatus.CREATED
+    assert retry.text == 'ok'
+    assert retry.headers['location'] == '/items/1'
+    assert 'set-cookie' not in retry.headers
+    assert 'server-timing' not in retry.headers
@@ -0,0 +1,77 @@
+import json
+import logging
+import re
+from http import HTTPStatus
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.core.instrumentation import RequestTimings, ServerTimingMiddleware
+from madr.models.book import Book
+
+SERVER_TIMING = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", '
+    r'redis;dur=[\d.]+;desc="(\d+) commands", '
+    r'serialize;dur=[\d.]+, total;dur=[\d.]+'
+)
+
+
+def test_request_timings_deve_apontar_consultas_repetidas():
+    timings = RequestTimings()
+    for _ in range(3):
+        timings.statements['SELECT 1'] += 1
+    timings.statements['SELECT 2'] += 1
+
+    assert timings.repeated(3) == {'SELECT 1': 3}
+    assert timings.repeated(4) == {}
+
+
+@pytest.mark.asyncio
+async def test_server_timing_deve_contar_consultas_da_requisicao(
+    client: AsyncClient, book: Book, caplog
+):
+    with caplog.at_level(logging.INFO, 'madr.core.instrumentation'):
+        response = await client.get(f'/books/{book.id}')
+
+    assert response.status_code == HTTPStatus.OK
+    match = SERVER_TIMING.fullmatch(response.headers['server-timing'])
+    assert match is not None
+    queries = int(match.group(1))
+    assert queries >= 1
+
+    log = json.loads(caplog.records[-1].getMessage())
+    assert log['method'] == 'GET'
+    assert log['path'] == f'/books/{book.id}'
+    assert log['status'] == HTTPStatus.OK
+    assert log['db_queries'] == queries
+    assert log['serialization_ms'] >= 0
+
+
+@pytest.mark.asyncio
+async def test_server_timing_deve_sinalizar_n_mais_um(engine, caplog):
+    app = FastAPI()
+
+    @app.get('/n-plus-one')
+    async def n_plus_one():
+        async with AsyncSession(engine) as session:
+            for n in range(4):
+                await session.execute(text('SELECT CAST(:n AS int)'), {'n': n})
+        return {}
+
+    app.add_middleware(ServerTimingMiddleware, repeat_threshold=3)
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        with caplog.at_level(logging.INFO, 'madr.core.instrumentation'):
+            response = await client.get('/n-plus-one')
+
+    assert SERVER_TIMING.fullmatch(response.headers['server-timing'])
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert 'possible N+1 in GET /n-plus-one: 4 x SELECT CAST($1 AS int)' in (
+        warnings[0].getMessage()
+    )
+    assert json.loads(caplog.records[-1].getMessage())['repeated_queries'] == 1
@@ -0,0 +1,300 @@
+import asyncio
+import time
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from madr import tasks
+from madr.core.jobs import (
+    FAILED,
+    QUEUED,
+    RETRYING,
+    SUCCEEDED,
+    JobFailed,
+    JobQueue,
+    JobWorker,
+)
+from madr.models.book import Book
+from madr.models.novelist import Novelist
+from madr.schemas.security import Token
+
+
+def make_queue(**overrides) -> JobQueue:
+    values = {
+        'result_ttl': 60,
+        'visibility_timeout': 30,
+        'backoff': 0.01,
+        'backoff_max': 0.01,
+        'payload_chunk': 1024,
+    }
+    return JobQueue('test-jobs', **{**values, **overrides})
+
+
+async def wait_for(queue: JobQueue, redis, job_id: str, *statuses: str):
+    async with asyncio.timeout(5):
+        while True:
+            job = await queue.get(redis, job_id)
+            if job['status'] in statuses:
+                return job
+            await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_claim_deve_respeitar_o_limite_do_tipo(redis):
+    queue = make_queue()
+
+    @queue.task('echo', concurrency=1)
+    async def echo(job):
+        return job.payload
+
+    first = await queue.enqueue(redis, 'echo', {'n': 1})
+    second = await queue.enqueue(redis, 'echo', {'n': 2})
+    kind = queue.types['echo']
+
+    job = await queue.claim(redis, kind)
+    assert job.id == first
+    assert job.payload == {'n': 1}
+    assert job.attempts == 1
+    assert await queue.claim(redis, kind) is None
+
+    await queue.succeed(job, {'ok': True})
+    assert (await queue.claim(redis, kind)).id == second
+
+    done = await queue.get(redis, first)
+    assert done['status'] == SUCCEEDED
+    assert done['result'] == {'ok': True}
+    assert 'payload' not in done
+    assert await redis.ttl(queue.job_key(first)) > 0
+
+
+@pytest.mark.asyncio
+async def test_payload_grande_deve_ir_em_pedacos(redis):
+    queue = make_queue(payload_chunk=100)
+
+    @queue.task('big')
+    async def big(job):
+        pass
+
+    payload = [{'name': f'livro {n}', 'year': 2000 + n} for n in range(50)]
+    job_id = await queue.enqueue(redis, 'big', payload)
+    assert await redis.llen(queue.payload_key(job_id)) > 1
+
+    job = await queue.claim(redis, queue.types['big'])
+    assert job.payload == payload
+
+    await queue.succeed(job, None)
+    assert not await redis.exists(queue.payload_key(job_id))
+
+
+@pytest.mark.asyncio
+async def test_falha_deve_reagendar_com_backoff_ate_o_limite(redis):
+    queue = make_queue()
+
+    @queue.task('flaky', max_attempts=2)
+    async def flaky(job):
+        raise RuntimeError
+
+    job_id = await queue.enqueue(redis, 'flaky', None)
+    kind = queue.types['flaky']
+
+    job = await queue.claim(redis, kind)
+    await queue.fail(job, 'boom', retry=True)
+    assert (await queue.get(redis, job_id))['status'] == RETRYING
+    assert await queue.claim(redis, kind) is None
+
+    await asyncio.sleep(0.02)
+    assert await queue.promote(redis) == 1
+    assert (await queue.get(redis, job_id))['status'] == QUEUED
+
+    job = await queue.claim(redis, kind)
+    assert job.attempts == 2  # noqa: PLR2004
+    await queue.fail(job, 'boom', retry=True)
+
+    failed = await queue.get(redis, job_id)
+    assert failed['status'] == FAILED
+    assert failed['error'] == 'boom'
+    assert await redis.zcard(queue.delayed_key) == 0
+
+
+@pytest.mark.asyncio
+async def test_recover_deve_devolver_jobs_sem_heartbeat(redis):
+    queue = make_queue(visibility_timeout=10)
+
+    @queue.task('slow')
+    async def slow(job):
+        pass
+
+    job_id = await queue.enqueue(redis, 'slow', None)
+    await queue.claim(redis, queue.types['slow'])
+    assert await queue.recover(redis) == 0
+
+    await redis.hset(queue.job_key(job_id), 'heartbeat', time.time() - 60)
+
+    assert await queue.recover(redis) == 1
+    assert (await queue.get(redis, job_id))['status'] == QUEUED
+    assert await redis.llen(queue.running_key('slow')) == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_deve_executar_e_registrar_o_progresso(redis):
+    queue = make_queue()
+
+    @queue.task('count')
+    async def count(job):
+        for done in range(1, 4):
+            await job.progress(done, 3, f'{done}/3')
+        return done
+
+    @queue.task('broken')
+    async def broken(job):
+        raise JobFailed('payload inválido')
+
+    worker = JobWorker(queue, redis, poll_interval=0.01, shutdown_timeout=1)
+    async with worker.lifespan():
+        ok = await queue.enqueue(redis, 'count', None)
+        bad = await queue.enqueue(redis, 'broken', None)
+        counted = await wait_for(queue, redis, ok, SUCCEEDED)
+        failed = await wait_for(queue, redis, bad, FAILED)
+
+    assert counted['result'] == 3  # noqa: PLR2004
+    assert counted['done'] == counted['total'] == '3'
+    assert counted['message'] == '3/3'
+    assert failed['error'] == 'payload inválido'
+    assert failed['attempts'] == '1'
+
+
+@pytest.mark.asyncio
+async def test_shutdown_deve_devolver_jobs_interrompidos(redis):
+    queue = make_queue()
+    started = asyncio.Event()
+
+    @queue.task('forever')
+    async def forever(job):
+        started.set()
+        await asyncio.Event().wait()
+
+    worker = JobWorker(queue, redis, poll_interval=0.01, shutdown_timeout=0.05)
+    async with worker.lifespan():
+        job_id = await queue.enqueue(redis, 'forever', None)
+        await asyncio.wait_for(started.wait(), 5)
+
+    job = await queue.get(redis, job_id)
+    assert job['status'] == QUEUED
+    assert job['attempts'] == '0'
+    assert await redis.lrange(queue.queue_key('forever'), 0, -1) == [job_id]
+
+
+@pytest.mark.asyncio
+async def test_import_deve_rodar_em_segundo_plano(  # noqa: PLR0913, PLR0917
+    client: AsyncClient,
+    session: AsyncSession,
+    novelist: Novelist,
+    authenticated_token: Token,
+    redis,
+):
+    headers = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+    books = [
+        {'name': f'livro-{n}', 'year': 2000, 'title': f'L{n}'}
+        | {'idNovelist': novelist.id}
+        for n in range(5)
+    ]
+    sessions = async_sessionmaker(session.bind, expire_on_commit=False)
+
+    with (
+        patch.object(tasks, 'async_session', sessions),
+        patch.object(tasks.settings, 'DB_UPSERT_MAX_BATCH', 2),
+    ):
+        response = await client.post(
+            '/books/import', json=books, headers=headers
+        )
+        job_id = response.json()['id']
+
+        worker = JobWorker(
+            tasks.jobs, redis, poll_interval=0.01, shutdown_timeout=1
+        )
+        async with worker.lifespan():
+            await wait_for(tasks.jobs, redis, job_id, SUCCEEDED)
+
+    status = await client.get(f'/jobs/{job_id}', headers=headers)
+
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.headers['location'] == f'/jobs/{job_id}'
+    assert status.status_code == HTTPStatus.OK
+    assert status.json()['status'] == SUCCEEDED
+    assert status.json()['progress'] == 1.0
+    assert status.json()['done'] == status.json()['total'] == 5  # noqa: PLR2004
+    assert status.json()['result'] == {'created': 5, 'updated': 0}
+    assert await session.scalar(select(func.count()).select_from(Book)) == 5  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_import_com_autor_inexistente_deve_falhar_sem_retentar(
+    client: AsyncClient,
+    session: AsyncSession,
+    authenticated_token: Token,
+    redis,
+):
+    headers = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+    sessions = async_sessionmaker(session.bind, expire_on_commit=False)
+    books = [{'name': 'x', 'year': 2000, 'title': 'X', 'idNovelist': 999}]
+
+    with patch.object(tasks, 'async_session', sessions):
+        response = await client.post(
+            '/books/import', json=books, headers=headers
+        )
+        job_id = response.json()['id']
+
+        worker = JobWorker(
+            tasks.jobs, redis, poll_interval=0.01, shutdown_timeout=1
+        )
+        async with worker.lifespan():
+            await wait_for(tasks.jobs, redis, job_id, FAILED)
+
+    status = await client.get(f'/jobs/{job_id}', headers=headers)
+
+    assert status.json()['error'] == 'Novelist not found'
+    assert status.json()['attempts'] == 1
+
+
+@pytest.mark.asyncio
+async def test_job_inexistente(
+    client: AsyncClient, authenticated_token: Token, redis
+):
+    response = await client.get(
+        '/jobs/nope',
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}'
+        },
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_job_de_outro_usuario_deve_responder_404(
+    client: AsyncClient, authenticated_token: Token, user, redis
+):
+    headers = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+    mine = await tasks.jobs.enqueue(
+        redis, tasks.IMPORT_BOOKS, [], owner=user.id
+    )
+    other = await tasks.jobs.enqueue(
+        redis, tasks.IMPORT_BOOKS, [], owner=user.id + 1
+    )
+    anonymous = await tasks.jobs.enqueue(redis, tasks.IMPORT_BOOKS, [])
+
+    responses = [
+        await client.get(f'/jobs/{job_id}', headers=headers)
+        for job_id in (mine, other, anonymous)
+    ]
+
+    assert [r.status_code for r in responses] == [
+        HTTPStatus.OK,
+        HTTPStatus.NOT_FOUND,
+        HTTPStatus.NOT_FOUND,
+    ]
+    assert 'owner' not in responses[0].json()
@@ -0,0 +1,94 @@
+import asyncio
+from http import HTTPStatus
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from madr.core import lifecycle as module
+from madr.core.lifecycle import (
+    InFlightMiddleware,
+    Lifecycle,
+    available_cpus,
+    cgroup_cpu_limit,
+)
+
+
+@pytest.mark.parametrize(
+    ('content', 'expected'),
+    [
+        ('max 100000\n', None),
+        ('150000 100000\n', 1.5),
+        ('200000 100000\n', 2),
+        ('', None),
+    ],
+)
+def test_cgroup_cpu_limit_deve_ler_a_cota(tmp_path: Path, content, expected):
+    path = tmp_path / 'cpu.max'
+    path.write_text(content)
+
+    assert cgroup_cpu_limit(path) == expected
+
+
+def test_cgroup_cpu_limit_sem_arquivo(tmp_path: Path):
+    assert cgroup_cpu_limit(tmp_path / 'cpu.max') is None
+
+
+def test_available_cpus_deve_respeitar_a_cota(tmp_path: Path):
+    path = tmp_path / 'cpu.max'
+    path.write_text('150000 100000\n')
+
+    with patch.object(module.os, 'process_cpu_count', return_value=8):
+        assert available_cpus(path) == 2  # noqa: PLR2004
+        assert available_cpus(tmp_path / 'missing') == 8  # noqa: PLR2004
+
+    path.write_text('50000 100000\n')
+    with patch.object(module.os, 'process_cpu_count', return_value=None):
+        assert available_cpus(path) == 1
+
+
+def app_with(state: Lifecycle, gate: asyncio.Event):
+    async def slow(request):
+        await gate.wait()
+        return PlainTextResponse('ok')
+
+    return InFlightMiddleware(Starlette(routes=[Route('/', slow)]), state)
+
+
+@pytest.mark.asyncio
+async def test_in_flight_deve_contar_requisicoes_em_andamento():
+    state, gate = Lifecycle(), asyncio.Event()
+    transport = ASGITransport(app=app_with(state, gate))
+
+    async with AsyncClient(transport=transport, base_url='http://t') as c:
+        request = asyncio.create_task(c.get('/'))
+        await asyncio.sleep(0.05)
+
+        assert state.in_flight == 1
+        assert await state.wait_idle(0.01) is False
+
+        gate.set()
+        response = await request
+
+    assert response.status_code == HTTPStatus.OK
+    assert 'connection' not in response.headers
+    assert state.in_flight == 0
+    assert await state.wait_idle(0.01) is True
+
+
+@pytest.mark.asyncio
+async def test_drenando_deve_fechar_a_conexao():
+    state, gate = Lifecycle(), asyncio.Event()
+    gate.set()
+    state.start_draining()
+    transport = ASGITransport(app=app_with(state, gate))
+
+    async with AsyncClient(transport=transport, base_url='http://t') as c:
+        response = await c.get('/')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['connection'] == 'close'
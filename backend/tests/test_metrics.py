@@ -0,0 +1,178 @@
+import json
+import os
+import re
+import threading
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from madr.core.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    registry,
+)
+from madr.models.book import Book
+from madr.models.user import User
+
+DEAD_PID = 2**22 + 1
+
+
+def build_registry(directory: str = ''):
+    registry = MetricsRegistry(directory)
+    counter = Counter(registry, 'jobs_total', 'jobs', ('kind',))
+    gauge = Gauge(registry, 'busy', 'busy')
+    histogram = Histogram(
+        registry, 'latency_seconds', 'latency', ('route',), buckets=(0.1, 1)
+    )
+    return registry, counter, gauge, histogram
+
+
+def sample(text: str, line: str) -> float:
+    match = re.search(rf'^{re.escape(line)} (\S+)$', text, re.MULTILINE)
+    assert match is not None, line
+    return float(match.group(1))
+
+
+def test_registry_deve_renderizar_formato_prometheus():
+    registry, counter, gauge, histogram = build_registry()
+    counter.inc(kind='a"b')
+    counter.inc(2, kind='a"b')
+    gauge.set(3)
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, route='/x')
+
+    text = registry.render()
+
+    assert '# TYPE jobs_total counter' in text
+    assert sample(text, 'jobs_total{kind="a\\"b"}') == 3  # noqa: PLR2004
+    assert sample(text, 'busy') == 3  # noqa: PLR2004
+    assert sample(text, 'latency_seconds_bucket{route="/x",le="0.1"}') == 1
+    assert sample(text, 'latency_seconds_bucket{route="/x",le="1.0"}') == 2  # noqa: PLR2004
+    assert sample(text, 'latency_seconds_bucket{route="/x",le="+Inf"}') == 3  # noqa: PLR2004
+    assert sample(text, 'latency_seconds_count{route="/x"}') == 3  # noqa: PLR2004
+    assert sample(text, 'latency_seconds_sum{route="/x"}') == pytest.approx(
+        5.55
+    )
+
+
+def test_registry_deve_somar_snapshots_de_varios_workers(tmp_path):
+    registry, counter, gauge, histogram = build_registry(str(tmp_path))
+    counter.inc(kind='a')
+    gauge.set(2)
+    histogram.observe(0.5, route='/x')
+
+    # snapshot deixado por um worker que já morreu
+    (tmp_path / f'{DEAD_PID}.json').write_text(
+        json.dumps({
+            'jobs_total': [[['a'], 4.0], [['b'], 1.0]],
+            'busy': [[[], 10]],
+            'latency_seconds': [[['/x'], [1, 0, 0, 0.05]]],
+        })
+    )
+
+    text = registry.render()
+
+    assert sample(text, 'jobs_total{kind="a"}') == 5  # noqa: PLR2004
+    assert sample(text, 'jobs_total{kind="b"}') == 1
+    assert sample(text, 'busy') == 2  # noqa: PLR2004
+    assert sample(text, 'latency_seconds_count{route="/x"}') == 2  # noqa: PLR2004
+
+
+def test_compact_deve_juntar_workers_mortos_sem_perder_contadores(
+    tmp_path,
+):
+    registry, counter, gauge, _ = build_registry(str(tmp_path))
+    counter.inc(kind='a')
+    gauge.set(2)
+    for pid in (DEAD_PID, DEAD_PID + 1):
+        (tmp_path / f'{pid}.json').write_text(
+            json.dumps({'jobs_total': [[['a'], 4.0]], 'busy': [[[], 10]]})
+        )
+
+    registry.compact()
+    registry.compact()
+    text = registry.render()
+
+    assert sorted(p.name for p in tmp_path.glob('*.json')) == sorted([
+        'archived.json',
+        f'{os.getpid()}.json',
+    ])
+    assert sample(text, 'jobs_total{kind="a"}') == 9  # noqa: PLR2004
+    assert sample(text, 'busy') == 2  # noqa: PLR2004
+
+
+def test_load_nao_deve_contar_duas_vezes_o_que_ja_foi_compactado(tmp_path):
+    registry, *_ = build_registry(str(tmp_path))
+    dead = tmp_path / f'{DEAD_PID}.json'
+    dead.write_text(json.dumps({'jobs_total': [[['a'], 4.0]]}))
+    contents = dead.read_text()
+
+    registry.compact()
+    # o arquivo do worker lido antes da compactação apagá-lo
+    dead.write_text(contents)
+
+    assert sample(registry.render(), 'jobs_total{kind="a"}') == 4  # noqa: PLR2004
+
+
+def test_registry_ao_encerrar_nao_deve_deixar_gauges(tmp_path):
+    registry, counter, gauge, _ = build_registry(str(tmp_path))
+    counter.inc(kind='a')
+    gauge.set(7)
+
+    registry.flush(include_gauges=False)
+
+    (snapshot,) = [json.loads(p.read_text()) for p in tmp_path.iterdir()]
+    assert 'busy' not in snapshot
+    assert snapshot['jobs_total'] == [[['a'], 1.0]]
+
+
+@pytest.mark.asyncio
+async def test_metrics_deve_expor_rotas_pools_e_argon2(
+    client: AsyncClient, user: User, book: Book
+):
+    await client.get(f'/books/{book.id}')
+    await client.get('/books/999999')
+    await client.post(
+        '/auth/token',
+        data={'username': user.email, 'password': '123456789'},
+    )
+
+    response = await client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+    text = response.text
+    route = 'method="GET",route="/books/{book_id}"'
+    assert sample(text, f'madr_http_requests_total{{{route},status="200"}}')
+    assert sample(text, f'madr_http_requests_total{{{route},status="404"}}')
+    count = sample(
+        text, f'madr_http_request_duration_seconds_count{{{route}}}'
+    )
+    assert count >= 2  # noqa: PLR2004
+    assert sample(text, 'madr_http_requests_in_flight') >= 1
+    assert 'madr_pool_connections{pool="database",state="size"}' in text
+    assert 'madr_pool_connections{pool="redis",state="size"}' in text
+    assert sample(
+        text, 'madr_password_hash_duration_seconds_count{operation="verify"}'
+    )
+
+
+@pytest.mark.asyncio
+async def test_metrics_deve_ler_os_arquivos_fora_do_loop(client: AsyncClient):
+    threads = []
+    render = registry.render
+
+    def tracked(*args):
+        threads.append(threading.get_ident())
+        return render(*args)
+
+    with patch.object(registry, 'render', tracked):
+        response = await client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert threads
+    assert threading.get_ident() not in threads
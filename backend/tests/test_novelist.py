@@ -15,7 +15,11 @@ from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from madr.models.book import Book
 from madr.models.novelist import Novelist
 from tests.factories import NovelistFactory
-from tests.utils import frozen_context
+from tests.utils import (
+    captured_statements,
+    frozen_context,
+    table_statements,
+)
 
 url_base = '/novelists/'
 
@@ -41,6 +45,25 @@ async def test_create_novelist_deve_retornar_novelist_com_id(
     assert response.json() == {**payload, 'id': 1}
 
 
+@pytest.mark.asyncio
+async def test_create_novelist_deve_usar_um_unico_insert_returning(
+    client, authenticated_token, engine
+):
+    with captured_statements(engine) as statements:
+        response = await client.post(
+            url_base,
+            json={'name': 'one round trip'},
+            headers={
+                'Authorization': f'Bearer {authenticated_token.access_token}'
+            },
+        )
+
+    assert response.status_code == HTTPStatus.CREATED
+    (statement,) = table_statements(statements, 'novelists')
+    assert statement.startswith('INSERT INTO novelists')
+    assert 'RETURNING' in statement
+
+
 @pytest.mark.asyncio
 async def test_create_novelist_deve_falhar_retornar_conflito(
     client, authenticated_token, novelist
@@ -270,6 +293,130 @@ async def test_update_novelist_com_payload_vazio_deve_ter_sucesso(
     assert response.json()['name'] == original_name
 
 
+@pytest.mark.asyncio
+async def test_update_novelist_deve_usar_um_unico_update_returning(
+    client, novelist, authenticated_token, engine
+):
+    with captured_statements(engine) as statements:
+        response = await client.put(
+            f'{url_base}{novelist.id}',
+            json={'name': 'single round trip'},
+            headers={
+                'Authorization': f'Bearer {authenticated_token.access_token}'
+            },
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    (statement,) = table_statements(statements, 'novelists')
+    assert statement.startswith('UPDATE novelists')
+    assert 'RETURNING' in statement
+
+
+@pytest.mark.asyncio
+async def test_update_novelist_com_if_match_desatualizado_deve_falhar_com_412(
+    client, novelist, authenticated_token
+):
+    auth = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+    read = await client.get(f'{url_base}{novelist.id}')
+    assert read.status_code == HTTPStatus.OK
+    etag = read.headers['etag']
+
+    first = await client.put(
+        f'{url_base}{novelist.id}',
+        json={'name': 'first writer'},
+        headers={**auth, 'If-Match': etag},
+    )
+    second = await client.put(
+        f'{url_base}{novelist.id}',
+        json={'name': 'second writer'},
+        headers={**auth, 'If-Match': etag},
+    )
+
+    assert first.status_code == HTTPStatus.OK
+    assert second.status_code == HTTPStatus.PRECONDITION_FAILED
+    assert second.json() == {'detail': 'Novelist has been modified'}
+    read = await client.get(f'{url_base}{novelist.id}')
+    assert read.json()['name'] == 'first writer'
+    assert read.headers['etag'] == first.headers['etag']
+
+
+@pytest.mark.asyncio
+async def test_get_novelist_deve_falhar_com_not_found(client):
+    response = await client.get(f'{url_base}99999')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Novelist not found'}
+
+
+# ============================================================================
+# UPSERT TESTS
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_upsert_novelist_deve_criar_uma_vez_e_ser_idempotente(
+    client, authenticated_token, engine
+):
+    auth = {'Authorization': f'Bearer {authenticated_token.access_token}'}
+
+    with captured_statements(engine) as statements:
+        created = await client.put(f'{url_base}by-name/Machado', headers=auth)
+    again = await client.put(f'{url_base}by-name/Machado', headers=auth)
+
+    assert created.status_code == HTTPStatus.CREATED
+    assert again.status_code == HTTPStatus.OK
+    assert again.json() == created.json()
+    assert again.headers['etag'] == created.headers['etag']
+    (statement,) = table_statements(statements, 'novelists')
+    assert 'ON CONFLICT (name) DO UPDATE' in statement
+
+
+@pytest.mark.asyncio
+async def test_upsert_novelists_em_lote_deve_usar_um_unico_statement(
+    client, authenticated_token, novelist, engine
+):
+    payload = [
+        {'name': novelist.name},
+        {'name': 'Clarice'},
+        {'name': 'Clarice'},
+    ]
+
+    with captured_statements(engine) as statements:
+        response = await client.put(
+            f'{url_base}by-name',
+            json=payload,
+            headers={
+                'Authorization': f'Bearer {authenticated_token.access_token}'
+            },
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    body = response.json()
+    assert body['created'] == 1
+    assert body['updated'] == 1
+    assert {n['name']: n['id'] for n in body['data']}[novelist.name] == (
+        novelist.id
+    )
+    (statement,) = table_statements(statements, 'novelists')
+    assert statement.startswith('INSERT INTO novelists')
+
+
+@pytest.mark.asyncio
+async def test_upsert_novelists_com_nome_vazio_deve_falhar_com_422(
+    client, authenticated_token
+):
+    response = await client.put(
+        f'{url_base}by-name',
+        json=[{'name': 'Clarice'}, {'name': ''}],
+        headers={
+            'Authorization': f'Bearer {authenticated_token.access_token}'
+        },
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'Invalid novelist'}
+
+
 # ============================================================================
 # READ TESTS
 # ============================================================================
@@ -0,0 +1,110 @@
+import time
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from madr.app import app as madr_app
+from madr.core import redis as redis_module
+from madr.core.redis import (
+    CircuitBreaker,
+    RedisUnavailable,
+    ResilientRedis,
+    create_redis,
+)
+from madr.schemas.security import Token
+from madr.types import T_redis
+
+DEAD_REDIS = 'redis://localhost:1/0'
+
+
+def test_circuit_breaker_deve_abrir_e_fechar_depois_do_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+    breaker.opened_at = time.monotonic() - 61
+    assert breaker.allow()  # meio aberto: uma tentativa passa
+    assert not breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_redis_fora_do_ar_deve_abrir_o_circuito():
+    client = create_redis(DEAD_REDIS)
+    client.breaker.failure_threshold = 2
+
+    for _ in range(2):
+        with pytest.raises(RedisUnavailable):
+            await client.get('chave')
+
+    assert client.breaker.is_open
+    with patch.object(
+        redis_module.InstrumentedRedis, 'execute_command'
+    ) as execute:
+        with pytest.raises(RedisUnavailable, match='circuit open'):
+            await client.get('chave')
+    execute.assert_not_called()
+    await client.connection_pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_comando_lento_deve_estourar_o_prazo(redis_url: str):
+    client = create_redis(redis_url)
+    client.command_timeout = 0.05
+
+    start = time.perf_counter()
+    with pytest.raises(RedisUnavailable):
+        await client.blpop(['fila-vazia'], timeout=1)
+
+    assert time.perf_counter() - start < 0.5  # noqa: PLR2004
+    assert client.breaker.failures == 1
+    await client.connection_pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_t_redis_deve_usar_o_cliente_do_lifespan(redis_url: str):
+    app = FastAPI()
+
+    @app.get('/ping')
+    async def ping(redis: T_redis):
+        return {'pong': await redis.ping(), 'shared': redis is app.state.redis}
+
+    with patch.object(redis_module.settings, 'REDIS_URL', redis_url):
+        async with redis_module.lifespan(app):
+            assert isinstance(app.state.redis, ResilientRedis)
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url='http://test'
+            ) as client:
+                response = await client.get('/ping')
+
+    assert response.json() == {'pong': True, 'shared': True}
+
+
+@pytest.mark.asyncio
+async def test_idempotencia_sem_redis_deve_seguir_sem_falhar(
+    client: AsyncClient, authenticated_token: Token
+):
+    madr_app.state.redis = create_redis(DEAD_REDIS)
+    try:
+        response = await client.post(
+            '/novelists/',
+            json={'name': 'Machado'},
+            headers={
+                'Authorization': f'Bearer {authenticated_token.access_token}',
+                'Idempotency-Key': 'chave',
+            },
+        )
+    finally:
+        await madr_app.state.redis.connection_pool.aclose()
+        del madr_app.state.redis
+
+    assert response.status_code == HTTPStatus.CREATED
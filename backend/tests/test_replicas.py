@@ -0,0 +1,153 @@
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import Mock
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import PlainTextResponse
+
+from madr.core.replicas import (
+    LSN_COOKIE,
+    LSN_HEADER,
+    ReadAfter,
+    ReadYourWritesMiddleware,
+    Replica,
+    ReplicaSet,
+    WriteTrackingSession,
+    format_lsn,
+    parse_lsn,
+    read_after,
+    sign_lsn,
+)
+from madr.models.novelist import Novelist
+
+
+def make_replica(healthy=True, replay_lsn=0):
+    return Replica(
+        url='postgresql+asyncpg://replica/db',
+        engine=Mock(),
+        sessionmaker=Mock(),
+        healthy=healthy,
+        replay_lsn=replay_lsn,
+    )
+
+
+def test_parse_lsn_deve_ser_inverso_de_format_lsn():
+    assert parse_lsn('16/B374D848') == (0x16 << 32) | 0xB374D848
+    assert format_lsn(parse_lsn('16/B374D848')) == '16/B374D848'
+
+
+@pytest.mark.parametrize('value', [None, '', 'lixo', 'G/0'])
+def test_parse_lsn_deve_retornar_zero_para_valor_invalido(value):
+    assert parse_lsn(value) == 0
+
+
+def test_choose_deve_ignorar_replicas_sem_saude_ou_atrasadas():
+    doente = make_replica(healthy=False, replay_lsn=100)
+    atrasada = make_replica(replay_lsn=10)
+    em_dia = make_replica(replay_lsn=100)
+    replica_set = ReplicaSet([doente, atrasada, em_dia], max_lag=5, interval=1)
+
+    assert replica_set.choose(min_lsn=50) is em_dia
+    assert replica_set.choose(min_lsn=500) is None
+
+
+def test_choose_deve_alternar_entre_replicas_saudaveis():
+    primeira = make_replica()
+    segunda = make_replica()
+    replica_set = ReplicaSet([primeira, segunda], max_lag=5, interval=1)
+
+    escolhidas = {id(replica_set.choose()) for _ in range(4)}
+
+    assert escolhidas == {id(primeira), id(segunda)}
+
+
+def test_replica_set_vazio_deve_ser_falso():
+    assert not ReplicaSet([], max_lag=5, interval=1)
+
+
+@pytest.mark.asyncio
+async def test_middleware_deve_devolver_lsn_da_escrita_e_ler_o_cookie():
+    seen = {}
+
+    async def endpoint(scope, receive, send):
+        state = read_after.get()
+        seen['min_lsn'] = state.min_lsn
+        state.write_lsn = parse_lsn('1/10')
+        await PlainTextResponse('ok')(scope, receive, send)
+
+    app = ReadYourWritesMiddleware(endpoint, pin_seconds=30, secret='s')
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        client.cookies.set(LSN_COOKIE, sign_lsn(0xFF, 's'))
+        response = await client.post('/')
+
+    signed = sign_lsn(parse_lsn('1/10'), 's')
+    assert seen['min_lsn'] == 0xFF  # noqa: PLR2004
+    assert response.headers[LSN_HEADER] == signed
+    assert f'{LSN_COOKIE}={signed}' in response.headers['set-cookie']
+    assert 'Max-Age=30' in response.headers['set-cookie']
+    assert read_after.get() is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'value',
+    [
+        'FFFFFFFF/FFFFFFFF',
+        'FFFFFFFF/FFFFFFFF.' + '0' * 64,
+        sign_lsn(0xFF, 'outro segredo'),
+    ],
+)
+async def test_middleware_deve_ignorar_lsn_nao_assinado(value):
+    seen = []
+
+    async def endpoint(scope, receive, send):
+        seen.append(read_after.get().min_lsn)
+        await PlainTextResponse('ok')(scope, receive, send)
+
+    app = ReadYourWritesMiddleware(endpoint, pin_seconds=30, secret='s')
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        await client.get('/', headers={LSN_HEADER: value})
+        client.cookies.set(LSN_COOKIE, value)
+        await client.get('/')
+
+    assert seen == [0, 0]
+
+
+@pytest.mark.asyncio
+async def test_check_deve_desistir_de_replica_travada():
+    @asynccontextmanager
+    async def stalled():
+        await asyncio.Event().wait()
+        yield
+
+    replica = make_replica(healthy=True)
+    replica.engine.connect = stalled
+
+    await asyncio.wait_for(replica.check(max_lag=5, timeout=0.01), 1)
+
+    assert not replica.healthy
+
+
+@pytest.mark.asyncio
+async def test_commit_deve_guardar_o_lsn_sem_deixar_transacao_aberta(
+    session: AsyncSession,
+):
+    state = ReadAfter()
+    token = read_after.set(state)
+    try:
+        async with WriteTrackingSession(session.bind) as tracking:
+            tracking.add(Novelist(name='lsn'))
+            await tracking.commit()
+
+            assert state.write_lsn > 0
+            assert not tracking.in_transaction()
+    finally:
+        read_after.reset(token)
@@ -0,0 +1,161 @@
+from http import HTTPStatus
+from typing import Awaitable, Callable
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.api.v1 import books, novelists
+from madr.models.book import Book
+from madr.models.novelist import Novelist
+from madr.repositories import bind
+from madr.schemas.books import BookPublic, PublicBooksPaginated
+
+BACKENDS = ['asyncpg', 'postgres']
+
+BOOK_QUERIES = [
+    {},
+    {'page': 2, 'limit': 7},
+    {'page': 50},
+    {'name': 'Python', 'orderBy': 'name', 'orderDir': 'asc'},
+    {'title': ' Java ', 'orderBy': 'title'},
+    {'yearFrom': 1600, 'yearTo': 1900, 'orderBy': 'id', 'orderDir': 'asc'},
+    {'name': 'nada', 'limit': 100},
+]
+
+NOVELIST_QUERIES = [
+    {},
+    {'page': 2, 'limit': 2},
+    {'page': 10},
+    {'name': 'novelist', 'orderBy': 'name', 'orderDir': 'asc'},
+    {'name': 'nada'},
+]
+
+NOVELIST_BOOKS_QUERIES = [
+    {},
+    {'page': 2, 'limit': 3, 'orderBy': 'name', 'orderDir': 'asc'},
+    {'page': 9},
+]
+
+AWKWARD_TITLES = [
+    'aspas "duplas" e \\barra',
+    'quebra\nde\tlinha\r',
+    'controle \x01\x1f\x7f',
+    'ação, 日本語 e 😀',
+    '</script> & 100%',
+]
+
+
+def test_bind_deve_numerar_por_nome():
+    sql, args = bind(
+        "SELECT %(b)s::int, '%s', %(a)s, %(b)s", {'a': 1, 'b': 2, 'c': 3}
+    )
+
+    assert sql == "SELECT $1::int, '%s', $2, $1"
+    assert args == [2, 1]
+
+
+async def get_with_backend(client, module, backend, uri):
+    with patch.object(module.settings, 'DB_LIST_BACKEND', backend):
+        return await client.get(uri)
+
+
+async def assert_same_as_orm(client, module, backend, uri):
+    orm = await get_with_backend(client, module, 'orm', uri)
+    fast = await get_with_backend(client, module, backend, uri)
+
+    assert orm.status_code == HTTPStatus.OK
+    assert fast.status_code == orm.status_code
+    assert fast.headers['content-type'] == orm.headers['content-type']
+    assert fast.content == orm.content
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('params', BOOK_QUERIES)
+async def test_list_books_deve_ser_identico_ao_orm(
+    client: AsyncClient,
+    novelist_with_books: Callable[..., Awaitable[Novelist]],
+    params: dict,
+    backend: str,
+):
+    for prefix in ('Python', 'Java', 'Rust'):
+        await novelist_with_books(
+            8, name_prefix=prefix, title_prefix=f' {prefix} '
+        )
+
+    await assert_same_as_orm(
+        client, books, backend, '/books/?' + urlencode(params)
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('params', NOVELIST_QUERIES)
+async def test_list_novelists_deve_ser_identico_ao_orm(
+    client: AsyncClient,
+    novelist_with_books: Callable[..., Awaitable[Novelist]],
+    params: dict,
+    backend: str,
+):
+    for prefix in ('a', 'b', 'c', 'd', 'e'):
+        await novelist_with_books(1, name_prefix=prefix, title_prefix=prefix)
+
+    await assert_same_as_orm(
+        client, novelists, backend, '/novelists/?' + urlencode(params)
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('params', NOVELIST_BOOKS_QUERIES)
+async def test_books_by_novelist_deve_ser_identico_ao_orm(
+    client: AsyncClient,
+    novelist_with_books: Callable[..., Awaitable[Novelist]],
+    params: dict,
+    backend: str,
+):
+    novelist = await novelist_with_books(10)
+    await novelist_with_books(5)
+
+    await assert_same_as_orm(
+        client,
+        novelists,
+        backend,
+        f'/novelists/{novelist.id}/books?' + urlencode(params),
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('backend', BACKENDS)
+async def test_list_books_deve_escapar_strings_como_o_pydantic(
+    client: AsyncClient,
+    session: AsyncSession,
+    novelist: Novelist,
+    backend: str,
+):
+    db_books = [
+        Book(
+            name=f'livro {n}',
+            year=2000 + n,
+            title=title,
+            id_novelist=novelist.id,
+        )
+        for n, title in enumerate(AWKWARD_TITLES)
+    ]
+    session.add_all(db_books)
+    await session.commit()
+
+    response = await get_with_backend(
+        client, books, backend, '/books/?orderDir=asc'
+    )
+
+    expected = PublicBooksPaginated(
+        data=[BookPublic.model_validate(book) for book in db_books],
+        page=1,
+        total=len(db_books),
+    )
+    assert response.content == expected.model_dump_json(by_alias=True).encode()
+    await assert_same_as_orm(client, books, backend, '/books/?orderDir=asc')
@@ -0,0 +1,115 @@
+from http import HTTPStatus
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastapi import APIRouter, FastAPI, Response
+from httpx import ASGITransport, AsyncClient
+from pydantic import TypeAdapter
+
+from madr.core.responses import ModelRoute
+from madr.schemas.books import BookPublic, PublicBooksPaginated
+
+BOOK = BookPublic(id=1, name='livro', year=2000, title='título')
+
+
+def build_app(endpoint, **route_options) -> FastAPI:
+    router = APIRouter(route_class=ModelRoute)
+    router.add_api_route('/', endpoint, **route_options)
+    app = FastAPI()
+    app.include_router(router, prefix='/prefix')
+    return app
+
+
+async def get(app: FastAPI):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url='http://test'
+    ) as client:
+        return await client.get('/prefix/')
+
+
+@pytest.mark.asyncio
+async def test_model_route_deve_serializar_com_aliases_camel_case():
+    async def endpoint():
+        return PublicBooksPaginated(
+            data=[BOOK], page=2, total=11, has_prev=True
+        )
+
+    response = await get(
+        build_app(endpoint, response_model=PublicBooksPaginated)
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/json'
+    assert response.json() == {
+        'data': [{'name': 'livro', 'year': 2000, 'title': 'título', 'id': 1}],
+        'page': 2,
+        'total': 11,
+        'hasPrev': True,
+        'hasNext': False,
+    }
+
+
+@pytest.mark.asyncio
+async def test_model_route_nao_deve_revalidar_model_ja_validado():
+    async def endpoint():
+        return BOOK
+
+    app = build_app(endpoint, response_model=BookPublic)
+    with patch.object(
+        TypeAdapter, 'validate_python', side_effect=AssertionError
+    ):
+        response = await get(app)
+
+    assert response.json() == BOOK.model_dump(by_alias=True)
+
+
+@pytest.mark.asyncio
+async def test_model_route_deve_validar_objetos_do_orm():
+    async def endpoint():
+        return SimpleNamespace(id=3, name='orm', year=1999, title='t', x=1)
+
+    response = await get(build_app(endpoint, response_model=BookPublic))
+
+    assert response.json() == {
+        'name': 'orm',
+        'year': 1999,
+        'title': 't',
+        'id': 3,
+    }
+
+
+@pytest.mark.asyncio
+async def test_model_route_deve_manter_status_e_headers_do_endpoint():
+    async def endpoint(response: Response):
+        response.status_code = HTTPStatus.ACCEPTED
+        response.headers['x-extra'] = 'sim'
+        return BOOK
+
+    response = await get(
+        build_app(
+            endpoint,
+            response_model=BookPublic,
+            status_code=HTTPStatus.CREATED,
+        )
+    )
+
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.headers['x-extra'] == 'sim'
+    assert int(response.headers['content-length']) == len(response.content)
+
+
+@pytest.mark.asyncio
+async def test_model_route_deve_usar_status_code_da_rota():
+    async def endpoint():
+        return BOOK
+
+    response = await get(
+        build_app(
+            endpoint,
+            response_model=BookPublic,
+            status_code=HTTPStatus.CREATED,
+        )
+    )
+
+    assert response.status_code == HTTPStatus.CREATED
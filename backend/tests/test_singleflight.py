@@ -0,0 +1,119 @@
+import asyncio
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from madr.api.v1 import books
+from madr.core.metrics import SINGLEFLIGHT_REQUESTS
+from madr.core.replicas import ReadAfter, is_pinned, parse_lsn, read_after
+from madr.core.singleflight import SingleFlight
+from madr.models.book import Book
+from tests.utils import captured_statements, table_statements
+
+
+class SlowCall:
+    def __init__(self, result=b'ok', error: Exception | None = None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.started = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await asyncio.sleep(0.02)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_chamadas_identicas_devem_executar_uma_vez():
+    flights = SingleFlight('teste')
+    call = SlowCall()
+    followers = SINGLEFLIGHT_REQUESTS.samples.get(('teste', 'follower'), 0)
+
+    results = await asyncio.gather(*(flights.do('k', call) for _ in range(10)))
+
+    assert results == [b'ok'] * 10
+    assert call.calls == 1
+    assert SINGLEFLIGHT_REQUESTS.samples[('teste', 'follower')] == (
+        followers + 9
+    )
+    assert flights.flights == {}
+
+
+@pytest.mark.asyncio
+async def test_chaves_diferentes_nao_devem_ser_agrupadas():
+    flights = SingleFlight('teste')
+    call = SlowCall()
+
+    await asyncio.gather(flights.do('a', call), flights.do('b', call))
+
+    assert call.calls == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_leitura_fixada_no_primario_nao_deve_ser_agrupada():
+    flights = SingleFlight('teste', bypass=is_pinned)
+    call = SlowCall()
+
+    async def pinned():
+        token = read_after.set(ReadAfter(min_lsn=parse_lsn('0/10')))
+        try:
+            return await flights.do('k', call)
+        finally:
+            read_after.reset(token)
+
+    leader = asyncio.create_task(flights.do('k', call))
+    await call.started.wait()
+    await asyncio.gather(leader, pinned(), flights.do('k', call))
+
+    assert call.calls == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_erro_deve_chegar_a_todos():
+    flights = SingleFlight('teste')
+    call = SlowCall(error=ValueError('falhou'))
+
+    results = await asyncio.gather(
+        *(flights.do('k', call) for _ in range(3)), return_exceptions=True
+    )
+
+    assert call.calls == 1
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_lider_cancelado_nao_deve_cancelar_os_outros():
+    flights = SingleFlight('teste')
+    call = SlowCall()
+
+    leader = asyncio.create_task(flights.do('k', call))
+    await call.started.wait()
+    follower = asyncio.create_task(flights.do('k', call))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == b'ok'
+    assert call.calls == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_gets_identicos_devem_compartilhar_a_consulta(
+    client: AsyncClient, book: Book, engine
+):
+    with (
+        patch.object(books.settings, 'DB_LIST_BACKEND', 'orm'),
+        captured_statements(engine) as statements,
+    ):
+        responses = await asyncio.gather(
+            *(client.get('/books/?page=1') for _ in range(5))
+        )
+
+    assert {r.status_code for r in responses} == {HTTPStatus.OK}
+    assert len({r.content for r in responses}) == 1
+    assert len(table_statements(statements, 'books')) == 1
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr.api.v1 import books
+from madr.core import database
+from madr.core.slow_queries import is_explainable, redact
+from madr.models.book import Book
+
+
+def test_redact_deve_esconder_textos_e_manter_numeros():
+    assert redact('segredo') == '<str:7>'
+    assert redact(b'\x00\x01') == '<bytes:2>'
+    assert redact(42) == 42  # noqa: PLR2004
+    assert redact(None) is None
+    assert redact(date(2020, 1, 2)) == '2020-01-02'
+    assert redact(['a']) == '<list>'
+
+
+@pytest.mark.parametrize(
+    ('statement', 'expected'),
+    [
+        ('SELECT 1', True),
+        ('  with x as (select 1) select * from x', False),
+        ('WITH d AS (DELETE FROM books RETURNING id) SELECT * FROM d', False),
+        ('SELECT * FROM books WHERE id = $1 FOR UPDATE', False),
+        ('select * from books for no key update skip locked', False),
+        ('SELECT * FROM books FOR SHARE', False),
+        ('SELECT * FROM books WHERE name = $1', True),
+        ('UPDATE books SET name = $1', False),
+        ('INSERT INTO books VALUES ($1)', False),
+        ('SET LOCAL statement_timeout = 10', False),
+        ('', False),
+    ],
+)
+def test_is_explainable_nunca_deve_reexecutar_escritas(statement, expected):
+    assert is_explainable(statement) is expected
+
+
+@pytest.fixture
+def slow_log(tmp_path):
+    path = tmp_path / 'slow.log'
+    with patch.multiple(
+        database.slow_queries,
+        threshold_ms=0.001,
+        sample_rate=1.0,
+        max_pending=100,
+        path=str(path),
+        _logger=None,
+    ):
+        yield path
+
+
+async def read_entries(path) -> list[dict]:
+    await asyncio.gather(*database.slow_queries.pending)
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('backend', ['orm', 'postgres'])
+async def test_consulta_lenta_deve_ser_explicada_com_a_rota(
+    client: AsyncClient, book: Book, slow_log, backend: str
+):
+    with patch.object(books.settings, 'DB_LIST_BACKEND', backend):
+        await client.get('/books/?title=segredo')
+
+    entries = [
+        entry
+        for entry in await read_entries(slow_log)
+        if entry['plan'] is not None
+    ]
+    assert entries
+    entry = entries[-1]
+    assert entry['route'] == 'read_books_by_filter'
+    assert '<str:9>' in entry['parameters']  # %segredo%
+    assert 'Execution Time' in entry['plan']
+    assert 'segredo' not in slow_log.read_text()
+
+
+@pytest.mark.asyncio
+async def test_consulta_fora_da_amostra_nao_deve_ser_explicada(
+    session: AsyncSession, slow_log
+):
+    with patch.object(database.slow_queries, 'sample_rate', 0.0):
+        await session.execute(text('SELECT pg_sleep(0.01)'))
+
+    (entry,) = await read_entries(slow_log)
+    assert entry['statement'] == 'SELECT pg_sleep(0.01)'
+    assert entry['route'] is None
+    assert entry['plan'] is None
+
+
+@pytest.mark.asyncio
+async def test_explain_nao_deve_entrar_no_proprio_log(
+    session: AsyncSession, slow_log
+):
+    await session.execute(text('SELECT pg_sleep(0.01)'))
+
+    (entry,) = await read_entries(slow_log)
+    assert entry['statement'] == 'SELECT pg_sleep(0.01)'
+    assert 'Execution Time' in entry['plan']
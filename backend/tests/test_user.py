@@ -16,7 +16,7 @@ from madr.core.database import get_session
 from madr.models.user import User
 from madr.schemas.security import Token
 from madr.schemas.user import UserCreate
-from tests.utils import frozen_context
+from tests.utils import captured_statements, frozen_context
 
 base_url = '/users/'
 
@@ -45,6 +45,19 @@ async def test_users_deve_retornar_usuario_criado_com_id(
     assert response_data['email'] == user_db.email
 
 
+@pytest.mark.asyncio
+async def test_create_user_deve_usar_um_unico_insert_returning(
+    client: AsyncClient, user_payload: dict, engine
+):
+    with captured_statements(engine) as statements:
+        response = await client.post(base_url, json=user_payload)
+
+    assert response.status_code == HTTPStatus.CREATED
+    assert len(statements) == 1
+    assert statements[0].startswith('INSERT INTO users')
+    assert 'RETURNING' in statements[0]
+
+
 @pytest.mark.asyncio
 async def test_users_deve_retornar_excessao_conflito_409(
     client: AsyncClient, user: User
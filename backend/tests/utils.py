@@ -1,8 +1,10 @@
 from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import List, Optional
 
 from freezegun import freeze_time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
 
 
 @contextmanager
@@ -13,3 +15,22 @@ def frozen_context(time_delta: Optional[timedelta] = None):
         initial_datetime += time_delta
     with freeze_time(initial_datetime) as frozen_time:
         yield frozen_time
+
+
+@contextmanager
+def captured_statements(engine: AsyncEngine):
+    """SQL enviado ao banco enquanto o bloco roda"""
+    statements: List[str] = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+
+
+def table_statements(statements: List[str], table: str) -> List[str]:
+    return [s for s in statements if f' {table}' in s.replace('\n', ' ')]